@@ -1,21 +1,100 @@
+import argparse
 import sys
+import threading
 import time
 from datetime import datetime
 
-import yaml
-from InquirerPy import inquirer
-from InquirerPy.base.control import Choice
-from InquirerPy.validator import EmptyInputValidator
+from src import is_out
 
-from src.check_essay import check_for_essay
-from src.check_mcq import check_for_mcq
-from src.data_types import Config, Paper
-from src.notify import notify
+# The app is only imported when this file is run. Worker processes started
+# with spawn import it as `__mp_main__`, and mustn't load the config, prompt
+# for missing settings or open the credential store and audio device again.
+# `is-out` only reads the catalogue snapshot, so it runs before the imports.
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["is-out"]:
+        is_out.main(sys.argv[2:])
+
+    from InquirerPy import inquirer
+    from InquirerPy.base.control import Choice
+    from InquirerPy.validator import EmptyInputValidator
+
+    from src.api import transfer_stats
+    from src.auth import auth_request
+    from src.bandwidth import traffic
+    from src.catalogue import catalogue, print_catalogue
+    from src.check_mcq import CLASS_ID
+    from src.check_rules import check_catalogue, check_for_rules
+    from src.cluster import Cluster, rule_shard
+    from src.data_types import Config, Paper, WatchRule
+    from src.eventlog import (
+        DetectionEvent,
+        Dispatcher,
+        EventLog,
+        EventLogError,
+    )
+    from src.loadtest import (
+        BASELINE_FILE,
+        TOLERANCE,
+        FaultProfile,
+        LoadTestSettings,
+        compare_with_baseline,
+        load_baseline,
+        print_load_report,
+        run_load_test,
+        save_baseline,
+    )
+    from src.loadtest import REPORT_INTERVAL as LOADTEST_REPORT_INTERVAL
+    from src.longrun import MemoryMonitor, recycle_idle_session
+    from src.mirror import CONCURRENCY, Mirror
+    from src.notify import notify
+    from src.pdftext import PYPDF_MISSING, PdfReader
+    from src.probe import CONCURRENCY as PROBE_CONCURRENCY
+    from src.probe import PROBE_INTERVAL, probe_materials
+    from src.recording import start_recording
+    from src.replay import ReplayTarget, load_recording, print_report, replay
+    from src.rules import compile_rules
+    from src.scheduler import PollScheduler, ReleaseModel, series_of
+    from src.search import indexer
+    from src.slo import (
+        load_detections,
+        print_slo_report,
+        save_detection,
+        start_detection,
+    )
+    from src.slo import now as slo_now
+    from src.snapshot import SnapshotWriter
+    from src.standby import Standby
 
 CHECK_INTERVAL = 60
+RELOAD_INTERVAL = 1  # Seconds between checks of the config file
+RECORDING_MAX_BYTES = 50 * 1024 * 1024  # Per recording file in long run mode
+
+
+def watch_config(config: "Config"):
+    """
+    Pick up edits of the config file from a background thread.
+
+    This is the only place the config is reloaded. Download settings are
+    pushed into the traffic scheduler, so pausing downloads takes effect
+    even while a download holds up the poll loop.
+    """
+
+    def run():
+        while True:
+            time.sleep(RELOAD_INTERVAL)
+            try:
+                changed = config.reload()
+            except Exception as e:
+                print(f"\nFailed to reload the config: {e}")
+                continue
+            if changed:
+                print(f"\nReloaded config: {', '.join(changed)}")
+                traffic.configure(config)
+
+    threading.Thread(target=run, name="config", daemon=True).start()
 
 
-def main():
+def prompt_rules():
     paper_number = inquirer.number(
         message="Enter paper number:",
         min_allowed=0,
@@ -29,46 +108,592 @@ def main():
         ],
     ).execute()
 
-    if type == Paper.PaperType.MCQ:
-        checker = check_for_mcq
-    elif type == Paper.PaperType.ESSAY:
-        checker = check_for_essay
+    return [WatchRule.for_paper(int(paper_number), type)]
+
+
+def notify_sink(seq, event):
+    notify(event.paper, event.detection)
+
+
+def detection_sink(seq, event):
+    # Skip detections saved before a crash that lost the checkpoint
+    if not event.detection or any(
+        record.event_seq == seq for record in load_detections()
+    ):
+        return
+    event.detection.event_seq = seq
+    save_detection(event.detection)
+
+
+def main(long_run=False, cluster=None):
+    config = Config()
+    if config.watch_rules:
+        rules = list(config.watch_rules)
+        print(f"Watching {len(rules)} rules from {config.config_file_name}")
+    else:
+        rules = prompt_rules()
+
+    # Deliver detections that were logged but not handled before a crash
+    dispatcher = Dispatcher(
+        EventLog(), [("notify", notify_sink), ("detections", detection_sink)]
+    )
+    try:
+        delivered = dispatcher.dispatch()
+    except Exception as e:
+        print(f"Failed to deliver a detection logged before a crash: {e}")
+        delivered = []
+    for event in delivered:
+        rules = [rule for rule in rules if rule.name != event.rule]
+
+    release_model = ReleaseModel()
+    scheduler = PollScheduler(
+        release_model,
+        list({series_of(rule) for rule in rules}),
+        base_interval=CHECK_INTERVAL,
+    )
+
+    standby = Standby()
+    monitor = MemoryMonitor() if long_run else None
+    if cluster:
+        cluster.start()
 
     try:
         check_count = 0
         while True:
             check_count += 1
-            current_time = datetime.now().strftime("%H:%M:%S")
-            paper = checker(paper_number)
+            if monitor:
+                monitor.check()
+                if recycle_idle_session(auth_request):
+                    print("\nRecycled idle connections")
+            now = datetime.now()
+            polled_at = slo_now()
+            current_time = now.strftime("%H:%M:%S")
+            active = rules
+            if cluster:
+                # Rules notified by other nodes are done here too
+                notified = cluster.notified_rules()
+                rules = [rule for rule in rules if rule.name not in notified]
+                owned = cluster.acquire(
+                    sorted(
+                        {
+                            rule_shard(config.username, CLASS_ID, rule)
+                            for rule in rules
+                        }
+                    )
+                )
+                active = [
+                    rule
+                    for rule in rules
+                    if rule_shard(config.username, CLASS_ID, rule) in owned
+                ]
+            if scheduler.should_prearm(now) and active:
+                auth_request.warm_up()
+            papers = (
+                check_for_rules(compile_rules(tuple(active))) if active else {}
+            )
 
-            if paper:
+            for rule in list(active):
+                paper = papers.get(rule.name)
+                if not paper:
+                    continue
+                if rule.name not in standby.papers:
+                    release_model.observe(series_of(rule), now)
+                    release_model.save()
+                # A paper found before it unlocked is notified by the first
+                # poll after the unlock, the other rules keep being polled
+                if standby.hold(rule.name, paper):
+                    continue
+                if cluster and not cluster.claim_notification(rule.name, paper):
+                    rules.remove(rule)
+                    continue
+                detection = start_detection(paper, polled_at)
+                event = DetectionEvent(
+                    rule=rule.name, paper=paper, detection=detection
+                )
                 try:
-                    notify(paper)
-                    print("Exiting...")
-                    sys.exit(0)
+                    dispatcher.log.append(event)
+                    dispatcher.dispatch()
+                except EventLogError as e:
+                    # Notify anyway, only a crash can't redeliver it now
+                    print(e)
+                    notify_sink(None, event)
+                    save_detection(detection)
                 except Exception as e:
                     print(e)
                     sys.exit(1)
-            else:
+                rules.remove(rule)
+
+            if not rules:
+                print("Exiting...")
+                sys.exit(0)
+            elif not papers:
+                transfer = ""
+                if transfer_stats.last:
+                    _, wire_bytes, content_bytes = transfer_stats.last
+                    transfer = (
+                        f", {wire_bytes / 1e3:.1f} kB received"
+                        f" for {content_bytes / 1e3:.1f} kB"
+                    )
                 sys.stdout.write(
-                    f"\rLast checked at {current_time} (#{check_count})..."
+                    f"\rLast checked at {current_time} "
+                    f"(#{check_count}{transfer})..."
                 )
                 sys.stdout.flush()
-                time.sleep(CHECK_INTERVAL)
+            interval = standby.next_interval(
+                scheduler.next_interval(datetime.now())
+            )
+            if cluster:
+                cluster.expect_poll(interval + cluster.lease_seconds)
+            time.sleep(interval)
     except KeyboardInterrupt:
         print("\nStopping PET exam watcher...")
         sys.exit(0)
+    finally:
+        if cluster:
+            cluster.stop()
+
+
+def run_replay(args):
+    targets = [
+        ReplayTarget(paper_number=number, type=Paper.PaperType.MCQ)
+        for number in args.mcq
+    ] + [
+        ReplayTarget(paper_number=number, type=Paper.PaperType.ESSAY)
+        for number in args.essay
+    ]
+    if not targets:
+        print("Nothing to replay, pass at least one --mcq or --essay number")
+        sys.exit(1)
+
+    release_model = ReleaseModel()
+    interval = args.interval
+    if args.adaptive:
+        interval = PollScheduler(
+            release_model,
+            [series_of(target.rule) for target in targets],
+            base_interval=args.interval,
+        ).next_interval
+
+    def on_detect(detection):
+        print(
+            f"Detected {detection.paper.name} at "
+            f"{detection.detected_at.isoformat()}"
+        )
+        if args.learn:
+            release_model.observe(
+                series_of(detection.target.rule), detection.available_at
+            )
+        if args.notify:
+            notify(detection.paper)
+
+    def on_diff(timestamp, endpoint, added, removed):
+        print(
+            f"{timestamp.isoformat()} {endpoint}: +{len(added)} -{len(removed)}"
+        )
+
+    misses = []
+    detections = replay(
+        load_recording(args.recording),
+        targets,
+        interval=interval,
+        speed=args.speed,
+        on_detect=on_detect,
+        on_diff=on_diff if args.verbose else None,
+        on_miss=misses.append,
+    )
+    print_report(detections, targets, misses)
+    if args.learn:
+        release_model.save()
+
+
+def run_mirror(args):
+    started_at = time.monotonic()
+    try:
+        result = Mirror(args.class_id, args.concurrency, args.verify).run()
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    print(
+        f"Mirrored class {args.class_id} in "
+        f"{time.monotonic() - started_at:.1f}s: "
+        f"{result.downloaded} downloaded ({result.bytes / 1e6:.1f} MB), "
+        f"{result.unchanged} unchanged, {result.failed} failed"
+    )
+    if result.failed:
+        sys.exit(1)
+
+
+def run_catalogue(args):
+    numbers = args.numbers or None
+    try:
+        while True:
+            changed = check_catalogue(numbers)
+            if numbers:
+                changed &= set(numbers)
+            entries = [catalogue.get(number) for number in sorted(changed)]
+            if entries:
+                print_catalogue([entry for entry in entries if entry])
+            if not args.watch:
+                break
+            if numbers and not catalogue.missing_endpoints(numbers):
+                print("Both halves of every paper are out")
+                break
+            time.sleep(CHECK_INTERVAL)
+    except KeyboardInterrupt:
+        print("\nStopping catalogue watcher...")
+
+
+def run_slo(args):
+    print_slo_report(args.days)
+
+
+def run_search(args):
+    if PdfReader is None:
+        print(PYPDF_MISSING)
+    extractions = indexer.add_folder()
+    if extractions:
+        print(f"Indexing {len(extractions)} new or changed files...")
+        for extraction in extractions:
+            extraction.exception()
+    indexer.shutdown()
+    indexer.index.remove_missing()
+
+    started_at = time.perf_counter()
+    try:
+        hits = indexer.index.search(args.query, args.paper, args.limit)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    elapsed = (time.perf_counter() - started_at) * 1000
+    for hit in hits:
+        print(f"{hit.name} ({hit.path})")
+        print(f"  {hit.snippet}")
+    print(f"{len(hits)} hits in {elapsed:.1f} ms")
+
+
+def run_probe(args):
+    try:
+        while True:
+            result = probe_materials(args.concurrency)
+            print(
+                f"Probed {result.checked} materials: "
+                f"{len(result.changed)} changed, {result.failed} failed"
+            )
+            indexer.shutdown()
+            if not args.watch:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        print("\nStopping material probe...")
+
+
+def run_loadtest(args):
+    settings = LoadTestSettings(
+        accounts=args.accounts,
+        classes=args.classes,
+        interval=args.interval,
+        duration=args.duration,
+        faults=FaultProfile(
+            latency=args.latency,
+            jitter=args.jitter,
+            error_burst_every=args.error_burst_every,
+            error_burst_length=args.error_burst_length,
+            token_ttl=args.token_ttl,
+            growth=args.growth,
+            release_every=args.release_every,
+        ),
+    )
+    report = run_load_test(settings, args.report_every)
+    print_load_report(report)
+
+    if args.save_baseline:
+        save_baseline(report, args.baseline)
+        print(f"Saved the baseline to {args.baseline}")
+        return
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"No baseline in {args.baseline}, save one with --save-baseline")
+        return
+    try:
+        regressions = compare_with_baseline(report, baseline, args.tolerance)
+    except ValueError as e:
+        print(e)
+        sys.exit(2)
+    if regressions:
+        print("Regressed against the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print("No regressions against the baseline")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Watch ApexOnline.lk for new papers"
+    )
+    parser.add_argument(
+        "--record",
+        metavar="FILE",
+        help="Record every fetched payload to FILE for later replay",
+    )
+    parser.add_argument(
+        "--cluster",
+        metavar="DB",
+        help="Share the polling with other watchers through a SQLite file",
+    )
+    parser.add_argument(
+        "--node-id",
+        help="Name of this watcher in the cluster (default: host and pid)",
+    )
+    parser.add_argument(
+        "--long-run",
+        action="store_true",
+        help="Bound memory use and report memory growth for runs of days",
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    replay_parser = subparsers.add_parser(
+        "replay", help="Run the watcher against a recorded payload file"
+    )
+    replay_parser.add_argument("recording", help="Recorded payload file")
+    replay_parser.add_argument(
+        "--mcq", type=int, action="append", default=[], metavar="NUMBER"
+    )
+    replay_parser.add_argument(
+        "--essay", type=int, action="append", default=[], metavar="NUMBER"
+    )
+    replay_parser.add_argument(
+        "--interval",
+        type=float,
+        default=CHECK_INTERVAL,
+        help="Simulated seconds between polls",
+    )
+    replay_parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="Poll with the schedule learned from past release times",
+    )
+    replay_parser.add_argument(
+        "--learn",
+        action="store_true",
+        help="Add the replayed release times to the release history",
+    )
+    replay_parser.add_argument(
+        "--speed",
+        type=float,
+        default=0,
+        help="Replay speed relative to real time (0 for as fast as possible)",
+    )
+    replay_parser.add_argument(
+        "--notify", action="store_true", help="Notify on each detection"
+    )
+    replay_parser.add_argument(
+        "--verbose", action="store_true", help="Print each payload diff"
+    )
+
+    mirror_parser = subparsers.add_parser(
+        "mirror", help="Download every material of a class"
+    )
+    mirror_parser.add_argument("--class-id", type=int, default=CLASS_ID)
+    mirror_parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=CONCURRENCY,
+        help="Number of materials downloaded at once",
+    )
+    mirror_parser.add_argument(
+        "--verify",
+        action="store_true",
+        help="Check the hash of every mirrored file before skipping it",
+    )
+
+    catalogue_parser = subparsers.add_parser(
+        "catalogue",
+        help="Show MCQ topics and essay exams joined by paper number",
+    )
+    catalogue_parser.add_argument(
+        "numbers", type=int, nargs="*", help="Only show these paper numbers"
+    )
+    catalogue_parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep polling and print papers as they change",
+    )
+
+    slo_parser = subparsers.add_parser(
+        "slo", help="Show detection delay percentiles"
+    )
+    slo_parser.add_argument(
+        "--days", type=float, help="Only include the last DAYS days"
+    )
+
+    search_parser = subparsers.add_parser(
+        "search", help="Search the text of the downloaded papers"
+    )
+    search_parser.add_argument(
+        "query", help='Words or phrases to find, e.g. "light reaction"'
+    )
+    search_parser.add_argument(
+        "--paper", type=int, help="Only search the files of this paper number"
+    )
+    search_parser.add_argument(
+        "--limit", type=int, default=20, help="Maximum number of hits"
+    )
+
+    probe_parser = subparsers.add_parser(
+        "probe",
+        help="Check downloaded materials for changes and download new ones",
+    )
+    probe_parser.add_argument(
+        "--watch", action="store_true", help="Keep probing every interval"
+    )
+    probe_parser.add_argument(
+        "--interval",
+        type=float,
+        default=PROBE_INTERVAL,
+        help="Seconds between probes with --watch",
+    )
+    probe_parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=PROBE_CONCURRENCY,
+        help="Number of materials probed at once",
+    )
+
+    is_out.add_arguments(
+        subparsers.add_parser(
+            "is-out",
+            help="Check if a paper is out in the catalogue a watcher publishes",
+        )
+    )
+
+    loadtest_parser = subparsers.add_parser(
+        "loadtest",
+        help="Run many accounts against a local fake API and measure them",
+    )
+    defaults = LoadTestSettings()
+    faults = defaults.faults
+    loadtest_parser.add_argument(
+        "--accounts", type=int, default=defaults.accounts
+    )
+    loadtest_parser.add_argument(
+        "--classes",
+        type=int,
+        default=defaults.classes,
+        help="Classes polled by each account",
+    )
+    loadtest_parser.add_argument(
+        "--interval",
+        type=float,
+        default=defaults.interval,
+        help="Seconds between polls of each account",
+    )
+    loadtest_parser.add_argument(
+        "--duration",
+        type=float,
+        default=defaults.duration,
+        help="Seconds to run for",
+    )
+    loadtest_parser.add_argument(
+        "--report-every",
+        type=float,
+        default=LOADTEST_REPORT_INTERVAL,
+        help="Seconds between progress lines",
+    )
+    loadtest_parser.add_argument(
+        "--latency",
+        type=float,
+        default=faults.latency,
+        help="Seconds the fake API takes to answer",
+    )
+    loadtest_parser.add_argument(
+        "--jitter",
+        type=float,
+        default=faults.jitter,
+        help="Up to this many more seconds, at random",
+    )
+    loadtest_parser.add_argument(
+        "--error-burst-every",
+        type=float,
+        default=faults.error_burst_every,
+        help="Seconds between bursts of 503s (0 for none)",
+    )
+    loadtest_parser.add_argument(
+        "--error-burst-length", type=float, default=faults.error_burst_length
+    )
+    loadtest_parser.add_argument(
+        "--token-ttl",
+        type=float,
+        default=faults.token_ttl,
+        help="Seconds the fake API accepts a login token for",
+    )
+    loadtest_parser.add_argument(
+        "--growth",
+        type=float,
+        default=faults.growth,
+        help="Items added to each payload per minute",
+    )
+    loadtest_parser.add_argument(
+        "--release-every",
+        type=float,
+        default=faults.release_every,
+        help="Seconds between new papers",
+    )
+    loadtest_parser.add_argument(
+        "--baseline",
+        default=BASELINE_FILE,
+        help="Baseline to compare with or save to",
+    )
+    loadtest_parser.add_argument(
+        "--save-baseline",
+        action="store_true",
+        help="Save this run as the baseline instead of comparing",
+    )
+    loadtest_parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=TOLERANCE,
+        help="Relative change of a metric counted as a regression",
+    )
+
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
+    args = parse_args()
     config = Config()
+    config.save()
+    watch_config(config)
 
-    with open(config.config_file_name, "w") as file:
-        yaml.dump(
-            config.model_dump(),
-            file,
-            default_flow_style=False,
-            sort_keys=False,
+    if args.record:
+        start_recording(
+            args.record, RECORDING_MAX_BYTES if args.long_run else None
         )
 
-    main()
+    if config.catalogue_snapshot and args.command in (None, "catalogue"):
+        # Readers see an empty catalogue until the first poll
+        snapshot_writer = SnapshotWriter(config.catalogue_snapshot)
+        snapshot_writer.publish(catalogue)
+        catalogue.listeners.append(snapshot_writer.publish)
+
+    if args.command == "replay":
+        run_replay(args)
+    elif args.command == "mirror":
+        run_mirror(args)
+    elif args.command == "catalogue":
+        run_catalogue(args)
+    elif args.command == "slo":
+        run_slo(args)
+    elif args.command == "search":
+        run_search(args)
+    elif args.command == "probe":
+        run_probe(args)
+    elif args.command == "is-out":
+        is_out.run(args)
+    elif args.command == "loadtest":
+        run_loadtest(args)
+    else:
+        cluster = None
+        if args.cluster:
+            cluster = Cluster(args.cluster, config.username, args.node_id)
+        main(args.long_run, cluster)
@@ -0,0 +1,238 @@
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from urllib3.util.request import ACCEPT_ENCODING
+
+from .auth import auth_request
+from .bandwidth import traffic
+from .data_types import Config
+from .deadline import Cancellation, LatencyTracker, hedged
+
+config = Config()
+
+CHUNK_SIZE = 64 * 1024
+FILTERS_FILE = "api_filters.json"
+VERIFY_EVERY = 30  # Polls between checks that a filter still sees everything
+NEWEST_ITEMS = 10  # Newest items a filtered payload must still contain
+
+# Filter and pagination parameters tried on the list endpoints
+CANDIDATE_FILTERS: List[Dict[str, Any]] = [
+    {"limit": 50},
+    {"per_page": 50},
+    {"page": 1, "per_page": 50},
+    {"page": 1, "limit": 50},
+    {"page_size": 50},
+]
+
+
+class TransferStats:
+    """Bytes received over the wire and after decompression per endpoint."""
+
+    def __init__(self):
+        self.endpoints: Dict[str, List[int]] = {}
+        self.last: Optional[tuple] = None
+
+    def add(self, endpoint: str, wire_bytes: int, content_bytes: int):
+        totals = self.endpoints.setdefault(endpoint, [0, 0, 0])
+        totals[0] += 1
+        totals[1] += wire_bytes
+        totals[2] += content_bytes
+        self.last = (endpoint, wire_bytes, content_bytes)
+
+    def summary(self) -> str:
+        return ", ".join(
+            f"{endpoint}: {requests} requests, {wire / 1e3:.1f} kB "
+            f"-> {content / 1e3:.1f} kB"
+            for endpoint, (requests, wire, content) in self.endpoints.items()
+        )
+
+
+transfer_stats = TransferStats()
+
+
+latencies: Dict[str, LatencyTracker] = {}
+
+
+def _post_json(
+    url: str,
+    endpoint: str,
+    data: Optional[dict],
+    cancellation: Cancellation,
+    session=None,
+):
+    chunks = []
+    content_bytes = 0
+    with (
+        traffic.poll(),
+        (session or auth_request).post(
+            url,
+            data=data,
+            headers={"Accept-Encoding": ACCEPT_ENCODING},
+            stream=True,
+        ) as response,
+    ):
+        response.raise_for_status()
+        # Read timeouts only bound each read, not a slowly dripping body
+        with cancellation.watch(response):
+            for chunk in response.iter_content(CHUNK_SIZE):
+                chunks.append(chunk)
+                content_bytes += len(chunk)
+        tell = getattr(response.raw, "tell", None)
+        wire_bytes = tell() if tell else content_bytes
+
+    transfer_stats.add(endpoint, wire_bytes, content_bytes)
+    return json.loads(b"".join(chunks))
+
+
+def post_json(
+    url: str, endpoint: str, data: Optional[dict] = None, session=None
+):
+    """
+    POST to an API endpoint and decode its JSON response.
+
+    The body is requested compressed with every encoding the HTTP stack can
+    decode (gzip and deflate, plus brotli and zstd when their packages are
+    installed) and decompressed while it streams in. With `hedge_requests`
+    set, a second request is sent when the first runs past the p95 latency
+    of the endpoint, and the first to answer is used.
+
+    Args:
+        url: The API URL
+        endpoint: Name of the endpoint, used to group transfer stats
+        data: Form data to send
+        session: Logged in session to send it with, the session of the
+            configured account if not given
+
+    Returns:
+        The decoded JSON response
+    """
+    if not config.hedge_requests:
+        return _post_json(url, endpoint, data, Cancellation(), session)
+    return hedged(
+        lambda cancellation: _post_json(
+            url, endpoint, data, cancellation, session
+        ),
+        latencies.setdefault(endpoint, LatencyTracker()),
+    )
+
+
+def _load_filters() -> dict:
+    if not os.path.exists(FILTERS_FILE):
+        return {}
+    with open(FILTERS_FILE, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _save_filters(filters: dict):
+    with open(FILTERS_FILE, "w", encoding="utf-8") as file:
+        json.dump(filters, file, indent=2)
+
+
+def _newest_keys(keys: list, count: int) -> list:
+    try:
+        return sorted(keys, reverse=True)[:count]
+    except TypeError:
+        # Keys that can't be ordered, trust the order of the response
+        return keys[:count]
+
+
+class PartialPayload(list):
+    """
+    Items of an endpoint fetched with a filter.
+
+    It only holds the recent items, so the items missing from it must not
+    be taken as removed.
+    """
+
+
+def is_complete(payload: Any) -> bool:
+    """Check if a payload lists every item of its endpoint."""
+    return not isinstance(payload, PartialPayload)
+
+
+class FilterProbe:
+    """
+    Find request parameters that make an endpoint return only recent items.
+
+    Each candidate filter is tried once against a full payload. A filter is
+    only kept if it returns fewer items, all of them in the full payload,
+    including its newest ones. Every `verify_every` polls the full payload
+    is fetched again and the filter dropped if it started missing items.
+    Filtered payloads are returned as a `PartialPayload`.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        key: Callable[[dict], Any],
+        verify_every: int = VERIFY_EVERY,
+    ):
+        self.endpoint = endpoint
+        self.key = key
+        self.verify_every = verify_every
+        self.params: Optional[dict] = _load_filters().get(endpoint)
+        self.polls = 0
+
+    def _covers(self, full: list, filtered: Any) -> bool:
+        if not isinstance(filtered, list) or not filtered:
+            return False
+        full_keys = [self.key(item) for item in full]
+        filtered_keys = {self.key(item) for item in filtered}
+        if len(filtered_keys) >= len(full_keys):
+            return False
+        newest = _newest_keys(full_keys, min(NEWEST_ITEMS, len(filtered)))
+        return filtered_keys <= set(full_keys) and all(
+            key in filtered_keys for key in newest
+        )
+
+    def _save(self):
+        filters = _load_filters()
+        filters[self.endpoint] = self.params
+        _save_filters(filters)
+
+    def _probe(self, full: list, fetch: Callable[[dict], Any]):
+        self.params = {}
+        for params in CANDIDATE_FILTERS:
+            try:
+                if self._covers(full, fetch(params)):
+                    print(f"Using {params} to poll {self.endpoint}")
+                    self.params = params
+                    break
+            except Exception:
+                continue
+        self._save()
+
+    def fetch(self, fetch: Callable[[dict], Any]):
+        """
+        Fetch the endpoint, filtered when a working filter is known.
+
+        Args:
+            fetch: Fetches the endpoint with the given extra parameters
+
+        Returns:
+            The payload, a `PartialPayload` if it was filtered
+        """
+        self.polls += 1
+        if self.params is None:
+            full = fetch({})
+            if isinstance(full, list) and full:
+                self._probe(full, fetch)
+            return full
+
+        if self.params and self.polls % self.verify_every == 0:
+            full = fetch({})
+            if not self._covers(full, fetch(self.params)):
+                print(
+                    f"Filter {self.params} stopped working on {self.endpoint}"
+                )
+                self.params = {}
+                self._save()
+            return full
+
+        if not self.params:
+            return fetch({})
+        payload = fetch(self.params)
+        if isinstance(payload, list):
+            return PartialPayload(payload)
+        return payload
@@ -0,0 +1,209 @@
+import os
+import queue
+import threading
+import time
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+try:
+    import miniaudio
+except ImportError:
+    miniaudio = None
+
+
+class SoundPattern(BaseModel):
+    """How many times to play the notification sound and how far apart."""
+
+    repeat: int = 1
+    interval: float = 0.5
+
+
+# Patterns used as detections keep coming in within ESCALATION_WINDOW
+ESCALATION = [
+    SoundPattern(repeat=1),
+    SoundPattern(repeat=3, interval=0.5),
+    SoundPattern(repeat=5, interval=0.3),
+]
+ESCALATION_WINDOW = 5 * 60
+
+
+class NullBackend:
+    """Backend that plays nothing, for headless runs and tests."""
+
+    def __init__(self):
+        self.played = 0
+
+    def play(self):
+        self.played += 1
+
+
+class PlaysoundBackend:
+    """Plays the sound file with playsound, decoding it on every play."""
+
+    def __init__(self, path: str):
+        # Imported here as playsound looks for audio backends on import
+        from playsound3 import playsound
+
+        self.path = path
+        self._playsound = playsound
+
+    def play(self):
+        self._playsound(self.path, block=True)
+
+
+class MiniaudioBackend:
+    """
+    Decodes the sound file to PCM once and plays it from memory.
+
+    One playback device is opened on the first play and kept open, playing
+    silence between sounds, so a sound doesn't wait for a device to open.
+    """
+
+    def __init__(self, path: str):
+        self.sound = miniaudio.decode_file(path)
+        self.duration = self.sound.num_frames / self.sound.sample_rate
+        self._device: Optional["miniaudio.PlaybackDevice"] = None
+        # Next sample to play, None while idle. Set by `play` and moved on
+        # by the device thread
+        self._position: Optional[int] = None
+        self._finished = threading.Event()
+
+    def _stream(self):
+        samples = self.sound.samples
+        channels = self.sound.nchannels
+        frame_bytes = channels * self.sound.sample_width
+        frames = yield b""
+        while True:
+            position = self._position
+            if position is None:
+                frames = yield bytes(frames * frame_bytes)
+                continue
+            end = position + frames * channels
+            if end >= len(samples):
+                self._position = None
+                self._finished.set()
+            else:
+                self._position = end
+            frames = yield samples[position:end]
+
+    def _open(self):
+        stream = self._stream()
+        next(stream)
+        self._device = miniaudio.PlaybackDevice(
+            output_format=self.sound.sample_format,
+            nchannels=self.sound.nchannels,
+            sample_rate=self.sound.sample_rate,
+        )
+        self._device.start(stream)
+
+    def play(self):
+        if self._device is None:
+            self._open()
+        self._finished.clear()
+        self._position = 0
+        # Give up waiting if the device stalls rather than block the worker
+        self._finished.wait(self.duration + 1)
+
+    def close(self):
+        if self._device is not None:
+            self._device.close()
+            self._device = None
+
+
+def create_backend(path: Optional[str], name: Optional[str] = None):
+    """
+    Pick the best available audio backend for a sound file.
+
+    Args:
+        path: The notification sound file
+        name: "miniaudio", "playsound" or "null" to force a backend
+    """
+    if name == "null" or not path or not os.path.exists(path):
+        return NullBackend()
+    if miniaudio is not None and name in (None, "miniaudio"):
+        try:
+            return MiniaudioBackend(path)
+        except Exception as e:
+            print(f"Failed to decode notification sound: {e}")
+    try:
+        return PlaysoundBackend(path)
+    except Exception as e:
+        print(f"Failed to load notification sound: {e}")
+        return NullBackend()
+
+
+class AudioService:
+    """
+    Plays notification sounds from a single long lived worker.
+
+    Requests go through a queue. Requests that pile up while a pattern is
+    playing are merged into the strongest one, so a burst of detections
+    plays one pattern instead of stacking sounds.
+    """
+
+    def __init__(self, backend, escalation: List[SoundPattern] = ESCALATION):
+        self.backend = backend
+        self.escalation = escalation
+        self._queue: "queue.Queue[Optional[SoundPattern]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._level = 0
+        self._last_request = 0.0
+        self._lock = threading.Lock()
+
+    def _run(self):
+        try:
+            self._play_requests()
+        finally:
+            close = getattr(self.backend, "close", None)
+            if close:
+                close()
+
+    def _play_requests(self):
+        while True:
+            pattern = self._queue.get()
+            if pattern is None:
+                return
+            # Merge everything that was requested in the meantime
+            while not self._queue.empty():
+                pending = self._queue.get()
+                if pending is None:
+                    return
+                if pending.repeat > pattern.repeat:
+                    pattern = pending
+
+            for count in range(pattern.repeat):
+                if count:
+                    time.sleep(pattern.interval)
+                try:
+                    self.backend.play()
+                except Exception as e:
+                    print(f"Failed to play notification sound: {e}")
+
+    def play(self, pattern: Optional[SoundPattern] = None):
+        """
+        Queue a notification sound.
+
+        Args:
+            pattern: Pattern to play, escalating with each request made
+                within ESCALATION_WINDOW of the previous one if not given
+        """
+        with self._lock:
+            if pattern is None:
+                now = time.monotonic()
+                if now - self._last_request > ESCALATION_WINDOW:
+                    self._level = 0
+                else:
+                    self._level = min(self._level + 1, len(self.escalation) - 1)
+                self._last_request = now
+                pattern = self.escalation[self._level]
+
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="audio", daemon=True
+                )
+                self._worker.start()
+        self._queue.put(pattern)
+
+    def stop(self):
+        self._queue.put(None)
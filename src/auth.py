@@ -1,13 +1,25 @@
 import random
 import string
 import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
 
 import requests as rq
 
+from .credentials import credential_store
 from .data_types import Config
+from .deadline import request_timeout
+from .transport import mount_transport
 
 config = Config()
 
+LOGIN_PATH = "api/v1/user/login"
+
+
+def api_url(path: str = "") -> str:
+    """Get the URL of an API path on the configured `api_base_url`."""
+    return urljoin(config.api_base_url.rstrip("/") + "/", path)
+
 
 def generate_unique_key():
     # Get current timestamp in milliseconds
@@ -32,13 +44,36 @@ class AuthenticatedSession(rq.Session):
         super().__init__()
         self.username = username
         self.password = password
+        mount_transport(self)
+        self.restore_session()
+
+    def restore_session(self):
+        """Reuse the last token and cookies if they're still valid."""
+        saved = credential_store.get("session")
+        if not saved or saved.get("username") != self.username:
+            return
+        if saved.get("expires_at", 0) > time.time():
+            self._auth_token = saved["token"]
+            self._expiration_time = saved["expires_at"]
+            self.cookies.update(saved.get("cookies", {}))
+
+    def save_session(self):
+        credential_store.set(
+            "session",
+            {
+                "username": self.username,
+                "token": self._auth_token,
+                "expires_at": self._expiration_time,
+                "cookies": rq.utils.dict_from_cookiejar(self.cookies),
+            },
+        )
 
     def get_authorization_token(self):
         # Generate a unique key
         unique_key = generate_unique_key()
 
         # API endpoint
-        url = "https://apexonline.lk/api/v1/user/login"
+        url = api_url(LOGIN_PATH)
 
         # Set up headers
         headers = {"Content-Type": "application/x-www-form-urlencoded"}
@@ -51,29 +86,64 @@ class AuthenticatedSession(rq.Session):
             "step": 3,
         }
 
-        # Make the request
-        response = rq.post(url, headers=headers, data=data)
+        # Make the request, bypassing the token check but sharing the pool
+        response = rq.Session.request(
+            self,
+            "POST",
+            url,
+            headers=headers,
+            data=data,
+            timeout=request_timeout(),
+        )
 
         # Return the response
         return response
 
-    def update_auth_token(self):
+    def update_auth_token(self, min_validity=0):
         # Get the current time
         now = time.time()
 
         # Get the expiration time of the token
         expiration_time = getattr(self, "_expiration_time", 0)
 
-        # If the token has expired, re authenticate
-        if now > expiration_time:
+        # If the token has expired (or will within min_validity seconds),
+        # re authenticate
+        if now + min_validity > expiration_time:
             response = self.get_authorization_token()
             if response.status_code == 200:
                 self._auth_token = response.json()["body"]["token"]
                 self._expiration_time = now + 60 * 15  # expires in 15 minutes
+                self.cookies.update(response.cookies)
+                self.save_session()
             else:
                 raise Exception("Login failed")
 
+    def warm_up(self, min_validity=60 * 10, connections=1):
+        """
+        Refresh the token and open pooled connections ahead of a poll.
+
+        Args:
+            min_validity: Seconds the token must stay valid for
+            connections: Number of connections to open and keep in the pool
+        """
+        try:
+            self.update_auth_token(min_validity)
+            # Concurrent requests make the pool keep that many connections
+            with ThreadPoolExecutor(max_workers=connections) as executor:
+                for response in executor.map(
+                    lambda _: self.head(api_url()), range(connections)
+                ):
+                    response.close()
+        except Exception as e:
+            print(f"Failed to warm up session: {e}")
+
+    def recycle(self):
+        """Close every pooled connection, keeping the token and cookies."""
+        for adapter in self.adapters.values():
+            adapter.close()
+
     def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault("timeout", request_timeout())
         self.update_auth_token()
 
         """ response = self.get_authorization_token()
@@ -87,7 +157,14 @@ class AuthenticatedSession(rq.Session):
         headers.update({"Authorization": f"Bearer {self._auth_token}"})
         kwargs["headers"] = headers
 
-        return super().request(method, url, *args, **kwargs)
+        response = super().request(method, url, *args, **kwargs)
+        if response.status_code == 401:
+            # The saved token may have been revoked, log in again once
+            self._expiration_time = 0
+            self.update_auth_token()
+            headers.update({"Authorization": f"Bearer {self._auth_token}"})
+            response = super().request(method, url, *args, **kwargs)
+        return response
 
 
 auth_request = AuthenticatedSession(config.username, config.password)
@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Dict
+from urllib.parse import urlparse
+
+from .data_types import Config, Material
+
+config = Config()
+
+WAIT_INTERVAL = 0.05  # Seconds between checks of a waiting download
+BURST_SECONDS = 0.5  # Bytes a download may get ahead of the rate limit
+
+
+class Priority(IntEnum):
+    """Traffic classes, lower values go first."""
+
+    POLL = 0
+    QUESTION_PAPER = 1
+    MARKING_SCHEME = 2
+    MIRROR = 3
+
+
+def material_priority(material: Material) -> Priority:
+    if "marking" in (material.name or "").lower():
+        return Priority.MARKING_SCHEME
+    return Priority.QUESTION_PAPER
+
+
+class TrafficScheduler:
+    """
+    Share the link between polls and downloads by priority.
+
+    Polls are never held back. While one is in flight, downloads stop
+    reading. That doesn't free the link at once: data in flight keeps
+    arriving and fills the kernel's receive buffers, and only once they're
+    full do the senders stop. It does keep large downloads from competing
+    with the poll for long. Among downloads, higher priorities get
+    connections and bandwidth first, each host gets a limited number of
+    connections, the total rate is capped by `max_download_rate` (kB/s),
+    and `downloads_paused` pauses every download. The settings are taken
+    from the config when created, and pushed in with `configure` when it
+    changes.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._polls = 0
+        self._paused = False
+        self.max_download_rate = config.max_download_rate
+        self.max_connections_per_host = config.max_connections_per_host
+        self.downloads_paused = config.downloads_paused
+        # Waiting downloads per priority, kept apart for connections and
+        # bandwidth so a download holding a connection isn't held back by
+        # one waiting for it
+        self._waiting_connection: Counter = Counter()
+        self._waiting_bandwidth: Counter = Counter()
+        self._connections: Dict[str, int] = {}
+        self._tokens = 0.0
+        self._refilled_at = time.monotonic()
+
+    @property
+    def paused(self) -> bool:
+        return self._paused or self.downloads_paused
+
+    def configure(self, settings: Config):
+        """Apply the rate, connection and pause settings of a config."""
+        with self._condition:
+            self.max_download_rate = settings.max_download_rate
+            self.max_connections_per_host = settings.max_connections_per_host
+            self.downloads_paused = settings.downloads_paused
+            self._condition.notify_all()
+
+    def pause(self):
+        with self._condition:
+            self._paused = True
+
+    def resume(self):
+        with self._condition:
+            self._paused = False
+            self._condition.notify_all()
+
+    def _wait(self, priority: Priority, waiting: Counter, ready) -> None:
+        waiting[priority] += 1
+        try:
+            while True:
+                outranked = any(
+                    count
+                    for other, count in waiting.items()
+                    if other < priority
+                )
+                if (
+                    not self.paused
+                    and not self._polls
+                    and not outranked
+                    and ready()
+                ):
+                    return
+                self._condition.wait(WAIT_INTERVAL)
+        finally:
+            waiting[priority] -= 1
+
+    @contextmanager
+    def poll(self):
+        """Mark a poll in flight, holding downloads back until it's done."""
+        with self._condition:
+            self._polls += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._polls -= 1
+                self._condition.notify_all()
+
+    @contextmanager
+    def connection(self, url: str, priority: Priority):
+        """Hold one of the connections allowed to the host of `url`."""
+        host = urlparse(url).netloc
+        with self._condition:
+            self._wait(
+                priority,
+                self._waiting_connection,
+                lambda: (
+                    self._connections.get(host, 0)
+                    < self.max_connections_per_host
+                ),
+            )
+            self._connections[host] = self._connections.get(host, 0) + 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._connections[host] -= 1
+                self._condition.notify_all()
+
+    def _refill(self) -> bool:
+        rate = self.max_download_rate
+        if not rate:
+            self._tokens = 0.0
+            return True
+        now = time.monotonic()
+        burst = rate * 1000 * BURST_SECONDS
+        self._tokens = min(
+            self._tokens + (now - self._refilled_at) * rate * 1000, burst
+        )
+        self._refilled_at = now
+        return self._tokens >= 0
+
+    def throttle(self, size: int, priority: Priority):
+        """
+        Account for `size` bytes read by a download, waiting as needed.
+
+        Called after each chunk, so a download that went over the rate
+        limit, or that is outranked, waits before reading more.
+        """
+        with self._condition:
+            self._tokens -= size
+            self._wait(priority, self._waiting_bandwidth, self._refill)
+
+
+traffic = TrafficScheduler()
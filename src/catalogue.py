@@ -0,0 +1,212 @@
+import json
+import re
+from typing import Callable, Dict, List, Optional, Set
+
+from pydantic import BaseModel, Field
+
+from . import check_essay, check_mcq
+from .data_types import Material, Paper
+from .timestamps import display_timestamp
+
+PAPER_NUMBER_PATTERN = re.compile(r"\bpet\s*-?\s*(\d+)", re.IGNORECASE)
+
+
+def parse_paper_number(title: str) -> Optional[int]:
+    """Get the paper number out of a title like "PET 30 MCQ"."""
+    match = PAPER_NUMBER_PATTERN.search(title or "")
+    return int(match.group(1)) if match else None
+
+
+class CatalogueEntry(BaseModel):
+    """Everything known about one paper number across both endpoints."""
+
+    number: int
+    topics: Dict[str, Paper] = Field(default_factory=dict)
+    exams: Dict[str, Paper] = Field(default_factory=dict)
+
+    @property
+    def mcq(self) -> Optional[Paper]:
+        # Marking schemes are posted as topics of their own
+        for topic in self.topics.values():
+            if "marking" not in (topic.name or "").lower():
+                return topic
+        return None
+
+    @property
+    def essay(self) -> Optional[Paper]:
+        return next(iter(self.exams.values()), None)
+
+    @property
+    def materials(self) -> List[Material]:
+        return [
+            material
+            for topic in self.topics.values()
+            for material in topic.materials
+        ]
+
+    def missing_endpoints(self) -> Set[str]:
+        """Get the endpoints this paper hasn't shown up on yet."""
+        missing = set()
+        if self.mcq is None:
+            missing.add(check_mcq.ENDPOINT)
+        if self.essay is None:
+            missing.add(check_essay.ENDPOINT)
+        return missing
+
+
+def _topic_paper(item: dict) -> Paper:
+    return Paper(
+        id=str(item.get("id")),
+        name=item.get("topic_title"),
+        type=Paper.PaperType.MCQ,
+        materials=Material.get_paper_materials(item.get("materials", [])),
+    )
+
+
+def _exam_paper(exam: dict) -> Paper:
+    exam_data = exam.get("exam_id", {})
+    return Paper(
+        id=str(exam_data.get("id")),
+        name=exam_data.get("exam_name"),
+        type=Paper.PaperType.ESSAY,
+        unlocks_at=exam_data.get("exam_unlocks_at"),
+        expires_at=exam_data.get("exam_expires_at"),
+    )
+
+
+# How to read the items of each endpoint: key, title, paper and where the
+# paper goes in a catalogue entry
+ENDPOINTS = {
+    check_mcq.ENDPOINT: (
+        check_mcq.item_key,
+        lambda item: item.get("topic_title", ""),
+        _topic_paper,
+        "topics",
+    ),
+    check_essay.ENDPOINT: (
+        check_essay.item_key,
+        lambda exam: exam.get("exam_id", {}).get("exam_name", ""),
+        _exam_paper,
+        "exams",
+    ),
+}
+
+
+class PaperCatalogue:
+    """
+    Joined view of MCQ topics and essay exams keyed by paper number.
+
+    Payloads are applied incrementally: only items that are new, changed or
+    removed since the last payload of the same endpoint are parsed again.
+    Items are only removed by complete payloads, a partial one (fetched with
+    a filter) just adds and updates the items it has. Listeners are called
+    with the catalogue after each payload that changed it.
+    """
+
+    def __init__(self):
+        self.entries: Dict[int, CatalogueEntry] = {}
+        self.listeners: List[Callable[["PaperCatalogue"], None]] = []
+        # Last seen serialization and paper number of each item per endpoint
+        self._seen: Dict[str, Dict[str, tuple]] = {
+            endpoint: {} for endpoint in ENDPOINTS
+        }
+
+    def update(
+        self, endpoint: str, payload: list, complete: bool = True
+    ) -> Set[int]:
+        """
+        Apply a payload of an endpoint.
+
+        Args:
+            endpoint: The endpoint the payload came from
+            payload: The items of the endpoint
+            complete: Whether the payload lists every item of the endpoint,
+                items missing from it are only removed if it does
+
+        Returns:
+            The numbers of the papers that changed
+        """
+        get_key, get_title, to_paper, field = ENDPOINTS[endpoint]
+        seen = self._seen[endpoint]
+        # A partial payload leaves the items it doesn't list as they were
+        current: Dict[str, tuple] = {} if complete else dict(seen)
+        changed = set()
+
+        for item in payload or []:
+            key = str(get_key(item))
+            serialized = json.dumps(item, sort_keys=True)
+            previous = seen.get(key)
+            if previous and previous[0] == serialized:
+                current[key] = previous
+                continue
+
+            number = parse_paper_number(get_title(item))
+            current[key] = (serialized, number)
+            if previous and previous[1] is not None and previous[1] != number:
+                self._remove(previous[1], field, key)
+                changed.add(previous[1])
+            if number is None:
+                continue
+            entry = self.entries.setdefault(
+                number, CatalogueEntry(number=number)
+            )
+            getattr(entry, field)[key] = to_paper(item)
+            changed.add(number)
+
+        for key, (_, number) in seen.items():
+            if key not in current and number is not None:
+                self._remove(number, field, key)
+                changed.add(number)
+
+        self._seen[endpoint] = current
+        if changed:
+            for listener in self.listeners:
+                listener(self)
+        return changed
+
+    def _remove(self, number: int, field: str, key: str):
+        entry = self.entries.get(number)
+        if entry is None:
+            return
+        getattr(entry, field).pop(key, None)
+        if not entry.topics and not entry.exams:
+            del self.entries[number]
+
+    def get(self, number: int) -> Optional[CatalogueEntry]:
+        return self.entries.get(number)
+
+    def missing_endpoints(self, numbers: List[int]) -> Set[str]:
+        """Get the endpoints still needed to complete the given papers."""
+        missing = set()
+        for number in numbers:
+            entry = self.entries.get(number)
+            if entry is None:
+                missing.update(ENDPOINTS)
+            else:
+                missing.update(entry.missing_endpoints())
+        return missing
+
+
+catalogue = PaperCatalogue()
+
+
+def print_catalogue(entries: List[CatalogueEntry]):
+    """Print one line per paper with both of its halves."""
+    print("=" * 60)
+    for entry in sorted(entries, key=lambda entry: entry.number):
+        mcq = entry.mcq
+        essay = entry.essay
+        print(f"PET {entry.number}")
+        print(
+            f"  MCQ:   {mcq.name if mcq else '-'}"
+            f" ({len(entry.materials)} materials)"
+        )
+        if essay:
+            print(
+                f"  Essay: {essay.name}"
+                f" | unlocks {display_timestamp(essay.unlocks_at)}"
+                f" | expires {display_timestamp(essay.expires_at)}"
+            )
+        else:
+            print("  Essay: -")
+    print("=" * 60)
@@ -1,29 +1,81 @@
-import json
-from typing import NoReturn
+from typing import Dict, NoReturn
 
-from .auth import auth_request
-from .data_types import Paper
+from .api import FilterProbe, is_complete, post_json
+from .auth import api_url, auth_request
+from .data_types import Config, Paper, WatchRule
+from .recording import record_payload
+from .rules import RuleSet, compile_rules
 
-API_URL = "https://apexonline.lk/api/v1/exams/get-merged-exams"
-FAKE_DATA_FILE_PATH = "bin/merged_exams.json"
+config = Config()
+
+API_PATH = "api/v1/exams/get-merged-exams"
+ENDPOINT = "exams"
+
+
+def item_key(exam: dict):
+    return exam.get("exam_id", {}).get("id")
+
+
+probe = FilterProbe(ENDPOINT, item_key)
 
 
 def fetch_essay_data():
-    FAKE = False
-    if FAKE:
-        # Read and load the JSON data
-        with open(FAKE_DATA_FILE_PATH, "r") as file:
-            data = json.load(file)
+    def fetch(params):
+        return post_json(api_url(API_PATH), ENDPOINT, params or None)
+
+    try:
+        if config.probe_filters:
+            data = probe.fetch(fetch)
+        else:
+            data = fetch({})
+        record_payload(ENDPOINT, data, is_complete(data))
         return data
-    else:
-        try:
-            response = auth_request.post(API_URL)
-            response.raise_for_status()  # Raise an exception for HTTP errors
 
-            return response.json()
+    except auth_request.exceptions.RequestException as e:
+        print(f"Error checking API: {e}")
+
+
+def find_essay_papers(exams: list, rules: RuleSet) -> Dict[str, Paper]:
+    """
+    Find the essay papers matching watch rules in a merged exams payload.
+
+    Args:
+        exams: The decoded response of the merged exams API.
+        rules: The compiled watch rules.
+
+    Returns:
+        The paper found for each matching rule, keyed by rule name.
+    """
+    papers = {}
+    for exam in exams:
+        exam_data = exam.get("exam_id", {})
+        for rule in rules.match(exam_data.get("exam_name", "")):
+            # The first matching exam wins
+            if rule.paper_type != Paper.PaperType.ESSAY or rule.name in papers:
+                continue
+            papers[rule.name] = Paper(
+                id=str(exam_data.get("id")),
+                name=exam_data.get("exam_name"),
+                type=Paper.PaperType.ESSAY,
+                unlocks_at=exam_data.get("exam_unlocks_at"),
+                expires_at=exam_data.get("exam_expires_at"),
+            )
+    return papers
+
+
+def find_essay_paper(exams: list, paper_number: int) -> Paper | None:
+    """
+    Find a specific essay paper in a merged exams payload.
+
+    Args:
+        exams: The decoded response of the merged exams API.
+        paper_number: The number of the essay paper to search for.
 
-        except auth_request.exceptions.RequestException as e:
-            print(f"Error checking API: {e}")
+    Returns:
+        A Paper object for the matching exam, or None if it's not out yet.
+    """
+    rule = WatchRule.for_paper(paper_number, Paper.PaperType.ESSAY)
+    return find_essay_papers(exams, compile_rules((rule,))).get(rule.name)
 
 
 def check_for_essay(paper_number: int) -> Paper | NoReturn:
@@ -39,26 +91,6 @@ def check_for_essay(paper_number: int) -> Paper | NoReturn:
     """
     try:
         exams = fetch_essay_data()
-        mcq_str = str(paper_number)  # Convert to string for comparison
-        paper = None
-
-        for exam in exams:
-            exam_data = exam.get("exam_id", {})
-            exam_name = exam_data.get("exam_name", "").lower()
-
-            # if paper_number in exam_name:
-            if "pet" in exam_name and (
-                mcq_str in exam_name or f"{mcq_str} mcq" in exam_name
-            ):
-                paper = exam_data
-                paper = exam_data
-
-                return Paper(
-                    name=paper.get("exam_name"),
-                    type=Paper.PaperType.ESSAY,
-                    unlocks_at=paper.get("exam_unlocks_at"),
-                    expires_at=paper.get("exam_expires_at"),
-                )
-
+        return find_essay_paper(exams, paper_number)
     except Exception as e:
         print(str(e))
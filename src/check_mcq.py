@@ -1,30 +1,90 @@
-import json
-from typing import NoReturn
+from typing import Dict, NoReturn
 
-from .auth import auth_request
-from .data_types import Material, Paper
+from .api import FilterProbe, is_complete, post_json
+from .auth import api_url, auth_request
+from .data_types import Config, Material, Paper, WatchRule
+from .recording import record_payload
+from .rules import RuleSet, compile_rules
 
-API_URL = "https://apexonline.lk/api/v1/topics/get-lms-topics"
+config = Config()
+
+API_PATH = "api/v1/topics/get-lms-topics"
 CLASS_ID = 2328
-FAKE_DATA_FILE_PATH = "bin/curriculum.json"
+ENDPOINT = "topics"
+
+
+def item_key(item: dict):
+    return item.get("id")
+
+
+probe = FilterProbe(ENDPOINT, item_key)
+
 
+def fetch_curriculum(class_id: int = CLASS_ID, full: bool = False):
+    def fetch(params):
+        return post_json(
+            api_url(API_PATH), ENDPOINT, {"class_id": class_id, **params}
+        )
 
-def fetch_curriculum():
-    FAKE = False
-    if FAKE:
-        # Read and load the JSON data
-        with open(FAKE_DATA_FILE_PATH, "r") as file:
-            data = json.load(file)
+    try:
+        if full or not config.probe_filters:
+            data = fetch({})
+        else:
+            data = probe.fetch(fetch)
+        record_payload(ENDPOINT, data, is_complete(data))
         return data
-    else:
-        try:
-            response = auth_request.post(API_URL, data={"class_id": CLASS_ID})
-            response.raise_for_status()
+    except auth_request.exceptions.RequestException as e:
+        print(f"Error checking API: {str(e)}")
+
+
+def find_mcq_papers(data: list, rules: RuleSet) -> Dict[str, Paper]:
+    """
+    Find the MCQ papers matching watch rules in a topics payload
+
+    Args:
+        data: The decoded response of the topics API
+        rules: The compiled watch rules
 
-            data = response.json()
-            return data
-        except auth_request.exceptions.RequestException as e:
-            print(f"Error checking API: {str(e)}")
+    Returns:
+        The paper found for each matching rule, keyed by rule name
+    """
+    topics = {}
+    for item in data:
+        for rule in rules.match(item.get("topic_title", "")):
+            if rule.paper_type != Paper.PaperType.MCQ:
+                continue
+            if rule.material_types and not any(
+                material.get("material_type") in rule.material_types
+                for material in item.get("materials", [])
+            ):
+                continue
+            # The last matching topic wins
+            topics[rule.name] = item
+
+    return {
+        name: Paper(
+            id=str(topic.get("id")),
+            name=topic.get("topic_title"),
+            type=Paper.PaperType.MCQ,
+            materials=Material.get_paper_materials(topic.get("materials")),
+        )
+        for name, topic in topics.items()
+    }
+
+
+def find_mcq_paper(data: list, paper_number: int) -> Paper | None:
+    """
+    Find a PET MCQ paper with a specific number in a topics payload
+
+    Args:
+        data: The decoded response of the topics API
+        paper_number: The specific mcq paper number to search for
+
+    Returns:
+        A Paper object for the matching topic, or None if it's not out yet.
+    """
+    rule = WatchRule.for_paper(paper_number, Paper.PaperType.MCQ)
+    return find_mcq_papers(data, compile_rules((rule,))).get(rule.name)
 
 
 def check_for_mcq(paper_number: int) -> Paper | NoReturn:
@@ -37,32 +97,6 @@ def check_for_mcq(paper_number: int) -> Paper | NoReturn:
 
     try:
         data = fetch_curriculum()
-
-        # Look for PET with specific MCQ number in the response
-        paper = None
-        mcq_str = str(paper_number)  # Convert to string for comparison
-
-        for item in data:
-            title = item.get("topic_title", "").lower()
-            # Check for titles containing both "pet" and the specific MCQ number
-            if (
-                "pet" in title
-                and (mcq_str in title or f"{mcq_str} mcq" in title)
-                and ("marking" not in title)
-            ):
-                for material in item.get("materials", []):
-                    if material.get("material_type") == "DOCUMENT":
-                        paper = item
-                        break
-
-        if paper:
-            return Paper(
-                id=str(paper.get("id")),
-                name=paper.get("topic_title"),
-                type=Paper.PaperType.MCQ,
-                # unlocks_at=paper.get("unlocks_at"),
-                # expires_at=paper.get("expires_at"),
-                materials=Material.get_paper_materials(paper.get("materials")),
-            )
+        return find_mcq_paper(data, paper_number)
     except Exception as e:
         print(str(e))
@@ -0,0 +1,88 @@
+from typing import Dict, List, Optional, Set
+
+from . import check_essay, check_mcq
+from .api import is_complete
+from .catalogue import catalogue
+from .check_essay import fetch_essay_data, find_essay_papers
+from .check_mcq import fetch_curriculum, find_mcq_papers
+from .data_types import Paper
+from .deadline import POLL_DEADLINE, deadline
+from .rules import RuleSet
+
+
+def check_for_rules(
+    rules: RuleSet, seconds: Optional[float] = POLL_DEADLINE
+) -> Dict[str, Paper]:
+    """
+    Check the APIs needed by a set of watch rules in one go.
+
+    Only the endpoints holding the paper types of the rules are polled, and
+    the payloads are joined into the paper catalogue as they come in.
+    Filtered payloads only add to the catalogue, they never remove from it.
+
+    Args:
+        rules: The compiled watch rules
+        seconds: Deadline of the whole check, requests still running when
+            it passes are cancelled
+
+    Returns:
+        The paper found for each matching rule, keyed by rule name
+    """
+    papers = {}
+    paper_types = {rule.paper_type for rule in rules.rules}
+    try:
+        with deadline(seconds):
+            if Paper.PaperType.MCQ in paper_types:
+                data = fetch_curriculum()
+                if data is not None:
+                    catalogue.update(
+                        check_mcq.ENDPOINT, data, is_complete(data)
+                    )
+                    papers.update(find_mcq_papers(data, rules))
+            if Paper.PaperType.ESSAY in paper_types:
+                exams = fetch_essay_data()
+                if exams is not None:
+                    catalogue.update(
+                        check_essay.ENDPOINT, exams, is_complete(exams)
+                    )
+                    papers.update(find_essay_papers(exams, rules))
+    except Exception as e:
+        print(str(e))
+    return papers
+
+
+def check_catalogue(
+    numbers: Optional[List[int]] = None,
+    seconds: Optional[float] = POLL_DEADLINE,
+) -> Set[int]:
+    """
+    Poll the endpoints into the paper catalogue.
+
+    Args:
+        numbers: Papers of interest, only the endpoints still missing a half
+            of one of them are polled. Every endpoint is polled if not given
+        seconds: Deadline of the whole poll
+
+    Returns:
+        The numbers of the papers that changed
+    """
+    if numbers:
+        endpoints = catalogue.missing_endpoints(numbers)
+    else:
+        endpoints = {check_mcq.ENDPOINT, check_essay.ENDPOINT}
+
+    changed = set()
+    with deadline(seconds):
+        if check_mcq.ENDPOINT in endpoints:
+            data = fetch_curriculum()
+            if data is not None:
+                changed |= catalogue.update(
+                    check_mcq.ENDPOINT, data, is_complete(data)
+                )
+        if check_essay.ENDPOINT in endpoints:
+            exams = fetch_essay_data()
+            if exams is not None:
+                changed |= catalogue.update(
+                    check_essay.ENDPOINT, exams, is_complete(exams)
+                )
+    return changed
@@ -0,0 +1,278 @@
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Set
+
+from . import check_essay, check_mcq
+from .data_types import Paper, WatchRule
+
+LEASE_SECONDS = 30
+HEARTBEAT_INTERVAL = 10  # Seconds between lease renewals
+FORGET_AFTER = 10  # Leases after which a silent node is forgotten
+CLAIM_SECONDS = 6 * 60 * 60  # How long a notification claim holds
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    node TEXT PRIMARY KEY,
+    account TEXT NOT NULL,
+    heartbeat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    shard TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS notification_claims (
+    account TEXT NOT NULL,
+    rule TEXT NOT NULL,
+    paper_id TEXT NOT NULL,
+    node TEXT NOT NULL,
+    notified_at REAL NOT NULL,
+    PRIMARY KEY (account, rule, paper_id)
+);
+"""
+
+
+def shard_key(account: str, class_id: int, endpoint: str) -> str:
+    return f"{account}:{class_id}:{endpoint}"
+
+
+def rule_shard(account: str, class_id: int, rule: WatchRule) -> str:
+    """
+    Get the shard holding the endpoint a watch rule is matched against.
+
+    Args:
+        account: Account the rule is polled with
+        class_id: Class the rule is polled in
+        rule: The watch rule
+    """
+    if rule.paper_type == Paper.PaperType.ESSAY:
+        endpoint = check_essay.ENDPOINT
+    else:
+        endpoint = check_mcq.ENDPOINT
+    return shard_key(account, class_id, endpoint)
+
+
+def default_node_id() -> str:
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class Cluster:
+    """
+    Watchers sharing the polling work through leases in a SQLite database.
+
+    Each (account, class, endpoint) shard is polled by the one node holding
+    its lease. Nodes renew their leases from a background thread, but only
+    until the next poll they promised with `expect_poll`, so a node stuck
+    in a prompt loses its shards. Nodes take over the shards of nodes whose
+    leases ran out. Shards are spread evenly over the live nodes of an
+    account, and each paper found by a watch rule is notified by only one
+    node. Notification claims expire after `claim_seconds`.
+
+    The database can be on a shared path, but SQLite locking is unreliable
+    on some network filesystems.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        account: str,
+        node_id: Optional[str] = None,
+        lease_seconds: float = LEASE_SECONDS,
+        claim_seconds: float = CLAIM_SECONDS,
+    ):
+        self.path = path
+        self.account = account
+        self.node_id = node_id or default_node_id()
+        self.lease_seconds = lease_seconds
+        self.claim_seconds = claim_seconds
+        self.owned: Set[str] = set()
+        self.started_at = time.time()
+        # The heartbeat only renews leases until then (monotonic time)
+        self._renew_until = 0.0
+        self._stopped = threading.Event()
+        self._heartbeat: Optional[threading.Thread] = None
+        db = self._connect()
+        try:
+            db.executescript(SCHEMA)
+        finally:
+            db.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per call, so the heartbeat thread needs no locking
+        db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def _transaction(self, work):
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(db, time.time())
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+            return result
+        finally:
+            db.close()
+
+    def _beat(self, db: sqlite3.Connection, now: float):
+        db.execute(
+            "INSERT OR REPLACE INTO nodes VALUES (?, ?, ?)",
+            (self.node_id, self.account, now),
+        )
+        db.execute(
+            "UPDATE leases SET expires_at = ? WHERE owner = ?",
+            (now + self.lease_seconds, self.node_id),
+        )
+
+    def acquire(self, shards: List[str]) -> Set[str]:
+        """
+        Renew, claim and give up leases so this node holds its fair share.
+
+        Args:
+            shards: Every shard of the account of this node
+
+        Returns:
+            The shards this node should poll
+        """
+
+        def work(db: sqlite3.Connection, now: float) -> Set[str]:
+            self._beat(db, now)
+            db.execute(
+                "DELETE FROM nodes WHERE heartbeat < ?",
+                (now - FORGET_AFTER * self.lease_seconds,),
+            )
+            live_nodes = db.execute(
+                "SELECT COUNT(*) FROM nodes"
+                " WHERE account = ? AND heartbeat > ?",
+                (self.account, now - self.lease_seconds),
+            ).fetchone()[0]
+            share = math.ceil(len(shards) / max(live_nodes, 1))
+
+            leases = {
+                shard: (owner, expires_at)
+                for shard, owner, expires_at in db.execute(
+                    "SELECT shard, owner, expires_at FROM leases"
+                )
+            }
+            owned = [
+                shard
+                for shard in shards
+                if leases.get(shard, ("", 0))[0] == self.node_id
+            ]
+            # Leave shards nobody watches anymore, and those over our share
+            # for nodes that just joined
+            released = [
+                shard
+                for shard, (owner, _) in leases.items()
+                if owner == self.node_id and shard not in shards
+            ] + owned[share:]
+            for shard in released:
+                db.execute(
+                    "DELETE FROM leases WHERE shard = ? AND owner = ?",
+                    (shard, self.node_id),
+                )
+            owned = owned[:share]
+
+            for shard in shards:
+                if len(owned) >= share:
+                    break
+                if shard in owned:
+                    continue
+                owner, expires_at = leases.get(shard, (None, 0))
+                if owner is None or expires_at < now:
+                    db.execute(
+                        "INSERT OR REPLACE INTO leases VALUES (?, ?, ?)",
+                        (shard, self.node_id, now + self.lease_seconds),
+                    )
+                    owned.append(shard)
+            return set(owned)
+
+        self.expect_poll(self.lease_seconds)
+        owned = self._transaction(work)
+        for shard in owned - self.owned:
+            print(f"\nNode {self.node_id} took over {shard}")
+        self.owned = owned
+        return owned
+
+    def expect_poll(self, seconds: float):
+        """
+        Keep renewing the leases for as long as the next poll may take.
+
+        Args:
+            seconds: Time until the poll loop calls `acquire` again
+        """
+        self._renew_until = time.monotonic() + seconds
+
+    def claim_notification(self, rule: str, paper: Paper) -> bool:
+        """
+        Claim the notification of a paper found by a watch rule.
+
+        Returns:
+            True if this node should notify, False if another node has
+        """
+
+        def work(db: sqlite3.Connection, now: float) -> bool:
+            db.execute(
+                "DELETE FROM notification_claims WHERE notified_at < ?",
+                (now - self.claim_seconds,),
+            )
+            cursor = db.execute(
+                "INSERT OR IGNORE INTO notification_claims"
+                " VALUES (?, ?, ?, ?, ?)",
+                (self.account, rule, str(paper.id), self.node_id, now),
+            )
+            return cursor.rowcount == 1
+
+        return self._transaction(work)
+
+    def notified_rules(self) -> Set[str]:
+        """Get the watch rules of this account notified since it started."""
+        db = self._connect()
+        try:
+            return {
+                row[0]
+                for row in db.execute(
+                    "SELECT rule FROM notification_claims"
+                    " WHERE account = ? AND notified_at >= ?",
+                    (self.account, self.started_at),
+                )
+            }
+        finally:
+            db.close()
+
+    def _run_heartbeat(self):
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            # A poll loop that's late is stuck, let other nodes take over
+            if time.monotonic() > self._renew_until:
+                continue
+            try:
+                self._transaction(self._beat)
+            except sqlite3.Error as e:
+                print(f"Failed to renew leases: {e}")
+
+    def start(self):
+        """Renew the leases of this node in the background."""
+        self._stopped.clear()
+        self.started_at = time.time()
+        self._heartbeat = threading.Thread(
+            target=self._run_heartbeat, name="cluster", daemon=True
+        )
+        self._heartbeat.start()
+
+    def stop(self):
+        """Stop renewing and hand every lease over to the other nodes."""
+        self._stopped.set()
+
+        def work(db: sqlite3.Connection, now: float):
+            db.execute("DELETE FROM leases WHERE owner = ?", (self.node_id,))
+            db.execute("DELETE FROM nodes WHERE node = ?", (self.node_id,))
+
+        self._transaction(work)
+        self.owned = set()
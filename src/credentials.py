@@ -0,0 +1,122 @@
+import json
+import os
+from typing import Optional
+
+import keyring
+from cryptography.fernet import Fernet, InvalidToken
+
+CREDENTIALS_FOLDER = os.path.join(os.path.expanduser("~"), ".apex-lms-watcher")
+KEYRING_SERVICE = "apex-lms-watcher"
+KEYRING_KEY_NAME = "fernet-key"
+
+KEY_FILE_WARNING = """
+WARNING: No system keyring is available ({error}).
+The key of the credential store is kept in {path}, next to the store
+itself. Anyone who can read that folder can read your password.
+"""
+
+
+class CredentialStoreError(Exception):
+    pass
+
+
+def encrypt(key: bytes, plaintext: bytes) -> bytes:
+    """Encrypt and authenticate `plaintext` with a Fernet key."""
+    return Fernet(key).encrypt(plaintext)
+
+
+def decrypt(key: bytes, data: bytes) -> bytes:
+    """Check and decrypt data produced by `encrypt`."""
+    try:
+        return Fernet(key).decrypt(data)
+    except (InvalidToken, ValueError):
+        raise CredentialStoreError("Credential store is corrupted")
+
+
+def _write_private(path: str, data: bytes):
+    # Create the file readable by the owner only before writing anything
+    partial_path = f"{path}.part"
+    fd = os.open(partial_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as file:
+        file.write(data)
+    os.replace(partial_path, path)
+
+
+class CredentialStore:
+    """
+    Encrypted store for the password and the last session.
+
+    Secrets are kept as one file encrypted with Fernet. Its key lives in
+    the system keyring, or in a key file only readable by the user when no
+    keyring is available, with a warning.
+    """
+
+    def __init__(self, folder: str = CREDENTIALS_FOLDER, use_keyring=True):
+        self.folder = folder
+        self.path = os.path.join(folder, "credentials")
+        self.key_path = os.path.join(folder, "fernet.key")
+        self.use_keyring = use_keyring
+        self._key: Optional[bytes] = None
+        self._secrets: Optional[dict] = None
+
+    def _master_key(self) -> bytes:
+        if self._key:
+            return self._key
+
+        if self.use_keyring:
+            try:
+                stored = keyring.get_password(KEYRING_SERVICE, KEYRING_KEY_NAME)
+                if not stored:
+                    stored = Fernet.generate_key().decode()
+                    keyring.set_password(
+                        KEYRING_SERVICE, KEYRING_KEY_NAME, stored
+                    )
+                self._key = stored.encode()
+                return self._key
+            except Exception as e:
+                print(KEY_FILE_WARNING.format(error=e, path=self.key_path))
+                self.use_keyring = False
+
+        os.makedirs(self.folder, mode=0o700, exist_ok=True)
+        if os.path.exists(self.key_path):
+            with open(self.key_path, "rb") as file:
+                self._key = file.read()
+        else:
+            self._key = Fernet.generate_key()
+            _write_private(self.key_path, self._key)
+        return self._key
+
+    def _load(self) -> dict:
+        if self._secrets is None:
+            self._secrets = {}
+            if os.path.exists(self.path):
+                with open(self.path, "rb") as file:
+                    data = file.read()
+                try:
+                    self._secrets = json.loads(
+                        decrypt(self._master_key(), data)
+                    )
+                except CredentialStoreError as e:
+                    print(f"{e}, starting with an empty one")
+        return self._secrets
+
+    def _save(self):
+        os.makedirs(self.folder, mode=0o700, exist_ok=True)
+        data = json.dumps(self._load()).encode()
+        _write_private(self.path, encrypt(self._master_key(), data))
+
+    def get(self, name: str):
+        return self._load().get(name)
+
+    def set(self, name: str, value):
+        if self._load().get(name) == value:
+            return
+        self._secrets[name] = value
+        self._save()
+
+    def delete(self, name: str):
+        if self._load().pop(name, None) is not None:
+            self._save()
+
+
+credential_store = CredentialStore()
@@ -1,32 +1,137 @@
 import os
+import threading
 from datetime import datetime
 from enum import Enum
-from typing import ClassVar, List, Optional
+from typing import Any, ClassVar, Dict, List, Optional, Tuple
 
-import dateutil.parser
+import yaml
 from InquirerPy import inquirer
 from pydantic import (
     BaseModel,
+    ConfigDict,
     Field,
+    TypeAdapter,
     field_serializer,
     field_validator,
 )
 from pydantic_settings import (
     BaseSettings,
     PydanticBaseSettingsSource,
-    YamlConfigSettingsSource,
 )
 
+from .credentials import credential_store
+from .timestamps import format_timestamp, parse_timestamp
+
+# Use the C implementation of the YAML parser when libyaml is available
+YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+YamlDumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
 CONFIG_INQUIRERS = {
     "download_folder": inquirer.text(message="Download folder:"),
     "notification_sound_file": inquirer.text(
         message="Notification sound file:", default="alarm.mp3"
     ),
     "username": inquirer.text(message="Username:"),
-    "password": inquirer.text(message="Password:"),
+    "password": inquirer.secret(message="Password:"),
 }
 
 
+def prompt_config(name: str):
+    """
+    Ask for a config value that isn't set.
+
+    Raises:
+        ValueError: If not called from the main thread, which owns the
+            terminal, e.g. when the config is reloaded in the background
+    """
+    if threading.current_thread() is not threading.main_thread():
+        raise ValueError(f"{name} is not set")
+    return CONFIG_INQUIRERS[name].execute()
+
+
+# Parsed config files, keyed by path, with the mtime and size they were read at
+_CONFIG_FILE_CACHE: Dict[str, Tuple[Tuple[int, int], dict]] = {}
+
+
+def load_config_file(path: str) -> dict:
+    """
+    Parse a YAML config file, reusing the last result if it's unchanged.
+
+    Args:
+        path: Path to the config file
+
+    Returns:
+        The parsed values, the same object as long as the file is unchanged
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return {}
+    stamp = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _CONFIG_FILE_CACHE.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    with open(path, "r", encoding="utf-8") as file:
+        values = yaml.load(file, Loader=YamlLoader) or {}
+    _CONFIG_FILE_CACHE[path] = (stamp, values)
+    return values
+
+
+class CachedYamlSettingsSource(PydanticBaseSettingsSource):
+    """Settings source reading a YAML file through `load_config_file`."""
+
+    def __init__(self, settings_cls, path: str):
+        super().__init__(settings_cls)
+        self.path = path
+
+    def get_field_value(self, field, field_name):
+        return self().get(field_name), field_name, False
+
+    def __call__(self) -> Dict[str, Any]:
+        return dict(load_config_file(self.path))
+
+
+class WatchRule(BaseModel):
+    """
+    Declarative description of a paper to watch for.
+
+    Token patterns match case-insensitively anywhere in a topic or exam
+    title, regexes are searched in it.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    name: str
+    paper_type: "Paper.PaperType" = "MCQ"
+    all_of: Tuple[str, ...] = ()  # Every token must be in the title
+    any_of: Tuple[str, ...] = ()  # At least one token must be in the title
+    regex: Tuple[str, ...] = ()  # At least one regex must match the title
+    exclude: Tuple[str, ...] = ()  # No token may be in the title
+    material_types: Tuple[str, ...] = ()  # Required material types (MCQ)
+
+    @classmethod
+    def for_paper(
+        cls, paper_number: int, paper_type: "Paper.PaperType"
+    ) -> "WatchRule":
+        """Rule matching PET papers with a number, the way it always did."""
+        paper_type = Paper.PaperType(paper_type)
+        if paper_type == Paper.PaperType.MCQ:
+            return cls(
+                name=f"PET {paper_number} MCQ",
+                paper_type=paper_type,
+                all_of=("pet", str(paper_number)),
+                exclude=("marking",),
+                material_types=("DOCUMENT",),
+            )
+        return cls(
+            name=f"PET {paper_number} ESSAY",
+            paper_type=paper_type,
+            all_of=("pet", str(paper_number)),
+        )
+
+
 class BaseSettingsSingleton(BaseSettings):
     _instance: ClassVar[Optional["BaseSettingsSingleton"]] = None
     _is_initialized: ClassVar[bool] = False
@@ -53,9 +158,29 @@ class Config(BaseSettingsSingleton):
 
     download_folder: Optional[str] = None
     notification_sound_file: Optional[str] = None
+    audio_backend: Optional[str] = None  # "miniaudio", "playsound" or "null"
+    auto_prefetch: bool = True
+    http2: bool = False
+    hedge_requests: bool = False
+    max_download_rate: Optional[float] = None  # kB/s over all downloads
+    max_connections_per_host: int = 4
+    downloads_paused: bool = False
+    probe_filters: bool = True
+    catalogue_snapshot: Optional[str] = "catalogue.snapshot"
+    api_base_url: str = "https://apexonline.lk/"
+    watch_rules: List[WatchRule] = Field(default_factory=list)
 
     username: Optional[str] = None
-    password: Optional[str] = None
+    # Kept in the credential store rather than in the config file
+    password: Optional[str] = Field(default=None, exclude=True)
+
+    _loaded_values: Optional[dict] = None
+
+    def __init__(self, *args, **kwargs):
+        if self._is_initialized:
+            return
+        super().__init__(*args, **kwargs)
+        self._loaded_values = load_config_file(self.config_file_name)
 
     @classmethod
     def settings_customise_sources(
@@ -67,13 +192,82 @@ class Config(BaseSettingsSingleton):
         file_secret_settings: PydanticBaseSettingsSource,
     ):
         # Only use YAML as the source
-        return (YamlConfigSettingsSource(settings_cls, "config.yaml"),)
+        return (CachedYamlSettingsSource(settings_cls, cls.config_file_name),)
+
+    def save(self) -> bool:
+        """
+        Write the config to the config file if any of its values changed.
+
+        Returns:
+            True if the file was written
+        """
+        values = self.model_dump(mode="json")
+        if load_config_file(self.config_file_name) == values:
+            return False
+
+        with open(self.config_file_name, "w", encoding="utf-8") as file:
+            yaml.dump(
+                values,
+                file,
+                Dumper=YamlDumper,
+                default_flow_style=False,
+                sort_keys=False,
+            )
+        stat = os.stat(self.config_file_name)
+        _CONFIG_FILE_CACHE[self.config_file_name] = (
+            (stat.st_mtime_ns, stat.st_size),
+            values,
+        )
+        self._loaded_values = values
+        return True
+
+    def reload(self) -> List[str]:
+        """
+        Pick up changes to the config file, validating only changed fields.
+
+        Values are compared after parsing them into their field types, and
+        fields no longer in the file go back to their defaults. Nothing is
+        changed if a field fails to validate.
+
+        Returns:
+            The names of the fields that changed
+
+        Raises:
+            ValidationError: If a changed field is invalid, or missing and
+                can't be prompted for outside the main thread
+        """
+        values = load_config_file(self.config_file_name)
+        if values is self._loaded_values:
+            return []
+        # A broken file is reported once, not on every reload
+        self._loaded_values = values
+
+        previous = {}
+        try:
+            for name, field in type(self).model_fields.items():
+                if field.exclude:
+                    continue
+                if name in values:
+                    value = values[name]
+                else:
+                    value = field.get_default(call_default_factory=True)
+                current = getattr(self, name)
+                if _field_adapter(name).validate_python(value) == current:
+                    continue
+                previous[name] = current
+                self.__pydantic_validator__.validate_assignment(
+                    self, name, value
+                )
+        except Exception:
+            self.__dict__.update(previous)
+            raise
+        return list(previous)
 
     @field_validator("download_folder", mode="plain")
     @classmethod
     def validate_download_folder(cls, value):
         if not value:
-            value = CONFIG_INQUIRERS["download_folder"].execute()
+            value = prompt_config("download_folder")
         os.makedirs(value, exist_ok=True)
         return value
 
@@ -81,7 +275,7 @@ class Config(BaseSettingsSingleton):
     @classmethod
     def validate_notification_sound_file(cls, value):
         if not value:
-            value = CONFIG_INQUIRERS["notification_sound_file"].execute()
+            value = prompt_config("notification_sound_file")
         if not value.endswith(".mp3"):
             raise ValueError(f"Notification sound must be an MP3 file: {value}")
         if not os.path.exists(value):
@@ -95,22 +289,49 @@ class Config(BaseSettingsSingleton):
     @classmethod
     def validate_username(cls, value):
         if not value:
-            value = CONFIG_INQUIRERS["username"].execute()
+            value = prompt_config("username")
         return value
 
     @field_validator("password", mode="plain")
     @classmethod
     def validate_password(cls, value):
+        stored = credential_store.get("password")
         if not value:
-            value = CONFIG_INQUIRERS["password"].execute()
+            value = stored
+        if not value:
+            value = prompt_config("password")
+        if value != stored:
+            credential_store.set("password", value)
         return value
 
 
+_FIELD_ADAPTERS: Dict[str, TypeAdapter] = {}
+
+
+def _field_adapter(name: str) -> TypeAdapter:
+    """Get the adapter parsing a config field without its validators."""
+    if name not in _FIELD_ADAPTERS:
+        _FIELD_ADAPTERS[name] = TypeAdapter(
+            Config.model_fields[name].annotation
+        )
+    return _FIELD_ADAPTERS[name]
+
+
 class Material(BaseModel):
     """Pydantic model representing a material in a paper."""
 
     name: Optional[str] = None
     download_link: Optional[str] = None
+    unlocks_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+
+    @field_validator("unlocks_at", "expires_at", mode="plain")
+    def parse_datetime_fields(cls, value):
+        return parse_timestamp(value)
+
+    @field_serializer("unlocks_at", "expires_at", when_used="always")
+    def format_datetime(self, value: Optional[datetime]) -> Optional[str]:
+        return format_timestamp(value)
 
     @staticmethod
     def get_paper_materials(materials_list: List[dict]) -> List["Material"]:
@@ -135,6 +356,8 @@ class Material(BaseModel):
                         Material(
                             name=material.get("material_title"),
                             download_link=material.get("user_link"),
+                            unlocks_at=material.get("unlock_timestamp"),
+                            expires_at=material.get("expire_timestamp"),
                         )
                     )
         return paper_materials
@@ -157,15 +380,11 @@ class Paper(BaseModel):
 
     @field_validator("unlocks_at", "expires_at", mode="plain")
     def parse_datetime_fields(cls, value):
-        if isinstance(value, str):
-            try:
-                return dateutil.parser.isoparse(value)
-            except Exception:
-                raise ValueError(f"Invalid datetime string: {value}")
-        return value
+        return parse_timestamp(value)
 
     @field_serializer("unlocks_at", "expires_at", when_used="always")
-    def format_datetime(cls, value: Optional[datetime]) -> Optional[str]:
-        if isinstance(value, datetime):  # Ensure it's a datetime object
-            return value.strftime("%Y-%m-%d %H:%M:%S")
-        return None
+    def format_datetime(self, value: Optional[datetime]) -> Optional[str]:
+        return format_timestamp(value)
+
+
+WatchRule.model_rebuild()
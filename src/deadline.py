@@ -0,0 +1,215 @@
+import contextvars
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from typing import Callable, Deque, Optional, Tuple, TypeVar
+
+import requests as rq
+
+from .slo import percentile
+
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 20
+POLL_DEADLINE = 45  # Seconds a whole poll cycle may take
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20  # Latencies needed before requests are hedged
+HEDGE_WINDOW = 200  # Latencies kept per endpoint
+
+T = TypeVar("T")
+
+# Monotonic time the current poll cycle has to finish by
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+
+class DeadlineExceeded(rq.exceptions.Timeout):
+    """The poll cycle ran out of time."""
+
+
+@contextmanager
+def deadline(seconds: Optional[float] = POLL_DEADLINE):
+    """
+    Run a block under a deadline. Nested deadlines can only shorten it.
+
+    Args:
+        seconds: Seconds the block may take, no deadline if None
+    """
+    if seconds is None:
+        yield
+        return
+    end = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(end if outer is None else min(outer, end))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Get the seconds left before the current deadline, if there is one."""
+    end = _deadline.get()
+    return None if end is None else end - time.monotonic()
+
+
+def check_deadline():
+    """Raise DeadlineExceeded if the current deadline has passed."""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded("Poll cycle deadline exceeded")
+
+
+def request_timeout() -> Tuple[float, float]:
+    """Get the connect and read timeouts, cut short by the deadline."""
+    check_deadline()
+    left = remaining()
+    if left is None:
+        return CONNECT_TIMEOUT, READ_TIMEOUT
+    return min(CONNECT_TIMEOUT, left), min(READ_TIMEOUT, left)
+
+
+class RequestCancelled(Exception):
+    """A request was cancelled before it finished."""
+
+
+def _interrupt(response):
+    # urllib3 2.3 and later can stop a read in progress, older versions and
+    # the HTTP/2 transport can only close the response
+    shutdown = getattr(response.raw, "shutdown", None)
+    if shutdown:
+        shutdown()
+    else:
+        response.close()
+
+
+class Cancellation:
+    """
+    Cancels running requests from another thread.
+
+    A response read blocks until data arrives, so requests are cancelled by
+    shutting down the connection of their responses, which makes a blocked
+    read fail.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._responses = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        with self._lock:
+            self._event.set()
+            responses, self._responses = self._responses, []
+        for response in responses:
+            _interrupt(response)
+
+    @contextmanager
+    def watch(self, response):
+        """
+        Read a response, closing it if cancelled or past the deadline.
+
+        Raises:
+            DeadlineExceeded: If the deadline passed while reading
+            RequestCancelled: If the request was cancelled while reading
+        """
+        with self._lock:
+            if not self.cancelled:
+                self._responses.append(response)
+        if self.cancelled:
+            _interrupt(response)
+
+        left = remaining()
+        timer = None
+        if left is not None:
+            timer = threading.Timer(max(left, 0), self.cancel)
+            timer.daemon = True
+            timer.start()
+        try:
+            yield
+        except Exception as e:
+            if self.cancelled:
+                check_deadline()
+                raise RequestCancelled() from e
+            raise
+        finally:
+            if timer:
+                timer.cancel()
+        # A closed response can also just look like it ended early
+        if self.cancelled:
+            check_deadline()
+            raise RequestCancelled()
+
+
+class LatencyTracker:
+    """Recent latencies of a request, to know when one is running late."""
+
+    def __init__(self, window: int = HEDGE_WINDOW):
+        self.latencies: Deque[float] = deque(maxlen=window)
+
+    def add(self, latency: float):
+        self.latencies.append(latency)
+
+    def threshold(self) -> Optional[float]:
+        """Get the latency after which to hedge, None until enough samples."""
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return percentile(list(self.latencies), HEDGE_PERCENTILE)
+
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+
+def hedged(call: Callable[[Cancellation], T], tracker: LatencyTracker) -> T:
+    """
+    Run a request, sending a second one if the first is running late.
+
+    The second request is sent once the first has taken longer than the
+    tracked p95 latency. Whichever answers first wins and the other is
+    cancelled.
+
+    Args:
+        call: Sends the request, watching its response with the given
+            cancellation
+        tracker: Latencies of the request, updated with the winner's
+
+    Returns:
+        The result of the first request to succeed
+    """
+    threshold = tracker.threshold()
+    started_at = time.monotonic()
+    if threshold is None:
+        result = call(Cancellation())
+        tracker.add(time.monotonic() - started_at)
+        return result
+
+    cancels = [Cancellation(), Cancellation()]
+    # Copy the context so the requests keep the deadline of the caller
+    futures = [
+        _executor.submit(contextvars.copy_context().run, call, cancels[0])
+    ]
+    done, _ = wait(futures, timeout=threshold)
+    if not done:
+        futures.append(
+            _executor.submit(contextvars.copy_context().run, call, cancels[1])
+        )
+
+    pending = set(futures)
+    error: Optional[BaseException] = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                for other, cancel in zip(futures, cancels):
+                    if other is not future:
+                        cancel.cancel()
+                tracker.add(time.monotonic() - started_at)
+                return future.result()
+            error = future.exception()
+    raise error
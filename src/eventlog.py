@@ -0,0 +1,315 @@
+import json
+import os
+import queue
+import threading
+import zlib
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .data_types import Paper
+from .slo import DetectionRecord
+
+EVENT_LOG_FILE = "events.log"
+CHECKPOINT_FILE = "event_checkpoints.json"
+APPEND_TIMEOUT = 30  # Seconds an append waits for its event to be on disk
+COMPACT_AFTER = 64 * 1024  # Bytes of handled events before compacting
+
+
+class EventLogError(Exception):
+    """An event couldn't be written to the log."""
+
+
+class _Append:
+    """An event waiting in the queue of the writer thread."""
+
+    def __init__(self, line: bytes):
+        self.line = line
+        self.written = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class DetectionEvent(BaseModel):
+    """A found paper, logged before anything is done about it."""
+
+    rule: Optional[str] = None
+    paper: Paper
+    detection: Optional[DetectionRecord] = None
+
+
+def _encode(seq: int, event: DetectionEvent) -> bytes:
+    body = event.model_dump_json()
+    checksum = zlib.crc32(body.encode())
+    return f"{seq}\t{checksum:08x}\t{body}\n".encode()
+
+
+def _decode(line: bytes) -> Optional[Tuple[int, DetectionEvent]]:
+    try:
+        seq, checksum, body = line.decode().rstrip("\n").split("\t", 2)
+        if int(checksum, 16) != zlib.crc32(body.encode()):
+            return None
+        return int(seq), DetectionEvent.model_validate_json(body)
+    except ValueError:
+        return None
+
+
+class EventLog:
+    """
+    Append-only write-ahead log of detections.
+
+    Events are on disk before they're dispatched, so a crash while notifying
+    doesn't lose them. Appends from all threads are written by one writer
+    thread, which syncs each batch of appends with a single fsync. An error
+    writing a batch is raised by the appends waiting for it. A torn last
+    line left by a crash is dropped when the log is opened. Handled events
+    are dropped by `compact`.
+    """
+
+    def __init__(self, path: str = EVENT_LOG_FILE):
+        self.path = path
+        self.last_seq = 0
+        valid_size = 0
+        for seq, _, end in self._scan():
+            self.last_seq = seq
+            valid_size = end
+        if os.path.exists(path) and os.path.getsize(path) > valid_size:
+            with open(path, "r+b") as file:
+                file.truncate(valid_size)
+        # Events above it were appended by this process
+        self.opened_seq = self.last_seq
+
+        self._file = open(path, "ab")
+        self._lock = threading.Lock()
+        # Held while writing to the file, and while compaction replaces it
+        self._file_lock = threading.Lock()
+        self._pending: "queue.Queue[_Append]" = queue.Queue()
+        self._writer = threading.Thread(
+            target=self._write, name="eventlog", daemon=True
+        )
+        self._writer.start()
+
+    def _scan(
+        self, start: int = 0
+    ) -> Iterator[Tuple[int, DetectionEvent, int]]:
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as file:
+            file.seek(start)
+            end = start
+            for line in file:
+                decoded = _decode(line) if line.endswith(b"\n") else None
+                if decoded is None:
+                    return
+                end += len(line)
+                yield decoded[0], decoded[1], end
+
+    def _write(self):
+        while True:
+            batch = [self._pending.get()]
+            while not self._pending.empty():
+                batch.append(self._pending.get())
+            with self._file_lock:
+                size = None
+                try:
+                    size = self._file.tell()
+                    self._file.write(b"".join(append.line for append in batch))
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                except Exception as e:
+                    # Don't leave part of the batch for the next one to
+                    # follow, and let every append waiting for it know
+                    for append in batch:
+                        append.error = e
+                    if size is not None:
+                        try:
+                            self._file.truncate(size)
+                        except (OSError, ValueError):
+                            pass
+            for append in batch:
+                append.written.set()
+
+    def append(
+        self, event: DetectionEvent, timeout: Optional[float] = APPEND_TIMEOUT
+    ) -> int:
+        """
+        Append an event, waiting until it's on disk.
+
+        Args:
+            event: The event to log
+            timeout: Seconds to wait for the write, forever if None
+
+        Returns:
+            The sequence number of the event
+
+        Raises:
+            EventLogError: If the event couldn't be written in time
+        """
+        with self._lock:
+            self.last_seq += 1
+            seq = self.last_seq
+            append = _Append(_encode(seq, event))
+            # Queued under the lock so lines stay in sequence order
+            self._pending.put(append)
+        if not append.written.wait(timeout):
+            raise EventLogError(f"Timed out writing event {seq} to {self.path}")
+        if append.error is not None:
+            raise EventLogError(
+                f"Failed to write event {seq} to {self.path}: {append.error}"
+            ) from append.error
+        return seq
+
+    def read(
+        self, after: int = 0, start: int = 0
+    ) -> Iterator[Tuple[int, DetectionEvent, int]]:
+        """
+        Read the events with a sequence number above `after`.
+
+        Args:
+            after: Sequence number of the last event not wanted
+            start: Byte offset to read from, the end of an event read before
+
+        Returns:
+            The sequence number, event and end offset of each event
+        """
+        for seq, event, end in self._scan(start):
+            if seq > after:
+                yield seq, event, end
+
+    def compact(self, upto: int) -> int:
+        """
+        Drop the events with a sequence number up to `upto`.
+
+        The newest event is always kept, so sequence numbers go on from it
+        when the log is opened again.
+
+        Returns:
+            The offset of the first event kept past `upto`
+        """
+        with self._file_lock:
+            # Sequence number, start and end offset of each event
+            spans = []
+            for seq, _, end in self._scan():
+                spans.append((seq, spans[-1][2] if spans else 0, end))
+            kept = [span for span in spans if span[0] > upto] or spans[-1:]
+            if not kept:
+                return 0
+            first = 0 if kept[0][0] > upto else kept[0][2] - kept[0][1]
+            drop = kept[0][1]
+            if not drop:
+                return first
+
+            with open(self.path, "rb") as file:
+                file.seek(drop)
+                data = file.read(spans[-1][2] - drop)
+            partial_path = f"{self.path}.part"
+            with open(partial_path, "wb") as file:
+                file.write(data)
+                file.flush()
+                os.fsync(file.fileno())
+            # Windows can't replace a file that's open
+            self._file.close()
+            try:
+                os.replace(partial_path, self.path)
+            finally:
+                self._file = open(self.path, "ab")
+            return first
+
+
+def load_checkpoints(path: str = CHECKPOINT_FILE) -> Dict[str, int]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_checkpoints(checkpoints: Dict[str, int], path: str = CHECKPOINT_FILE):
+    with open(f"{path}.part", "w", encoding="utf-8") as file:
+        json.dump(checkpoints, file, indent=2)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(f"{path}.part", path)
+
+
+class Dispatcher:
+    """
+    Deliver logged events to each sink in order, once.
+
+    Each sink has a checkpoint: the sequence number of the last event it
+    handled, saved right after the sink returns. On restart, every event
+    past the checkpoint of a sink is delivered to it again. An event is
+    redelivered only if the process died after its sink ran and before the
+    checkpoint was saved, so sinks are given the sequence number to skip
+    events they already handled.
+
+    Each dispatch reads the log from the end of the last event every sink
+    had handled, and once those handled events add up to `compact_after`
+    bytes the log is compacted. Checkpoints past the last event the log had
+    when it was opened, left by a log that was deleted, are moved back to
+    it so new events still reach their sinks.
+    """
+
+    def __init__(
+        self,
+        log: EventLog,
+        sinks: List[Tuple[str, Callable[[int, DetectionEvent], None]]],
+        checkpoint_path: str = CHECKPOINT_FILE,
+        compact_after: int = COMPACT_AFTER,
+    ):
+        self.log = log
+        self.sinks = sinks
+        self.checkpoint_path = checkpoint_path
+        self.compact_after = compact_after
+        self.checkpoints = load_checkpoints(checkpoint_path)
+        behind = {
+            name: seq
+            for name, seq in self.checkpoints.items()
+            if seq > log.opened_seq
+        }
+        if behind:
+            print(
+                f"{log.path} ended at event {log.opened_seq}, before the "
+                f"checkpoints of {', '.join(sorted(behind))}, resetting them"
+            )
+            for name in behind:
+                self.checkpoints[name] = log.opened_seq
+            save_checkpoints(self.checkpoints, checkpoint_path)
+        # Offset in the log right after the events every sink handled
+        self._offset = 0
+
+    def _checkpoint(self, name: str, seq: int):
+        self.checkpoints[name] = seq
+        save_checkpoints(self.checkpoints, self.checkpoint_path)
+
+    def dispatch(self) -> List[DetectionEvent]:
+        """
+        Deliver every event some sink hasn't handled yet.
+
+        Returns:
+            The events that were delivered to at least one sink
+        """
+        after = min(
+            (self.checkpoints.get(name, 0) for name, _ in self.sinks),
+            default=self.log.last_seq,
+        )
+        delivered = []
+        for seq, event, end in self.log.read(start=self._offset):
+            if seq > after:
+                for name, sink in self.sinks:
+                    if seq <= self.checkpoints.get(name, 0):
+                        continue
+                    try:
+                        sink(seq, event)
+                    except Exception:
+                        # A sink that failed is not retried with the same
+                        # event, only one interrupted by the process
+                        # stopping is
+                        self._checkpoint(name, seq)
+                        raise
+                    self._checkpoint(name, seq)
+                delivered.append(event)
+                after = seq
+            self._offset = end
+
+        if self._offset >= self.compact_after:
+            self._offset = self.log.compact(after)
+        return delivered
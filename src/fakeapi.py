@@ -0,0 +1,248 @@
+import gzip
+import json
+import multiprocessing
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, NamedTuple, Optional
+from urllib.parse import parse_qs, urlparse
+
+from pydantic import BaseModel
+
+# The fake API runs in a process of its own, started with spawn. This module
+# only imports the standard library and pydantic, so that process doesn't
+# load the config or anything else of the watcher.
+
+INITIAL_PAPERS = 20  # Papers already out when a run starts
+# Number of the first paper. Rules match the number anywhere in a title, so
+# with three digits no paper's number is part of another's
+FIRST_NUMBER = 100
+PUBLISHED_PATH = "_loadtest/published"
+
+
+class FakeApiPaths(NamedTuple):
+    """Paths of the endpoints the fake API stands in for."""
+
+    login: str
+    topics: str
+    exams: str
+
+
+class FaultProfile(BaseModel):
+    """Trouble the fake API puts the watchers through."""
+
+    latency: float = 0.05  # Seconds added to every response
+    jitter: float = 0.05  # Up to this many more seconds, at random
+    error_burst_every: float = 300  # Seconds between bursts of 503s, 0 for none
+    error_burst_length: float = 10
+    token_ttl: float = 600  # Seconds a login token is accepted for
+    growth: float = 2  # Items added to each payload per minute
+    release_every: float = 60  # Seconds between new papers
+
+
+class FakeApi:
+    """
+    Stand-in for the login, topics and exams endpoints.
+
+    A new paper is released for every class every `release_every` seconds,
+    and filler items that match no paper are added at `growth` per minute,
+    so payloads keep growing. Responses are delayed, 503s come in bursts
+    and tokens expire as set by the fault profile.
+    """
+
+    def __init__(
+        self, class_ids: List[int], faults: FaultProfile, paths: FakeApiPaths
+    ):
+        self.class_ids = class_ids
+        self.faults = faults
+        self.paths = paths
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._tokens: Dict[str, float] = {}
+        self._topics: Dict[int, List[dict]] = {
+            class_id: [] for class_id in class_ids
+        }
+        self._exams: List[dict] = []
+        # "endpoint class_id number" -> when the paper was released
+        self.published: Dict[str, float] = {}
+        self._number = FIRST_NUMBER - 1
+        self._filler = 0
+        for _ in range(INITIAL_PAPERS):
+            self._release()
+
+    def _release(self):
+        self._number += 1
+        number = self._number
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for class_id in self.class_ids:
+                self._topics[class_id].append(
+                    {
+                        "id": f"{class_id}-{number}",
+                        "topic_title": f"PET {number} MCQ",
+                        "materials": [
+                            {
+                                "material_type": "DOCUMENT",
+                                "material_title": f"PET {number} paper",
+                                "user_link": f"/files/{class_id}/{number}.pdf",
+                                "unlock_timestamp": now.isoformat(),
+                            }
+                        ],
+                    }
+                )
+                self.published[f"topics {class_id} {number}"] = time.time()
+            self._exams.append(
+                {
+                    "exam_id": {
+                        "id": f"exam-{number}",
+                        "exam_name": f"PET {number} Essay",
+                        "exam_unlocks_at": now.isoformat(),
+                        "exam_expires_at": (
+                            now + timedelta(hours=2)
+                        ).isoformat(),
+                    }
+                }
+            )
+            self.published[f"exams 0 {number}"] = time.time()
+
+    def _grow(self):
+        self._filler += 1
+        with self._lock:
+            for class_id in self.class_ids:
+                self._topics[class_id].append(
+                    {
+                        "id": f"{class_id}-filler-{self._filler}",
+                        "topic_title": f"Revision {self._filler}",
+                        "materials": [],
+                    }
+                )
+            self._exams.append(
+                {
+                    "exam_id": {
+                        "id": f"filler-{self._filler}",
+                        "exam_name": f"Practice {self._filler}",
+                    }
+                }
+            )
+
+    def evolve(self, stopped: threading.Event):
+        """Release papers and grow the payloads until stopped."""
+        next_release = self.started_at + self.faults.release_every
+        next_growth = self.started_at
+        while not stopped.wait(0.1):
+            now = time.monotonic()
+            while now >= next_release:
+                self._release()
+                next_release += self.faults.release_every
+            while self.faults.growth and now >= next_growth:
+                self._grow()
+                next_growth += 60 / self.faults.growth
+
+    def login(self) -> str:
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._tokens[token] = time.monotonic()
+        return token
+
+    def fault(self, authorization: str) -> Optional[int]:
+        """Get the error status a request should fail with, if any."""
+        now = time.monotonic()
+        every = self.faults.error_burst_every
+        # Bursts end each period, so a run starts without one
+        if every and (now - self.started_at) % every >= (
+            every - self.faults.error_burst_length
+        ):
+            return 503
+        issued_at = self._tokens.get(authorization.removeprefix("Bearer "))
+        if issued_at is None or now - issued_at > self.faults.token_ttl:
+            return 401
+        return None
+
+    def payload(self, path: str, form: dict) -> Optional[list]:
+        with self._lock:
+            if path == self.paths.topics:
+                class_id = int(form.get("class_id", ["0"])[0])
+                return list(self._topics.get(class_id, []))
+            if path == self.paths.exams:
+                return list(self._exams)
+        return None
+
+
+class _FakeApiHandler(BaseHTTPRequestHandler):
+    server: "_FakeApiServer"
+
+    def _send(self, status: int, body: object):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            data = gzip.compress(data, compresslevel=1)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        api = self.server.api
+        if urlparse(self.path).path.lstrip("/") != PUBLISHED_PATH:
+            return self._send(404, {})
+        with api._lock:
+            self._send(200, dict(api.published))
+
+    def do_POST(self):
+        api = self.server.api
+        path = urlparse(self.path).path.lstrip("/")
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode())
+        if path == api.paths.login:
+            return self._send(200, {"body": {"token": api.login()}})
+
+        time.sleep(api.faults.latency + random.random() * api.faults.jitter)
+        status = api.fault(self.headers.get("Authorization", ""))
+        if status:
+            return self._send(status, {"message": "Injected fault"})
+        payload = api.payload(path, form)
+        if payload is None:
+            return self._send(404, {})
+        self._send(200, payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _FakeApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, api: FakeApi):
+        super().__init__(("127.0.0.1", 0), _FakeApiHandler)
+        self.api = api
+
+
+def serve_fake_api(
+    class_ids: List[int],
+    faults: dict,
+    paths: FakeApiPaths,
+    addresses: multiprocessing.Queue,
+    stopped: multiprocessing.Event,
+):
+    """Run the fake API until stopped, putting its base URL on a queue."""
+    api = FakeApi(class_ids, FaultProfile.model_validate(faults), paths)
+    server = _FakeApiServer(api)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    addresses.put(f"http://{host}:{port}/")
+
+    evolving = threading.Event()
+    threading.Thread(target=api.evolve, args=(evolving,), daemon=True).start()
+    stopped.wait()
+    evolving.set()
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,74 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+from typing import List, Optional
+
+from .snapshot import ESSAY, MCQ, SNAPSHOT_FILE, SnapshotReader
+
+# `Config.config_file_name`, read here without validating the config, which
+# would prompt for any missing setting
+CONFIG_FILE = "config.yaml"
+
+
+def snapshot_path() -> Optional[str]:
+    """Get the snapshot path set in the config, None if it's turned off."""
+    if not os.path.exists(CONFIG_FILE):
+        return SNAPSHOT_FILE
+    import yaml
+
+    with open(CONFIG_FILE, "r", encoding="utf-8") as file:
+        values = yaml.safe_load(file) or {}
+    return values.get("catalogue_snapshot", SNAPSHOT_FILE)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("number", type=int, help="Paper number")
+    parser.add_argument(
+        "--type", choices=[MCQ, ESSAY], help="Only check this half of the paper"
+    )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Print what's known about it"
+    )
+
+
+def _display(value: Optional[datetime]) -> str:
+    # Same as `timestamps.display_timestamp`
+    if value is None:
+        return "-"
+    return value.astimezone().strftime("%Y-%m-%d %H:%M:%S %Z")
+
+
+def run(args: argparse.Namespace):
+    """Print whether a paper is out, exiting with 0 if it is, 1 if not."""
+    path = snapshot_path()
+    if not path:
+        print("The catalogue snapshot is turned off in the config")
+        sys.exit(2)
+    try:
+        with SnapshotReader(path) as snapshot:
+            out = snapshot.is_out(args.number, args.type)
+            entry = snapshot.get(args.number) if args.verbose else None
+    except (OSError, ValueError) as e:
+        print(f"No catalogue snapshot, is the watcher running? ({e})")
+        sys.exit(2)
+
+    print(f"PET {args.number} is {'out' if out else 'not out'}")
+    if entry:
+        print(f"  MCQ:   {entry.mcq_name or '-'}")
+        print(f"  Essay: {entry.essay_name or '-'}")
+        if entry.essay_name:
+            print(
+                f"  Unlocks {_display(entry.essay_unlocks_at)}"
+                f" | expires {_display(entry.essay_expires_at)}"
+            )
+        for material in entry.materials:
+            print(f"  - {material.name} ({material.download_link})")
+    sys.exit(0 if out else 1)
+
+
+def main(argv: List[str]):
+    """Run `main.py is-out` without loading the rest of the watcher."""
+    parser = argparse.ArgumentParser(prog="main.py is-out")
+    add_arguments(parser)
+    run(parser.parse_args(argv))
@@ -0,0 +1,471 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from pydantic import BaseModel
+
+from . import check_essay, check_mcq
+from .api import post_json
+from .auth import LOGIN_PATH, AuthenticatedSession, api_url
+from .catalogue import PaperCatalogue
+from .data_types import Config, Paper, WatchRule
+from .deadline import CONNECT_TIMEOUT, POLL_DEADLINE, READ_TIMEOUT, deadline
+from .fakeapi import (
+    FIRST_NUMBER,
+    INITIAL_PAPERS,
+    PUBLISHED_PATH,
+    FakeApiPaths,
+    FaultProfile,
+    serve_fake_api,
+)
+from .longrun import rss_bytes
+from .scheduler import PollScheduler, ReleaseModel
+from .slo import percentile
+from .watcher import PollHub, Watcher
+
+config = Config()
+
+BASELINE_FILE = "loadtest_baseline.json"
+REPORT_INTERVAL = 60  # Seconds between progress lines
+TOLERANCE = 0.2  # Relative regression allowed against the baseline
+
+# Metrics compared with the baseline: whether higher is better, and how far
+# a metric may move regardless of the tolerance, to ignore noise on small
+# values
+METRICS = {
+    "throughput": (True, 0.0),
+    "poll_p99": (False, 0.05),
+    "detection_p50": (False, 0.25),
+    "detection_p90": (False, 0.25),
+    "detection_p99": (False, 0.25),
+    "cpu_percent": (False, 5.0),
+    "rss_peak_mb": (False, 10.0),
+    "missed": (False, 0),
+}
+
+
+class LoadTestSettings(BaseModel):
+    accounts: int = 50
+    classes: int = 10
+    interval: float = 5  # Seconds between polls of each account
+    duration: float = 600
+    faults: FaultProfile = FaultProfile()
+
+
+class LoadReport(BaseModel):
+    settings: LoadTestSettings
+    polls: int
+    errors: int
+    throughput: float  # Successful polls per second
+    poll_p50: float
+    poll_p99: float
+    detections: int
+    missed: int  # Releases an account never saw
+    detection_p50: Optional[float] = None
+    detection_p90: Optional[float] = None
+    detection_p99: Optional[float] = None
+    cpu_percent: float
+    rss_peak_mb: Optional[float] = None  # Unknown on some platforms
+    rss_growth_mb: Optional[float] = None
+
+
+class LoadSession(AuthenticatedSession):
+    """Session of a load test account, kept out of the credential store."""
+
+    def restore_session(self):
+        pass
+
+    def save_session(self):
+        pass
+
+
+class LoadStats:
+    """Counters shared by the account workers."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.polls = 0
+        self.errors = 0
+        # Compact, so hours of samples don't show up as RSS growth
+        self.poll_seconds = array("d")
+        # Account index -> "endpoint class_id number" -> when it was seen
+        self.detected: Dict[int, Dict[str, float]] = {}
+
+    def polled(self, seconds: float):
+        with self._lock:
+            self.polls += 1
+            self.poll_seconds.append(seconds)
+
+    def failed(self):
+        with self._lock:
+            self.errors += 1
+
+    def detect(self, account: int, key: str):
+        with self._lock:
+            self.detected.setdefault(account, {}).setdefault(key, time.time())
+
+
+class LoadHub(PollHub):
+    """
+    Poll hub of one class, or of the exams, of a load test account.
+
+    Requests go to the fake API with the session of the account and are
+    timed and counted here, the payloads then take the watcher's own path
+    through the catalogue and the rules of the watchers on the hub.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        class_id: int,
+        session: LoadSession,
+        interval: float,
+        stats: LoadStats,
+    ):
+        # Without a release history, so the hub polls at `interval` whatever
+        # the local history and the time of day
+        super().__init__(
+            PollScheduler(ReleaseModel(path=None), [], base_interval=interval),
+            PaperCatalogue(),
+        )
+        self.endpoint = endpoint
+        self.class_id = class_id
+        self.session = session
+        self.stats = stats
+        # When the first payload came in, papers released before then were
+        # already out
+        self.primed_at: Optional[float] = None
+
+    def fetch(self, paper_type: Paper.PaperType) -> Optional[list]:
+        if self.endpoint == check_mcq.ENDPOINT:
+            path, data = check_mcq.API_PATH, {"class_id": self.class_id}
+        else:
+            path, data = check_essay.API_PATH, None
+        started_at = time.perf_counter()
+        try:
+            with deadline(POLL_DEADLINE):
+                payload = post_json(
+                    api_url(path), self.endpoint, data, self.session
+                )
+        except Exception:
+            self.stats.failed()
+            return None
+        self.stats.polled(time.perf_counter() - started_at)
+        if self.primed_at is None:
+            self.primed_at = time.time()
+        return payload
+
+
+class AccountWorker(threading.Thread):
+    """
+    One account watching for papers like an application using `Watcher`.
+
+    Each class and the exams get a hub of their own with a watcher for the
+    paper numbers the run can release, so payloads go through the real
+    catalogue, rule and paper finding code. The account's requests share
+    one session and go out one at a time. A paper found after the first
+    poll of its hub counts as a detection.
+    """
+
+    def __init__(
+        self,
+        index: int,
+        class_ids: List[int],
+        numbers: List[int],
+        interval: float,
+        stats: LoadStats,
+        stopped: threading.Event,
+    ):
+        super().__init__(name=f"load-{index}", daemon=True)
+        self.index = index
+        self.numbers = numbers
+        self.interval = interval
+        self.stats = stats
+        self.stopped = stopped
+        self.session = LoadSession(f"load-{index}", "load")
+        # Hub and the paper type watched on it
+        self.hubs: List[Tuple[LoadHub, Paper.PaperType]] = [
+            (
+                LoadHub(
+                    check_mcq.ENDPOINT, class_id, self.session, interval, stats
+                ),
+                Paper.PaperType.MCQ,
+            )
+            for class_id in class_ids
+        ] + [
+            (
+                LoadHub(check_essay.ENDPOINT, 0, self.session, interval, stats),
+                Paper.PaperType.ESSAY,
+            )
+        ]
+
+    @property
+    def primed_at(self) -> Dict[Tuple[str, int], float]:
+        return {
+            (hub.endpoint, hub.class_id): hub.primed_at
+            for hub, _ in self.hubs
+            if hub.primed_at is not None
+        }
+
+    async def _watch(self, hub: LoadHub, paper_type: Paper.PaperType):
+        rules = [
+            WatchRule.for_paper(number, paper_type) for number in self.numbers
+        ]
+        numbers = {
+            rule.name: number for rule, number in zip(rules, self.numbers)
+        }
+        # Spread the hubs over the interval like independent watchers
+        await asyncio.sleep(random.random() * self.interval)
+        async for event in Watcher(rules, hub, until_found=False):
+            # Papers found by the first poll were already out
+            if event.detected_at.timestamp() <= (hub.primed_at or 0):
+                continue
+            self.stats.detect(
+                self.index,
+                f"{hub.endpoint} {hub.class_id} {numbers[event.rule]}",
+            )
+
+    async def _run_watchers(self):
+        # One thread for the blocking requests of all the account's hubs
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(1))
+        tasks = [
+            asyncio.create_task(self._watch(hub, paper_type))
+            for hub, paper_type in self.hubs
+        ]
+        while not self.stopped.is_set():
+            await asyncio.sleep(0.1)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def run(self):
+        asyncio.run(self._run_watchers())
+
+
+def _missed(
+    stats: LoadStats,
+    workers: List[AccountWorker],
+    published: Dict[str, float],
+    seen_by: float,
+) -> int:
+    # Releases every account should have seen by the end of the run
+    missed = 0
+    for worker in workers:
+        detected = stats.detected.get(worker.index, {})
+        for (endpoint, class_id), primed_at in worker.primed_at.items():
+            prefix = f"{endpoint} {class_id} "
+            missed += sum(
+                key.startswith(prefix)
+                and primed_at < released_at <= seen_by
+                and key not in detected
+                for key, released_at in published.items()
+            )
+    return missed
+
+
+def run_load_test(
+    settings: LoadTestSettings, report_every: float = REPORT_INTERVAL
+) -> LoadReport:
+    """
+    Run many accounts against a fake API and measure how the watcher copes.
+
+    The fake API runs in a child process, so the CPU and memory measured
+    are those of the watcher side alone. Requests go to it through
+    `api_base_url`, which is changed for the length of the run.
+
+    Args:
+        settings: Size, poll interval, duration and faults of the run
+        report_every: Seconds between progress lines
+
+    Returns:
+        Throughput, poll and detection latency percentiles, CPU and RSS
+    """
+    class_ids = list(range(1, settings.classes + 1))
+    # Every paper the run can release, each account watches for all of them
+    releases = INITIAL_PAPERS + int(
+        settings.duration // settings.faults.release_every
+    )
+    numbers = list(range(FIRST_NUMBER, FIRST_NUMBER + releases + 1))
+    # Forking this process, threads and all, could copy a held lock. The
+    # spawned process only imports the fake API module
+    context = multiprocessing.get_context("spawn")
+    addresses = context.Queue()
+    fake_stopped = context.Event()
+    fake = context.Process(
+        target=serve_fake_api,
+        args=(
+            class_ids,
+            settings.faults.model_dump(),
+            FakeApiPaths(LOGIN_PATH, check_mcq.API_PATH, check_essay.API_PATH),
+            addresses,
+            fake_stopped,
+        ),
+        daemon=True,
+    )
+    fake.start()
+    base_url = config.api_base_url
+    config.api_base_url = addresses.get(timeout=30)
+
+    stats = LoadStats()
+    stopped = threading.Event()
+    workers = [
+        AccountWorker(
+            index, class_ids, numbers, settings.interval, stats, stopped
+        )
+        for index in range(settings.accounts)
+    ]
+    rss_start = rss_peak = rss_bytes()
+    cpu_start = time.process_time()
+    started_at = time.monotonic()
+    try:
+        for worker in workers:
+            worker.start()
+        reported_at, reported_cpu, reported_polls = started_at, cpu_start, 0
+        while (elapsed := time.monotonic() - started_at) < settings.duration:
+            time.sleep(min(1, settings.duration - elapsed))
+            rss = rss_bytes()
+            if rss is not None:
+                rss_peak = max(rss_peak, rss)
+            now = time.monotonic()
+            if now - reported_at < report_every:
+                continue
+            cpu = time.process_time()
+            rate = (stats.polls - reported_polls) / (now - reported_at)
+            cpu_percent = (cpu - reported_cpu) / (now - reported_at) * 100
+            detections = sum(map(len, stats.detected.values()))
+            memory = "" if rss is None else f", RSS {rss / 1e6:.1f} MB"
+            print(
+                f"{now - started_at:.0f}s: {stats.polls} polls ({rate:.1f}/s),"
+                f" {stats.errors} errors, {detections} detections,"
+                f" CPU {cpu_percent:.0f}%{memory}"
+            )
+            reported_at, reported_cpu, reported_polls = now, cpu, stats.polls
+        ended_at = time.time()
+        stopped.set()
+        for worker in workers:
+            worker.join(POLL_DEADLINE)
+        wall = time.monotonic() - started_at
+        cpu_percent = (time.process_time() - cpu_start) / wall * 100
+        rss_end = rss_bytes()
+
+        published = requests.get(
+            api_url(PUBLISHED_PATH), timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)
+        ).json()
+    finally:
+        stopped.set()
+        config.api_base_url = base_url
+        fake_stopped.set()
+        fake.join(10)
+
+    delays = [
+        seen_at - published[key]
+        for detected in stats.detected.values()
+        for key, seen_at in detected.items()
+        if key in published
+    ]
+    # A release is missed if it was out for two polls and the longest
+    # error burst and still wasn't seen
+    grace = 2 * settings.interval + settings.faults.error_burst_length
+    poll_seconds = list(stats.poll_seconds) or [0.0]
+    return LoadReport(
+        settings=settings,
+        polls=stats.polls,
+        errors=stats.errors,
+        throughput=stats.polls / wall,
+        poll_p50=percentile(poll_seconds, 50),
+        poll_p99=percentile(poll_seconds, 99),
+        detections=len(delays),
+        missed=_missed(stats, workers, published, ended_at - grace),
+        detection_p50=percentile(delays, 50) if delays else None,
+        detection_p90=percentile(delays, 90) if delays else None,
+        detection_p99=percentile(delays, 99) if delays else None,
+        cpu_percent=cpu_percent,
+        rss_peak_mb=None if rss_peak is None else rss_peak / 1e6,
+        rss_growth_mb=(
+            None if rss_start is None else (rss_end - rss_start) / 1e6
+        ),
+    )
+
+
+def print_load_report(report: LoadReport):
+    def seconds(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.3f}s"
+
+    settings = report.settings
+    print("=" * 60)
+    print(
+        f"{settings.accounts} accounts x {settings.classes} classes, "
+        f"polling every {settings.interval:g}s for {settings.duration:g}s"
+    )
+    print(
+        f"Polls:      {report.polls} ({report.throughput:.1f}/s), "
+        f"{report.errors} failed"
+    )
+    print(
+        f"Poll time:  p50 {seconds(report.poll_p50)} "
+        f"| p99 {seconds(report.poll_p99)}"
+    )
+    print(
+        f"Detections: {report.detections}, {report.missed} missed | "
+        f"p50 {seconds(report.detection_p50)} "
+        f"| p90 {seconds(report.detection_p90)} "
+        f"| p99 {seconds(report.detection_p99)}"
+    )
+    if report.rss_peak_mb is None:
+        print(f"CPU {report.cpu_percent:.0f}% | RSS unknown")
+    else:
+        print(
+            f"CPU {report.cpu_percent:.0f}% "
+            f"| RSS peak {report.rss_peak_mb:.1f} MB "
+            f"({report.rss_growth_mb:+.1f} MB over the run)"
+        )
+    print("=" * 60)
+
+
+def load_baseline(path: str = BASELINE_FILE) -> Optional[LoadReport]:
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        return LoadReport.model_validate(json.load(file))
+
+
+def save_baseline(report: LoadReport, path: str = BASELINE_FILE):
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(report.model_dump(mode="json"), file, indent=2)
+
+
+def compare_with_baseline(
+    report: LoadReport, baseline: LoadReport, tolerance: float = TOLERANCE
+) -> List[str]:
+    """
+    Find the metrics that got worse than the baseline by more than allowed.
+
+    Raises:
+        ValueError: If the baseline was recorded with other settings
+    """
+    if report.settings != baseline.settings:
+        raise ValueError(
+            "The baseline was recorded with other settings, "
+            "run with the same ones or save a new baseline"
+        )
+    regressions = []
+    for name, (higher_is_better, slack) in METRICS.items():
+        value = getattr(report, name)
+        expected = getattr(baseline, name)
+        if value is None or expected is None:
+            continue
+        if higher_is_better:
+            regressed = value < expected * (1 - tolerance) - slack
+        else:
+            regressed = value > expected * (1 + tolerance) + slack
+        if regressed:
+            regressions.append(f"{name}: {value:.3f} (baseline {expected:.3f})")
+    return regressions
@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import tracemalloc
+from typing import Optional
+
+import requests
+
+try:
+    import resource
+except ImportError:
+    # Unix only
+    resource = None
+
+MONITOR_INTERVAL = 60 * 60  # Seconds between memory reports
+MAX_IDLE_CONNECTIONS = 4  # Recycle the session past this many idle sockets
+TRACEMALLOC_FRAMES = 5
+TOP_GROWTH = 5  # Allocation sites listed in each report
+
+
+def rss_bytes() -> Optional[int]:
+    """Get the resident set size of this process, None where it's unknown."""
+    try:
+        with open("/proc/self/statm", "r") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    # Peak rather than current RSS, but still shows steady growth
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == "darwin" else usage * 1024
+
+
+def idle_connections(session: requests.Session) -> int:
+    """Count the open connections waiting in the pools of a session."""
+    count = 0
+    for adapter in session.adapters.values():
+        pools = getattr(adapter, "poolmanager", None)
+        if pools is None:
+            continue
+        for key in list(pools.pools.keys()):
+            pool = pools.pools.get(key)
+            if pool is not None and pool.pool is not None:
+                count += sum(conn is not None for conn in list(pool.pool.queue))
+    return count
+
+
+class MemoryMonitor:
+    """
+    Report memory growth of a long running watcher.
+
+    Each report compares the RSS and a tracemalloc snapshot with the ones
+    taken when monitoring started, listing the allocation sites that grew
+    the most so leaks can be traced back to code.
+    """
+
+    def __init__(self, interval: float = MONITOR_INTERVAL):
+        self.interval = interval
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.baseline = self._snapshot()
+        self.baseline_rss = rss_bytes()
+        self._last_report = time.monotonic()
+
+    def _snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(
+            (tracemalloc.Filter(False, tracemalloc.__file__),)
+        )
+
+    def report(self):
+        rss = rss_bytes()
+        traced, peak = tracemalloc.get_traced_memory()
+        rss_report = ""
+        if rss is not None and self.baseline_rss is not None:
+            rss_report = (
+                f"RSS {rss / 1e6:.1f} MB "
+                f"({(rss - self.baseline_rss) / 1e6:+.1f} MB since start), "
+            )
+        print(
+            f"\nMemory: {rss_report}"
+            f"traced {traced / 1e6:.1f} MB (peak {peak / 1e6:.1f} MB)"
+        )
+        growth = self._snapshot().compare_to(self.baseline, "lineno")
+        for stat in growth[:TOP_GROWTH]:
+            if stat.size_diff > 0:
+                print(f"  {stat}")
+
+    def check(self):
+        """Report memory usage if a report is due."""
+        now = time.monotonic()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self.report()
+
+    def stop(self):
+        tracemalloc.stop()
+
+
+def recycle_idle_session(
+    session: requests.Session, max_idle: Optional[int] = MAX_IDLE_CONNECTIONS
+) -> bool:
+    """
+    Recycle the connection pools of a session with too many idle sockets.
+
+    Returns:
+        True if the session was recycled
+    """
+    if idle_connections(session) <= max_idle:
+        return False
+    session.recycle()
+    return True
@@ -1,15 +1,123 @@
-from typing import List
+import hashlib
+import os
+from typing import Callable, List, Optional
 
-import requests
 from InquirerPy import inquirer
 from InquirerPy.base.control import Choice
+from pydantic import BaseModel
 
+from .bandwidth import Priority, material_priority, traffic
 from .data_types import Config, Material
+from .deadline import CONNECT_TIMEOUT, READ_TIMEOUT
+from .search import indexer
+from .store import LinkValidators, store
+from .transport import download_session
 
 config = Config()
 
+CHUNK_SIZE = 64 * 1024
 
-def download_materials(materials: List[Material]):
+
+def material_path(material: Material) -> str:
+    return f"{config.download_folder}/{material.name}.pdf"
+
+
+class Download(BaseModel):
+    digest: str
+    validators: LinkValidators
+
+
+def download_material(
+    material: Material,
+    path: str,
+    cancelled: Optional[Callable[[], bool]] = None,
+    priority: Optional[Priority] = None,
+) -> Optional[Download]:
+    """
+    Stream a material to `path`, replacing it only once fully downloaded.
+
+    Args:
+        material: The material to download
+        path: Where to save the file
+        cancelled: Checked between chunks, stops the download if it's True
+        priority: Traffic class of the download, from the material name if
+            not given
+
+    Returns:
+        The SHA-256 of the file, hashed as it streamed in, and the
+        validators it was served with, or None if it wasn't downloaded
+    """
+    partial_path = f"{path}.part"
+    digest = hashlib.sha256()
+    completed = True
+    priority = priority or material_priority(material)
+    try:
+        with (
+            traffic.connection(material.download_link, priority),
+            download_session.get(
+                material.download_link,
+                stream=True,
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+            ) as response,
+        ):
+            if response.status_code != 200:
+                return None
+            validators = LinkValidators.from_headers(response.headers)
+            with open(partial_path, "wb") as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    if cancelled and cancelled():
+                        completed = False
+                        break
+                    digest.update(chunk)
+                    f.write(chunk)
+                    traffic.throttle(len(chunk), priority)
+
+        if not completed:
+            return None
+        os.replace(partial_path, path)
+    finally:
+        # Cancelled and failed downloads leave nothing behind
+        try:
+            os.remove(partial_path)
+        except FileNotFoundError:
+            pass
+    return Download(digest=digest.hexdigest(), validators=validators)
+
+
+def fetch_material(
+    material: Material,
+    cancelled: Optional[Callable[[], bool]] = None,
+    refresh: bool = False,
+    priority: Optional[Priority] = None,
+) -> Optional[str]:
+    """
+    Get a material into the content store, unless its link already is.
+
+    Args:
+        material: The material to fetch
+        cancelled: Checked between chunks, stops the download if it's True
+        refresh: Download the material even if its link is already stored
+        priority: Traffic class of the download, from the material name if
+            not given
+
+    Returns:
+        The SHA-256 of the material, or None if it couldn't be downloaded
+    """
+    digest = not refresh and store.lookup(material.download_link)
+    if digest:
+        return digest
+    path = store.partial_path()
+    download = download_material(material, path, cancelled, priority)
+    if not download:
+        return None
+    store.add(
+        material.download_link, path, download.digest, download.validators
+    )
+    return download.digest
+
+
+def select_materials(materials: List[Material]) -> List[Material]:
+    """Ask which materials of a found paper to download."""
     choices = []
     for material, index in zip(materials, range(len(materials))):
         choices.append(Choice(value=index, name=material.name))
@@ -17,15 +125,32 @@ def download_materials(materials: List[Material]):
     required_material_indexes = inquirer.select(
         message="Select required materials:", choices=choices, multiselect=True
     ).execute()
+    return [materials[index] for index in required_material_indexes]
+
+
+def download_materials(materials: List[Material], prefetcher=None):
+    """
+    Save materials to the download folder.
+
+    A material that fails doesn't stop the others from being saved.
 
-    for index in required_material_indexes:
-        material = materials[index]
-        response = requests.get(material.download_link)
-        if response.status_code == 200:
-            with open(
-                f"{config.download_folder}/{material.name}.pdf", "wb"
-            ) as f:
-                f.write(response.content)
-            print(f"✅ Downloaded: {material.name} to {config.download_folder}")
-        else:
-            print(f"❌ Failed to download: {material.name}")
+    Args:
+        materials: The materials selected for download
+        prefetcher: Prefetcher already downloading the materials, if any
+    """
+    try:
+        for material in materials:
+            try:
+                digest = prefetcher and prefetcher.result(material)
+                digest = digest or fetch_material(material)
+                if not digest:
+                    print(f"❌ Failed to download: {material.name}")
+                    continue
+                path = store.place(digest, material_path(material))
+                print(f"✅ Downloaded: {material.name} to {path}")
+                indexer.add(path, material.name)
+            except Exception as e:
+                print(f"❌ Failed to download: {material.name}: {e}")
+    finally:
+        if prefetcher:
+            prefetcher.discard()
@@ -0,0 +1,277 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from pydantic import BaseModel
+
+from .bandwidth import Priority, traffic
+from .check_mcq import CLASS_ID, fetch_curriculum
+from .data_types import Config
+from .deadline import CONNECT_TIMEOUT, READ_TIMEOUT
+from .store import LinkValidators, file_sha256
+from .transport import mount_transport
+
+config = Config()
+
+MIRROR_FOLDER_NAME = "mirror"
+MANIFEST_FILE_NAME = "manifest.json"
+CONCURRENCY = 8
+CHUNK_SIZE = 64 * 1024
+
+
+class ManifestEntry(BaseModel):
+    """What was downloaded from a material link and where it was saved."""
+
+    path: str
+    size: int
+    sha256: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class MirrorResult(BaseModel):
+    downloaded: int = 0
+    unchanged: int = 0
+    failed: int = 0
+    bytes: int = 0
+
+
+def safe_filename(name: str) -> str:
+    """Replace the characters that can't be used in file names."""
+    name = re.sub(r'[<>:"/\\|?*\x00-\x1f]', "_", name).strip(" .")
+    return name or "untitled"
+
+
+def mirror_folder(class_id: int) -> str:
+    return os.path.join(
+        config.download_folder, MIRROR_FOLDER_NAME, str(class_id)
+    )
+
+
+def load_manifest(folder: str) -> Dict[str, ManifestEntry]:
+    path = os.path.join(folder, MANIFEST_FILE_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return {
+            link: ManifestEntry(**entry)
+            for link, entry in json.load(file).items()
+        }
+
+
+def save_manifest(folder: str, manifest: Dict[str, ManifestEntry]):
+    path = os.path.join(folder, MANIFEST_FILE_NAME)
+    with open(f"{path}.part", "w", encoding="utf-8") as file:
+        json.dump(
+            {link: entry.model_dump() for link, entry in manifest.items()},
+            file,
+            indent=2,
+        )
+    os.replace(f"{path}.part", path)
+
+
+def plan_mirror(topics: list) -> List[Tuple[str, str]]:
+    """
+    Lay out every document material of a class in a folder per topic.
+
+    Materials that would get the same path are told apart by a hash of
+    their link, so their names don't depend on the order of the topics.
+
+    Args:
+        topics: The decoded response of the topics API
+
+    Returns:
+        The link and the path relative to the mirror folder of each material
+    """
+    candidates = {}
+    for topic in topics:
+        topic_folder = safe_filename(topic.get("topic_title") or "")
+        for material in topic.get("materials", []):
+            link = material.get("user_link")
+            if material.get("material_type") != "DOCUMENT" or not link:
+                continue
+            if link in candidates:
+                continue
+            name = safe_filename(material.get("material_title") or "")
+            extension = os.path.splitext(urlparse(link).path)[1] or ".pdf"
+            candidates[link] = (topic_folder, name, extension)
+
+    links_per_path = Counter(
+        os.path.join(folder, f"{name}{extension}")
+        for folder, name, extension in candidates.values()
+    )
+    plan = []
+    for link, (folder, name, extension) in candidates.items():
+        path = os.path.join(folder, f"{name}{extension}")
+        if links_per_path[path] > 1:
+            key = hashlib.sha256(link.encode()).hexdigest()[:8]
+            path = os.path.join(folder, f"{name} ({key}){extension}")
+        plan.append((link, path))
+    return plan
+
+
+class Mirror:
+    """Incrementally mirror every material of a class to a folder tree."""
+
+    def __init__(
+        self,
+        class_id: int = CLASS_ID,
+        concurrency: int = CONCURRENCY,
+        verify: bool = False,
+    ):
+        self.class_id = class_id
+        self.concurrency = concurrency
+        self.verify = verify
+        self.folder = mirror_folder(class_id)
+        self.manifest = load_manifest(self.folder)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _session(self) -> requests.Session:
+        # A session per worker so each keeps its connections alive
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            mount_transport(session)
+        return session
+
+    def _is_current(self, entry: ManifestEntry) -> bool:
+        path = os.path.join(self.folder, entry.path)
+        if not os.path.exists(path) or os.path.getsize(path) != entry.size:
+            return False
+        return not self.verify or file_sha256(path) == entry.sha256
+
+    def _remote_size(self, link: str) -> Optional[int]:
+        # Size the server reports for a link, without downloading it
+        with traffic.connection(link, Priority.MIRROR):
+            response = self._session().head(
+                link,
+                allow_redirects=True,
+                timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+            )
+        if not response.ok:
+            return None
+        return LinkValidators.from_headers(response.headers).content_length
+
+    def _sync(self, link: str, path: str) -> Tuple[str, int]:
+        entry = self.manifest.get(link)
+        current = entry and entry.path == path and self._is_current(entry)
+        headers = {}
+        if current:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+            # Without validators only the size can be checked up front, a
+            # file is taken as unchanged while the server reports the same
+            if not headers and self._remote_size(link) == entry.size:
+                return "unchanged", 0
+
+        full_path = os.path.join(self.folder, path)
+        partial_path = f"{full_path}.part"
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+        try:
+            with (
+                traffic.connection(link, Priority.MIRROR),
+                self._session().get(
+                    link,
+                    headers=headers,
+                    stream=True,
+                    timeout=(CONNECT_TIMEOUT, READ_TIMEOUT),
+                ) as response,
+            ):
+                if response.status_code == 304:
+                    return "unchanged", 0
+                response.raise_for_status()
+
+                digest = hashlib.sha256()
+                size = 0
+                with open(partial_path, "wb") as file:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        digest.update(chunk)
+                        size += len(chunk)
+                        file.write(chunk)
+                        traffic.throttle(len(chunk), Priority.MIRROR)
+
+                expected_size = response.headers.get("Content-Length")
+                encoded = response.headers.get("Content-Encoding")
+                if expected_size and not encoded and int(expected_size) != size:
+                    raise ValueError(
+                        f"Expected {expected_size} bytes but got {size}"
+                    )
+
+                if current and digest.hexdigest() == entry.sha256:
+                    return "unchanged", 0
+
+                new_entry = ManifestEntry(
+                    path=path,
+                    size=size,
+                    sha256=digest.hexdigest(),
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                )
+
+            os.replace(partial_path, full_path)
+        finally:
+            # Failed and unchanged downloads leave nothing behind
+            try:
+                os.remove(partial_path)
+            except FileNotFoundError:
+                pass
+        with self._lock:
+            self.manifest[link] = new_entry
+        return "downloaded", size
+
+    def run(self, topics: Optional[list] = None) -> MirrorResult:
+        """
+        Download every new or changed material of the class.
+
+        Args:
+            topics: The topics to mirror, fetched from the API if not given
+
+        Returns:
+            How many materials were downloaded, unchanged or failed
+
+        Raises:
+            ValueError: If the topics couldn't be fetched
+        """
+        if topics is None:
+            topics = fetch_curriculum(self.class_id, full=True)
+            if topics is None:
+                raise ValueError(
+                    f"Couldn't get the topics of class {self.class_id}"
+                )
+        plan = plan_mirror(topics)
+        result = MirrorResult()
+
+        os.makedirs(self.folder, exist_ok=True)
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+                syncs = {
+                    executor.submit(self._sync, link, path): path
+                    for link, path in plan
+                }
+                for sync in as_completed(syncs):
+                    try:
+                        status, size = sync.result()
+                    except Exception as e:
+                        result.failed += 1
+                        print(f"❌ Failed to mirror {syncs[sync]}: {e}")
+                        continue
+                    if status == "downloaded":
+                        result.downloaded += 1
+                        result.bytes += size
+                        print(f"✅ Downloaded: {syncs[sync]}")
+                    else:
+                        result.unchanged += 1
+        finally:
+            save_manifest(self.folder, self.manifest)
+        return result
@@ -1,49 +1,68 @@
-import os
-import threading
+import time
 import webbrowser
 from datetime import datetime
+from typing import Optional
 
 from InquirerPy import inquirer
-from playsound3 import playsound
 
+from .audio import AudioService, create_backend
 from .data_types import Config, Paper
-from .material_handling import download_materials
+from .material_handling import download_materials, select_materials
+from .prefetch import prefetcher
+from .slo import DetectionRecord
+from .slo import now as slo_now
+from .timestamps import display_timestamp
 
 config = Config()
 OPEN_BROWSER = False  # Set to True to open browser when found
 
+audio = AudioService(
+    create_backend(config.notification_sound_file, config.audio_backend)
+)
 
-def notify(paper: Paper):
-    """Notify the user about a found paper."""
+
+def notify(paper: Paper, detection: Optional[DetectionRecord] = None):
+    """
+    Notify the user about a found paper.
+
+    Args:
+        paper: The found paper
+        detection: Timeline of the detection, updated as notifying goes on
+    """
+    if config.auto_prefetch and paper.materials:
+        prefetcher.start(paper.materials)
+
+    found_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     print("\n" + "=" * 60)
-    print(
-        f"🔔 Found {paper.name} | {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-    )
+    print(f"🔔 Found {paper.name} | {found_at}")
     if paper.materials:
         print(f"No. of materials: {len(paper.materials)}")
     else:
         print("No materials available.")
-    print(f"Unlocks at: {paper.unlocks_at}")
-    print(f"Expires at: {paper.unlocks_at}")
+    print(f"Unlocks at: {display_timestamp(paper.unlocks_at)}")
+    print(f"Expires at: {display_timestamp(paper.expires_at)}")
     print("=" * 60 + "\n")
 
-    # Play notification sound if available
-    def play_notification():
-        try:
-            if os.path.exists(config.notification_sound_file):
-                playsound(config.notification_sound_file)
-        except Exception as e:
-            print(f"Failed to play notification sound: {e}")
-
-    threading.Thread(target=play_notification, daemon=True).start()
+    audio.play()
+    if detection:
+        detection.notified_at = slo_now()
 
     if len(paper.materials) > 0:
+        # The clock stops while the prompts wait for the user
+        prompted_at = time.monotonic()
         proceed_download = inquirer.confirm(
             message="Do you want to download materials?", default=True
         ).execute()
+        selected = select_materials(paper.materials) if proceed_download else []
+        if detection:
+            detection.prompt_seconds = time.monotonic() - prompted_at
 
         if proceed_download:
-            download_materials(paper.materials)
+            download_materials(selected, prefetcher)
+            if detection:
+                detection.downloaded_at = slo_now()
+        else:
+            prefetcher.discard()
 
     # Open browser
     if OPEN_BROWSER:
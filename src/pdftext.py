@@ -0,0 +1,100 @@
+import re
+import zlib
+
+try:
+    from pypdf import PdfReader
+except ImportError:
+    PdfReader = None
+
+STREAM_PATTERN = re.compile(rb"stream\r?\n(.*?)\r?\nendstream", re.DOTALL)
+# Literal strings shown with Tj, ' or ", arrays shown with TJ, and the
+# operators that start a new line
+TEXT_PATTERN = re.compile(
+    rb"\((?P<string>(?:\\.|[^\\)])*)\)\s*(?:Tj|'|\")"
+    rb"|\[(?P<array>(?:\\.|[^\\\]])*)\]\s*TJ"
+    rb"|(?P<newline>\bT\*|\bTd\b|\bTD\b|\bET\b)",
+    re.DOTALL,
+)
+ARRAY_ITEM_PATTERN = re.compile(
+    rb"\((?P<string>(?:\\.|[^\\)])*)\)|(?P<kern>-?\d+\.?\d*)"
+)
+ESCAPES = {
+    b"n": b"\n",
+    b"r": b"\r",
+    b"t": b"\t",
+    b"b": b"\b",
+    b"f": b"\f",
+    b"(": b"(",
+    b")": b")",
+    b"\\": b"\\",
+}
+ESCAPE_PATTERN = re.compile(rb"\\([0-7]{1,3}|.)", re.DOTALL)
+WORD_GAP = 200  # Kerning in TJ arrays wide enough to be a space
+PYPDF_MISSING = (
+    "pypdf isn't installed, so papers set in embedded CID fonts, like the"
+    " Sinhala and Tamil ones, aren't searchable. Install it with"
+    " `uv sync --extra search`."
+)
+
+
+def _unescape(string: bytes) -> str:
+    def replace(match: re.Match) -> bytes:
+        escape = match.group(1)
+        if escape[:1].isdigit():
+            return bytes([int(escape, 8) & 0xFF])
+        return ESCAPES.get(escape, escape)
+
+    return ESCAPE_PATTERN.sub(replace, string).decode("latin-1")
+
+
+def _stream_text(content: bytes) -> str:
+    parts = []
+    for match in TEXT_PATTERN.finditer(content):
+        if match.group("string") is not None:
+            parts.append(_unescape(match.group("string")))
+        elif match.group("array") is not None:
+            for item in ARRAY_ITEM_PATTERN.finditer(match.group("array")):
+                if item.group("string") is not None:
+                    parts.append(_unescape(item.group("string")))
+                elif -float(item.group("kern")) > WORD_GAP:
+                    parts.append(" ")
+        else:
+            parts.append("\n")
+    return "".join(parts)
+
+
+def _extract_streams(data: bytes) -> str:
+    texts = []
+    for match in STREAM_PATTERN.finditer(data):
+        content = match.group(1)
+        try:
+            content = zlib.decompress(content)
+        except zlib.error:
+            pass
+        # Skip images, fonts and other streams without a text object
+        if b"BT" not in content:
+            continue
+        text = _stream_text(content)
+        if text.strip():
+            texts.append(text)
+    return "\n".join(texts)
+
+
+def extract_text(path: str) -> str:
+    """
+    Extract the text of a PDF.
+
+    Uses pypdf when it's installed. Otherwise the content streams are
+    inflated and the literal strings of their text operators read as
+    Latin-1. That handles the simple fonts most generated English PDFs use,
+    but skips hex strings and can't map the glyphs of embedded CID fonts to
+    text, so Sinhala and Tamil papers come out empty.
+    """
+    if PdfReader is not None:
+        try:
+            reader = PdfReader(path)
+            return "\n".join(page.extract_text() or "" for page in reader.pages)
+        except Exception:
+            pass
+    with open(path, "rb") as file:
+        return _extract_streams(file.read())
@@ -0,0 +1,66 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from .data_types import Material
+from .material_handling import fetch_material
+from .store import store
+
+MAX_WORKERS = 4
+
+
+class Prefetcher:
+    """
+    Download materials into the content store in the background.
+
+    Downloads start as soon as a paper is found, so by the time the user
+    picks the materials they want, these only have to be linked into place.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="prefetch"
+        )
+        self._downloads: Dict[str, Future] = {}
+        self._discarded = False
+
+    def _download(self, material: Material) -> Optional[str]:
+        try:
+            return fetch_material(material, cancelled=lambda: self._discarded)
+        except Exception as e:
+            print(f"Failed to prefetch {material.name}: {e}")
+            return None
+
+    def start(self, materials: List[Material]):
+        """Start downloading every material that isn't already being."""
+        self._discarded = False
+        for material in materials:
+            if material.download_link in self._downloads:
+                continue
+            self._downloads[material.download_link] = self._executor.submit(
+                self._download, material
+            )
+
+    def result(self, material: Material) -> Optional[str]:
+        """
+        Wait for a prefetched material if necessary.
+
+        Returns:
+            The hash of the material in the content store, or None if it
+            wasn't prefetched
+        """
+        download = self._downloads.pop(material.download_link, None)
+        return download.result() if download else None
+
+    def discard(self):
+        """Stop the downloads nobody asked for and remove their content."""
+        self._discarded = True
+        for download in self._downloads.values():
+            download.cancel()
+        for download in self._downloads.values():
+            digest = not download.cancelled() and download.result()
+            if digest:
+                store.release(digest)
+        self._downloads.clear()
+
+
+prefetcher = Prefetcher()
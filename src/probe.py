@@ -0,0 +1,120 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from .bandwidth import Priority, traffic
+from .data_types import Material
+from .deadline import CONNECT_TIMEOUT, READ_TIMEOUT
+from .material_handling import fetch_material
+from .search import indexer
+from .store import LinkValidators, store
+from .transport import download_session
+
+CONCURRENCY = 8
+PROBE_INTERVAL = 15 * 60  # Seconds between probes in watch mode
+
+
+class ProbeResult(BaseModel):
+    checked: int = 0
+    changed: List[str] = Field(default_factory=list)
+    updated: List[str] = Field(default_factory=list)
+    failed: int = 0
+
+
+def probe_link(link: str) -> LinkValidators:
+    """
+    Get the validators of a link without downloading its content.
+
+    Sends a HEAD request, or a GET for the first byte if the server doesn't
+    answer HEAD or leaves out every validator.
+    """
+    timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+    with traffic.connection(link, Priority.MIRROR):
+        response = download_session.head(
+            link, allow_redirects=True, timeout=timeout
+        )
+        if response.status_code not in (405, 501):
+            response.raise_for_status()
+            validators = LinkValidators.from_headers(response.headers)
+            if validators != LinkValidators():
+                return validators
+
+        with download_session.get(
+            link, headers={"Range": "bytes=0-0"}, stream=True, timeout=timeout
+        ) as response:
+            # Closed without reading, so a server ignoring the range
+            # doesn't send the whole file
+            response.raise_for_status()
+            return LinkValidators.from_headers(response.headers)
+
+
+def _refresh(link: str, previous: str) -> Optional[str]:
+    # Downloads the new content and links it next to each file of the old
+    digest = fetch_material(
+        Material(name=os.path.basename(link), download_link=link),
+        refresh=True,
+        priority=Priority.MIRROR,
+    )
+    if not digest or digest == previous:
+        return None
+    return digest
+
+
+def probe_materials(concurrency: int = CONCURRENCY) -> ProbeResult:
+    """
+    Check the downloaded materials for changes, downloading changed ones.
+
+    Every stored link is probed at once, `concurrency` at a time, and its
+    validators compared to those it was downloaded with. Only a link whose
+    validators changed is downloaded again. If its content really is
+    different, it's linked next to each file that had the old content, as
+    `name (2).pdf` and so on.
+
+    Returns:
+        The links that changed and the files that were added for them
+    """
+    links = [link for link in store.index.links if store.lookup(link)]
+    result = ProbeResult(checked=len(links))
+    probed: Dict[str, LinkValidators] = {}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        probes = {executor.submit(probe_link, link): link for link in links}
+        for probe in as_completed(probes):
+            link = probes[probe]
+            try:
+                probed[link] = probe.result()
+            except Exception as e:
+                result.failed += 1
+                print(f"❌ Failed to probe {link}: {e}")
+
+    # Links downloaded before validators were kept get them as a baseline
+    baseline = {
+        link: validators
+        for link, validators in probed.items()
+        if link not in store.index.validators
+    }
+    if baseline:
+        store.set_validators(baseline)
+
+    for link, validators in probed.items():
+        previous = store.index.validators.get(link)
+        if link in baseline or not validators.changed_from(previous):
+            continue
+        result.changed.append(link)
+        digest = store.index.links[link]
+        try:
+            new_digest = _refresh(link, digest)
+        except Exception as e:
+            result.failed += 1
+            print(f"❌ Failed to download changed {link}: {e}")
+            continue
+        if not new_digest:
+            continue
+        for path in store.paths_of(digest):
+            new_path = store.place(new_digest, path)
+            result.updated.append(new_path)
+            print(f"✅ Changed: {path}, new version at {new_path}")
+            indexer.add(new_path)
+    return result
@@ -0,0 +1,56 @@
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+_recorder: Optional["PayloadRecorder"] = None
+
+
+class PayloadRecorder:
+    """
+    Append every fetched payload to a JSON lines file for later replay.
+
+    With `max_bytes`, the file is rotated to `<path>.1` once it grows past
+    that size, so at most two files worth of history are kept.
+    """
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, payload: Any, complete: bool = True):
+        line = json.dumps(
+            {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "endpoint": endpoint,
+                "payload": payload,
+                "complete": complete,
+            }
+        )
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(line + "\n")
+                size = file.tell()
+            if self.max_bytes and size > self.max_bytes:
+                os.replace(self.path, f"{self.path}.1")
+
+
+def start_recording(path: str, max_bytes: Optional[int] = None):
+    """Record every payload fetched from now on to `path`."""
+    global _recorder
+    _recorder = PayloadRecorder(path, max_bytes)
+
+
+def record_payload(endpoint: str, payload: Any, complete: bool = True):
+    """
+    Record `payload` if recording is enabled, otherwise do nothing.
+
+    Args:
+        endpoint: The endpoint the payload came from
+        payload: The decoded response
+        complete: False if the payload was fetched with a filter
+    """
+    if _recorder is not None and payload is not None:
+        _recorder.record(endpoint, payload, complete)
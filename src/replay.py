@@ -0,0 +1,258 @@
+import json
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from pydantic import BaseModel
+
+from . import check_essay, check_mcq
+from .data_types import Paper, WatchRule
+
+# Finder used to match a payload for each paper type, keyed with the endpoint
+# the payload must come from.
+FINDERS = {
+    Paper.PaperType.MCQ: (check_mcq.ENDPOINT, check_mcq.find_mcq_paper),
+    Paper.PaperType.ESSAY: (check_essay.ENDPOINT, check_essay.find_essay_paper),
+}
+
+# Functions returning a stable identity for the items of each endpoint
+ITEM_KEYS = {
+    check_mcq.ENDPOINT: check_mcq.item_key,
+    check_essay.ENDPOINT: check_essay.item_key,
+}
+
+SchedulePolicy = Union[float, Callable[[datetime], float]]
+
+
+class RecordedPayload(BaseModel):
+    """A single payload captured from an endpoint at a point in time."""
+
+    timestamp: datetime
+    endpoint: str
+    payload: Any
+    complete: bool = True  # False for payloads fetched with a filter
+
+
+class ReplayTarget(BaseModel):
+    """A paper being watched during a replay."""
+
+    paper_number: int
+    type: Paper.PaperType
+
+    @property
+    def rule(self) -> WatchRule:
+        """The watch rule the target is found with."""
+        return WatchRule.for_paper(self.paper_number, self.type)
+
+
+class ReplayDetection(BaseModel):
+    """When a target would have been detected during a replay."""
+
+    target: ReplayTarget
+    paper: Paper
+    available_at: datetime
+    detected_at: datetime
+    polls: int
+
+    @property
+    def latency(self) -> timedelta:
+        return self.detected_at - self.available_at
+
+
+class ReplayMiss(BaseModel):
+    """A target that was in the recording but never seen by a poll."""
+
+    target: ReplayTarget
+    # When it showed up and when it was gone again, None if it never was
+    windows: List[Tuple[datetime, Optional[datetime]]]
+
+
+def load_recording(path: str) -> List[RecordedPayload]:
+    """
+    Load a recording written by `src.recording`, sorted by timestamp.
+
+    Args:
+        path: Path to the JSON lines recording
+
+    Returns:
+        The recorded payloads in chronological order
+    """
+    recording = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                recording.append(RecordedPayload(**json.loads(line)))
+    recording.sort(key=lambda entry: entry.timestamp)
+    return recording
+
+
+def diff_payloads(
+    endpoint: str, previous: Optional[list], current: list
+) -> Tuple[list, list]:
+    """
+    Compare two payloads of the same endpoint.
+
+    Returns:
+        The keys of the items that were added and removed, in that order
+    """
+    get_key = ITEM_KEYS[endpoint]
+    previous_keys = {get_key(item) for item in previous or []}
+    current_keys = {get_key(item) for item in current}
+    added = [key for key in current_keys if key not in previous_keys]
+    removed = [key for key in previous_keys if key not in current_keys]
+    return added, removed
+
+
+def _next_interval(policy: SchedulePolicy, now: datetime) -> float:
+    if callable(policy):
+        return policy(now)
+    return policy
+
+
+def replay(
+    recording: List[RecordedPayload],
+    targets: List[ReplayTarget],
+    interval: SchedulePolicy = 60,
+    speed: float = 0,
+    on_detect: Optional[Callable[[ReplayDetection], None]] = None,
+    on_diff: Optional[Callable[[datetime, str, list, list], None]] = None,
+    on_miss: Optional[Callable[[ReplayMiss], None]] = None,
+) -> List[ReplayDetection]:
+    """
+    Run the matching pipeline over a recording as if it was polled live.
+
+    The watcher is simulated polling at `interval` seconds (or at the delay
+    returned by a scheduling policy), seeing the latest payload recorded at
+    the time of each poll. Polling stops with the first poll at or after
+    the last payload, a target that was only up between two polls is
+    missed.
+
+    Args:
+        recording: The recorded payloads, sorted by timestamp
+        targets: The papers to watch for
+        interval: Seconds between polls, or a callable returning them
+        speed: Replay speed relative to real time, 0 to run without sleeping
+        on_detect: Called with each detection when it happens
+        on_diff: Called with the added and removed keys of each new payload
+        on_miss: Called at the end with each target that was in the
+            recording but never detected
+
+    Returns:
+        The detections, in the order they happened
+    """
+    if not recording:
+        return []
+
+    # When each target was visible in the recorded data
+    windows: Dict[int, List[list]] = {}
+    for entry in recording:
+        for index, target in enumerate(targets):
+            endpoint, finder = FINDERS[target.type]
+            if entry.endpoint != endpoint:
+                continue
+            target_windows = windows.setdefault(index, [])
+            is_open = bool(target_windows) and target_windows[-1][1] is None
+            if finder(entry.payload, target.paper_number):
+                if not is_open:
+                    target_windows.append([entry.timestamp, None])
+            # A filtered payload may leave out items that are still there
+            elif is_open and entry.complete:
+                target_windows[-1][1] = entry.timestamp
+    available_at = {
+        index: target_windows[0][0]
+        for index, target_windows in windows.items()
+        if target_windows
+    }
+
+    detections: List[ReplayDetection] = []
+    pending = set(range(len(targets)))
+    latest: Dict[str, list] = {}
+    complete: Dict[str, list] = {}  # Latest complete payloads, for diffs
+    position = 0
+    polls = 0
+    now = recording[0].timestamp
+    end = recording[-1].timestamp
+
+    while pending:
+        polls += 1
+        while (
+            position < len(recording) and recording[position].timestamp <= now
+        ):
+            entry = recording[position]
+            # Items missing from a filtered payload weren't removed
+            if on_diff and entry.complete:
+                added, removed = diff_payloads(
+                    entry.endpoint, complete.get(entry.endpoint), entry.payload
+                )
+                if added or removed:
+                    on_diff(entry.timestamp, entry.endpoint, added, removed)
+            if entry.complete:
+                complete[entry.endpoint] = entry.payload
+            latest[entry.endpoint] = entry.payload
+            position += 1
+
+        for index in sorted(pending):
+            target = targets[index]
+            endpoint, finder = FINDERS[target.type]
+            if endpoint not in latest:
+                continue
+            paper = finder(latest[endpoint], target.paper_number)
+            if paper:
+                pending.discard(index)
+                detection = ReplayDetection(
+                    target=target,
+                    paper=paper,
+                    available_at=available_at[index],
+                    detected_at=now,
+                    polls=polls,
+                )
+                detections.append(detection)
+                if on_detect:
+                    on_detect(detection)
+
+        # This poll saw the last payload, what's still pending was missed
+        if now >= end:
+            break
+        delay = _next_interval(interval, now)
+        if speed > 0:
+            time.sleep(delay / speed)
+        now += timedelta(seconds=delay)
+
+    if on_miss:
+        for index in sorted(pending & available_at.keys()):
+            on_miss(
+                ReplayMiss(
+                    target=targets[index],
+                    windows=[tuple(window) for window in windows[index]],
+                )
+            )
+    return detections
+
+
+def print_report(
+    detections: List[ReplayDetection],
+    targets: List[ReplayTarget],
+    misses: Optional[List[ReplayMiss]] = None,
+):
+    """Print when each target would have been detected."""
+    print("=" * 60)
+    for target in targets:
+        detection = next((d for d in detections if d.target == target), None)
+        miss = next((m for m in misses or [] if m.target == target), None)
+        label = f"{target.type.value} {target.paper_number}"
+        if detection:
+            print(
+                f"{label}: detected at {detection.detected_at.isoformat()} "
+                f"after {detection.polls} polls "
+                f"(+{detection.latency.total_seconds():.0f}s)"
+            )
+        elif miss:
+            up = ", ".join(
+                f"{start.isoformat()} to "
+                f"{gone.isoformat() if gone else 'the end'}"
+                for start, gone in miss.windows
+            )
+            print(f"{label}: missed, only up between polls ({up})")
+        else:
+            print(f"{label}: never detected")
+    print("=" * 60)
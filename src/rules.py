@@ -0,0 +1,140 @@
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Dict, List, Set, Tuple
+
+from .data_types import WatchRule
+
+
+class AhoCorasick:
+    """Automaton finding every occurrence of many tokens in one pass."""
+
+    def __init__(self, tokens: List[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+
+        for index, token in enumerate(tokens):
+            state = 0
+            for character in token:
+                if character not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                    self._goto[state][character] = len(self._goto) - 1
+                state = self._goto[state][character]
+            self._output[state] += (index,)
+
+        # Breadth first, so the fail state of each state is already linked
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for character, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and character not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(character, 0)
+                self._fail[next_state] = fail
+                self._output[next_state] += self._output[fail]
+
+    def search(self, text: str) -> Set[int]:
+        """Get the indexes of the tokens found in `text`."""
+        found = set()
+        state = 0
+        goto, fail, output = self._goto, self._fail, self._output
+        for character in text:
+            while state and character not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(character, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+
+class RuleSet:
+    """
+    Watch rules compiled to be evaluated on a title all at once.
+
+    Every token of every rule goes into a single Aho-Corasick automaton, so
+    a title is scanned once however many rules there are. An inverted index
+    from each token to the rules requiring it counts the `all_of` hits of
+    that one scan, and only the rules whose required tokens were all found
+    are looked at further. Regexes are tried last, on those candidates.
+    Rules without `all_of` or `any_of` tokens have nothing to index them by
+    and are candidates for every title.
+    """
+
+    def __init__(self, rules: Tuple[WatchRule, ...]):
+        self.rules = rules
+        token_ids: Dict[str, int] = {}
+
+        def ids(tokens):
+            return frozenset(
+                token_ids.setdefault(token.lower(), len(token_ids))
+                for token in tokens
+                if token
+            )
+
+        self._all_of = [ids(rule.all_of) for rule in rules]
+        self._any_of = [ids(rule.any_of) for rule in rules]
+        self._exclude = [ids(rule.exclude) for rule in rules]
+        self._automaton = AhoCorasick(list(token_ids))
+
+        # Token -> rules requiring it, and for the rules without required
+        # tokens, token -> rules accepting it
+        self._requiring: Dict[int, List[int]] = {}
+        self._accepting: Dict[int, List[int]] = {}
+        self._always: List[int] = []
+        for index in range(len(rules)):
+            if self._all_of[index]:
+                for token in self._all_of[index]:
+                    self._requiring.setdefault(token, []).append(index)
+            elif self._any_of[index]:
+                for token in self._any_of[index]:
+                    self._accepting.setdefault(token, []).append(index)
+            else:
+                self._always.append(index)
+
+        # Regexes are kept apart, each with its own groups and backreferences
+        self._regexes = [
+            tuple(re.compile(pattern, re.IGNORECASE) for pattern in rule.regex)
+            for rule in rules
+        ]
+
+    def _candidates(self, tokens: Set[int]) -> Set[int]:
+        hits: Dict[int, int] = {}
+        candidates = set(self._always)
+        for token in tokens:
+            for index in self._requiring.get(token, ()):
+                hits[index] = hits.get(index, 0) + 1
+            candidates.update(self._accepting.get(token, ()))
+        candidates.update(
+            index
+            for index, count in hits.items()
+            if count == len(self._all_of[index])
+        )
+        return candidates
+
+    def match(self, title: str) -> List[WatchRule]:
+        """Get the rules matching a title, in the order they were given."""
+        tokens = self._automaton.search(title.lower())
+
+        matched = []
+        for index in sorted(self._candidates(tokens)):
+            if self._any_of[index] and not self._any_of[index] & tokens:
+                continue
+            if self._exclude[index] & tokens:
+                continue
+            if self._regexes[index] and not any(
+                regex.search(title) for regex in self._regexes[index]
+            ):
+                continue
+            matched.append(self.rules[index])
+        return matched
+
+
+@lru_cache(maxsize=32)
+def compile_rules(rules: Tuple[WatchRule, ...]) -> RuleSet:
+    """Compile watch rules, reusing the last compilations."""
+    return RuleSet(rules)
@@ -0,0 +1,170 @@
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from .data_types import Paper, WatchRule
+
+RELEASE_HISTORY_FILE = "release_history.json"
+
+DAYS = 7
+HOURS = 24
+
+
+def series_of(rule: WatchRule) -> str:
+    """
+    Get the series a watch rule belongs to, e.g. "PET MCQ" for "PET 30 MCQ".
+
+    The series comes from the rule rather than the title of the paper it
+    matched, which the API words its own way (e.g. "2025 PET 31"), so the
+    releases observed and the series polled for always agree. Numbers are
+    left out, the rules of every paper of a series share it.
+
+    Args:
+        rule: The rule that matched, or is waiting to match
+
+    Returns:
+        The series name used to group release times
+    """
+    paper_type = Paper.PaperType(rule.paper_type).value
+    words = [word for word in rule.name.upper().split() if not word.isdigit()]
+    if words and words[-1] == paper_type:
+        words.pop()
+    return " ".join(words + [paper_type])
+
+
+def _local(when: datetime) -> datetime:
+    # Aware times are bucketed in local time, like the naive ones
+    return when.astimezone() if when.tzinfo else when
+
+
+class ReleaseModel:
+    """
+    Day of week by hour histogram of past release times for each series.
+
+    Older observations decay every time a new one is added, so the model
+    follows changes to the release rhythm.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = RELEASE_HISTORY_FILE,
+        decay: float = 0.9,
+    ):
+        self.path = path
+        self.decay = decay
+        self.histograms: Dict[str, List[List[float]]] = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                self.histograms = json.load(file)
+
+    def save(self):
+        if not self.path:
+            return
+        with open(self.path, "w", encoding="utf-8") as file:
+            json.dump(self.histograms, file)
+
+    def observe(self, series: str, released_at: datetime):
+        """Add a release time to the history of a series."""
+        histogram = self.histograms.setdefault(
+            series, [[0.0] * HOURS for _ in range(DAYS)]
+        )
+        for day in histogram:
+            for hour in range(HOURS):
+                day[hour] *= self.decay
+        released_at = _local(released_at)
+        histogram[released_at.weekday()][released_at.hour] += 1
+
+    def weight(self, series: str) -> float:
+        histogram = self.histograms.get(series)
+        if not histogram:
+            return 0
+        return sum(sum(day) for day in histogram)
+
+    def probability(self, series: str, when: datetime) -> float:
+        """
+        Get the share of past releases of a series in the hour of `when`.
+        """
+        total = self.weight(series)
+        if not total:
+            return 0
+        when = _local(when)
+        return self.histograms[series][when.weekday()][when.hour] / total
+
+
+class PollScheduler:
+    """
+    Decide how long to wait before the next poll using a ReleaseModel.
+
+    Polls go to `burst_interval` during the hours where releases are likely,
+    back off to `idle_interval` outside of them and stay at `base_interval`
+    while the model doesn't have enough history to be trusted.
+    """
+
+    def __init__(
+        self,
+        model: ReleaseModel,
+        series: List[str],
+        base_interval: float = 60,
+        burst_interval: float = 10,
+        idle_interval: float = 300,
+        prearm_lead: timedelta = timedelta(minutes=5),
+        hot_ratio: float = 2,
+        min_observations: float = 3,
+    ):
+        self.model = model
+        self.series = series
+        self.base_interval = base_interval
+        self.burst_interval = burst_interval
+        self.idle_interval = idle_interval
+        self.prearm_lead = prearm_lead
+        self.min_observations = min_observations
+        # A window is hot when it holds `hot_ratio` times its uniform share
+        self.hot_threshold = hot_ratio / (DAYS * HOURS)
+        self._armed_window: Optional[datetime] = None
+
+    def trained(self) -> bool:
+        return any(
+            self.model.weight(series) >= self.min_observations
+            for series in self.series
+        )
+
+    def is_hot(self, when: datetime) -> bool:
+        return any(
+            self.model.probability(series, when) >= self.hot_threshold
+            for series in self.series
+        )
+
+    def _window_start(self, when: datetime) -> datetime:
+        return when.replace(minute=0, second=0, microsecond=0)
+
+    def next_interval(self, now: datetime) -> float:
+        """Get the number of seconds to wait before polling again."""
+        if not self.trained():
+            return self.base_interval
+        if self.is_hot(now):
+            return self.burst_interval
+
+        # Don't sleep past the start of the next hot window
+        upcoming = self._window_start(now) + timedelta(hours=1)
+        if self.is_hot(upcoming):
+            until_window = (upcoming - now).total_seconds()
+            return max(min(self.base_interval, until_window), 1)
+        return self.idle_interval
+
+    def should_prearm(self, now: datetime) -> bool:
+        """
+        Check if a hot window starts soon and hasn't been prepared for yet.
+        """
+        if not self.trained():
+            return False
+        upcoming = self._window_start(now + self.prearm_lead)
+        if upcoming <= now or not self.is_hot(upcoming):
+            return False
+        if self.is_hot(upcoming - timedelta(hours=1)):
+            # Already in a burst, the connection is warm
+            return False
+        if self._armed_window == upcoming:
+            return False
+        self._armed_window = upcoming
+        return True
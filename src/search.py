@@ -0,0 +1,231 @@
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from .catalogue import parse_paper_number
+from .data_types import Config
+from .pdftext import extract_text
+
+config = Config()
+
+INDEX_FILE_NAME = ".search.sqlite"
+MAX_WORKERS = 2
+SNIPPET_TOKENS = 12
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+    name,
+    body,
+    path UNINDEXED,
+    number UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+class SearchHit(BaseModel):
+    path: str
+    name: str
+    number: Optional[int] = None
+    snippet: str
+
+
+class SearchIndex:
+    """
+    Full-text index of the downloaded PDFs in SQLite FTS5.
+
+    Files are indexed by path with their size and modification time, so
+    only new or changed files are extracted again.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.path.join(
+            config.download_folder, INDEX_FILE_NAME
+        )
+        self._lock = threading.Lock()
+        db = self._connect()
+        try:
+            db.executescript(SCHEMA)
+        finally:
+            db.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=10)
+
+    def is_current(self, path: str) -> bool:
+        """Check if a file is indexed as it is on disk now."""
+        stat = os.stat(path)
+        db = self._connect()
+        try:
+            row = db.execute(
+                "SELECT size, mtime_ns FROM files WHERE path = ?", (path,)
+            ).fetchone()
+        finally:
+            db.close()
+        return row == (stat.st_size, stat.st_mtime_ns)
+
+    def add(self, path: str, name: str, body: str):
+        """Index the text of a file, replacing what was indexed for it."""
+        stat = os.stat(path)
+        with self._lock:
+            db = self._connect()
+            try:
+                with db:
+                    db.execute("DELETE FROM documents WHERE path = ?", (path,))
+                    db.execute(
+                        "INSERT INTO documents VALUES (?, ?, ?, ?)",
+                        (name, body, path, parse_paper_number(name)),
+                    )
+                    db.execute(
+                        "INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+                        (path, stat.st_size, stat.st_mtime_ns),
+                    )
+            finally:
+                db.close()
+
+    def remove_missing(self) -> int:
+        """Drop the files that were deleted since they were indexed."""
+        with self._lock:
+            db = self._connect()
+            try:
+                missing = [
+                    path
+                    for (path,) in db.execute("SELECT path FROM files")
+                    if not os.path.exists(path)
+                ]
+                with db:
+                    for path in missing:
+                        db.execute(
+                            "DELETE FROM documents WHERE path = ?", (path,)
+                        )
+                        db.execute("DELETE FROM files WHERE path = ?", (path,))
+            finally:
+                db.close()
+        return len(missing)
+
+    def search(
+        self, query: str, number: Optional[int] = None, limit: int = 20
+    ) -> List[SearchHit]:
+        """
+        Search the indexed files, best matches first.
+
+        Args:
+            query: FTS5 query, e.g. `photosynthesis` or `"light reaction"`
+            number: Only search the files of this paper number
+            limit: Maximum number of hits
+
+        Raises:
+            ValueError: If the query isn't valid FTS5 syntax
+        """
+        sql = (
+            "SELECT path, name, number,"
+            " snippet(documents, 1, '[', ']', '...', ?)"
+            " FROM documents WHERE documents MATCH ?"
+        )
+        params: list = [SNIPPET_TOKENS, query]
+        if number is not None:
+            sql += " AND number = ?"
+            params.append(number)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+
+        db = self._connect()
+        try:
+            rows = db.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            raise ValueError(f"Invalid search query {query!r}: {e}") from e
+        finally:
+            db.close()
+        return [
+            SearchHit(
+                path=path,
+                name=name,
+                number=number,
+                snippet=" ".join(snippet.split()),
+            )
+            for path, name, number, snippet in rows
+        ]
+
+
+class Indexer:
+    """
+    Extract and index PDFs in the background.
+
+    Text is extracted in a process pool, so big PDFs don't compete with
+    polling for the interpreter, and written to the index from the parent
+    process as each extraction finishes.
+    """
+
+    def __init__(
+        self, index: Optional[SearchIndex] = None, max_workers=MAX_WORKERS
+    ):
+        self._index = index
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def index(self) -> SearchIndex:
+        if self._index is None:
+            self._index = SearchIndex()
+        return self._index
+
+    def _indexed(self, path: str, name: str, extraction: Future):
+        try:
+            self.index.add(path, name, extraction.result())
+        except Exception as e:
+            print(f"Failed to index {path}: {e}")
+
+    def add(self, path: str, name: Optional[str] = None) -> Optional[Future]:
+        """
+        Queue a PDF to be indexed, unless it's already indexed as it is.
+
+        Args:
+            path: The PDF
+            name: Name of the paper or material, the file name if not given
+        """
+        if self.index.is_current(path):
+            return None
+        if self._executor is None:
+            # Forking a process that runs threads can copy a held lock
+            self._executor = ProcessPoolExecutor(
+                self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        name = name or os.path.splitext(os.path.basename(path))[0]
+        extraction = self._executor.submit(extract_text, path)
+        extraction.add_done_callback(
+            lambda done: self._indexed(path, name, done)
+        )
+        return extraction
+
+    def add_folder(self, folder: Optional[str] = None) -> List[Future]:
+        """Queue every new or changed PDF in a folder."""
+        folder = folder or config.download_folder
+        extractions = []
+        for root, dirs, files in os.walk(folder):
+            # Skip the content store, its files are linked into the folder
+            dirs[:] = [name for name in dirs if not name.startswith(".")]
+            for file_name in files:
+                if file_name.lower().endswith(".pdf"):
+                    extraction = self.add(os.path.join(root, file_name))
+                    if extraction:
+                        extractions.append(extraction)
+        return extractions
+
+    def shutdown(self, wait: bool = True):
+        if self._executor:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+indexer = Indexer()
@@ -0,0 +1,133 @@
+import math
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from .data_types import Paper
+from .timestamps import to_utc
+
+DETECTIONS_FILE = "detections.jsonl"
+PERCENTILES = (50, 90, 99)
+
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    return to_utc(value) if value else None
+
+
+def upstream_time(paper: Paper) -> Optional[datetime]:
+    """
+    Get when a paper was published upstream.
+
+    Exams carry their unlock time and materials their own unlock time, the
+    earliest known one is used.
+    """
+    times = [paper.unlocks_at] + [
+        material.unlocks_at for material in paper.materials or []
+    ]
+    times = [as_utc(time) for time in times if time]
+    return min(times) if times else None
+
+
+class DetectionRecord(BaseModel):
+    """Timeline of one detection, from publication to downloaded files."""
+
+    name: Optional[str] = None
+    type: Optional[Paper.PaperType] = None
+    upstream_at: Optional[datetime] = None
+    first_seen_at: datetime
+    notified_at: Optional[datetime] = None
+    downloaded_at: Optional[datetime] = None
+    # Seconds spent waiting for the user to answer the download prompts
+    prompt_seconds: Optional[float] = None
+    # Sequence number of the detection in the event log
+    event_seq: Optional[int] = None
+
+    def delays(self) -> Dict[str, float]:
+        """
+        Get the delays between the steps of the timeline in seconds.
+
+        Time spent on the download prompts is its own delay and is left out
+        of the end to end one, which only measures the watcher.
+        """
+        delays = {}
+        if self.upstream_at:
+            delays["detection"] = (
+                self.first_seen_at - self.upstream_at
+            ).total_seconds()
+        if self.notified_at:
+            delays["notification"] = (
+                self.notified_at - self.first_seen_at
+            ).total_seconds()
+        if self.prompt_seconds is not None:
+            delays["prompt"] = self.prompt_seconds
+        if self.downloaded_at:
+            start = self.upstream_at or self.first_seen_at
+            delays["end to end"] = (
+                self.downloaded_at - start
+            ).total_seconds() - (self.prompt_seconds or 0)
+        return delays
+
+
+def start_detection(paper: Paper, first_seen_at: datetime) -> DetectionRecord:
+    return DetectionRecord(
+        name=paper.name,
+        type=paper.type,
+        upstream_at=upstream_time(paper),
+        first_seen_at=as_utc(first_seen_at),
+    )
+
+
+def now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def save_detection(record: DetectionRecord, path: str = DETECTIONS_FILE):
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(record.model_dump_json() + "\n")
+
+
+def load_detections(
+    path: str = DETECTIONS_FILE, since: Optional[datetime] = None
+) -> List[DetectionRecord]:
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, "r", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                record = DetectionRecord.model_validate_json(line)
+                if since is None or record.first_seen_at >= since:
+                    records.append(record)
+    return records
+
+
+def percentile(values: List[float], percent: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
+
+
+def print_slo_report(days: Optional[float] = None):
+    """Print percentiles of each delay over the recorded detections."""
+    since = now() - timedelta(days=days) if days else None
+    records = load_detections(since=since)
+    if not records:
+        print("No detections recorded yet")
+        return
+
+    delays: Dict[str, List[float]] = {}
+    for record in records:
+        for name, delay in record.delays().items():
+            delays.setdefault(name, []).append(delay)
+
+    print("=" * 60)
+    print(f"{len(records)} detections")
+    for name, values in delays.items():
+        summary = ", ".join(
+            f"p{p} {percentile(values, p):.1f}s" for p in PERCENTILES
+        )
+        print(f"{name.capitalize()} delay: {summary} (n={len(values)})")
+    print("=" * 60)
@@ -0,0 +1,373 @@
+import mmap
+import os
+import struct
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional
+
+# Only the standard library is imported here, so reading a snapshot doesn't
+# load the config or anything else of the watcher
+
+SNAPSHOT_FILE = "catalogue.snapshot"
+MAGIC = b"PETSNAP1"
+REPLACE_RETRIES = 20  # Attempts to replace a snapshot a reader holds open
+REPLACE_DELAY = 0.05  # Seconds between them
+
+# Little-endian records, laid out so a reader can look a paper up in place:
+#   header: magic, generation, published at (epoch seconds), body size,
+#       entry count, material count, offset of the strings in the body
+#   entry: paper number, flags, topic count, material count, index of its
+#       first material, essay unlock and expiry (epoch ms), MCQ name and
+#       essay name (offset and length in the strings)
+#   material: unlock and expiry (epoch ms), name and link
+# Entries are sorted by paper number, then come materials and strings.
+HEADER = struct.Struct("<8sQdIIII")
+ENTRY = struct.Struct("<IBBHIqqIHIH")
+MATERIAL = struct.Struct("<qqIHIH")
+NUMBER = struct.Struct("<I")
+
+HAS_MCQ = 1
+HAS_ESSAY = 2
+NO_TIME = -(2**63)
+MAX_STRING = 0xFFFF
+
+# Values of `Paper.PaperType`
+MCQ = "MCQ"
+ESSAY = "ESSAY"
+
+
+class SnapshotMaterial(NamedTuple):
+    name: Optional[str] = None
+    download_link: Optional[str] = None
+    unlocks_at: Optional[datetime] = None
+    expires_at: Optional[datetime] = None
+
+
+class SnapshotEntry(NamedTuple):
+    """One paper number as published in a snapshot."""
+
+    number: int
+    mcq_name: Optional[str] = None
+    essay_name: Optional[str] = None
+    essay_unlocks_at: Optional[datetime] = None
+    essay_expires_at: Optional[datetime] = None
+    topics: int = 0
+    materials: List[SnapshotMaterial] = []
+
+
+def _millis(value: Optional[datetime]) -> int:
+    if value is None:
+        return NO_TIME
+    # Naive times are local times
+    return int(value.timestamp() * 1000)
+
+
+def _from_millis(value: int) -> Optional[datetime]:
+    if value == NO_TIME:
+        return None
+    return datetime.fromtimestamp(value / 1000, timezone.utc)
+
+
+class _Strings:
+    """String table of a snapshot, each distinct string stored once."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self._offsets = {}
+
+    def add(self, value: Optional[str]):
+        if not value:
+            return 0, 0
+        encoded = value.encode("utf-8")[:MAX_STRING]
+        offset = self._offsets.get(encoded)
+        if offset is None:
+            offset = self._offsets[encoded] = len(self.data)
+            self.data += encoded
+        return offset, len(encoded)
+
+
+def encode_entries(entries: list) -> tuple:
+    """
+    Encode catalogue entries into a snapshot body.
+
+    Args:
+        entries: The `CatalogueEntry` objects of a catalogue
+
+    Returns:
+        The body, the number of materials and the offset of the strings
+    """
+    strings = _Strings()
+    entry_data = bytearray()
+    material_data = bytearray()
+    material_count = 0
+    for entry in sorted(entries, key=lambda entry: entry.number):
+        mcq = entry.mcq
+        essay = entry.essay
+        flags = (HAS_MCQ if mcq else 0) | (HAS_ESSAY if essay else 0)
+        materials = entry.materials
+        entry_data += ENTRY.pack(
+            entry.number,
+            flags,
+            min(len(entry.topics), 0xFF),
+            len(materials),
+            material_count,
+            _millis(essay and essay.unlocks_at),
+            _millis(essay and essay.expires_at),
+            *strings.add(mcq and mcq.name),
+            *strings.add(essay and essay.name),
+        )
+        for material in materials:
+            material_data += MATERIAL.pack(
+                _millis(material.unlocks_at),
+                _millis(material.expires_at),
+                *strings.add(material.name),
+                *strings.add(material.download_link),
+            )
+        material_count += len(materials)
+    body = bytes(entry_data + material_data + strings.data)
+    return body, material_count, len(entry_data) + len(material_data)
+
+
+def _read_generation(path: str) -> int:
+    try:
+        with open(path, "rb") as file:
+            header = file.read(HEADER.size)
+    except OSError:
+        return 0
+    if len(header) < HEADER.size or header[: len(MAGIC)] != MAGIC:
+        return 0
+    return HEADER.unpack(header)[1]
+
+
+class SnapshotWriter:
+    """
+    Publish the catalogue to a file local readers memory-map.
+
+    Each snapshot is written to a temporary file that then replaces the
+    previous one, so a file is never changed once published: readers keep
+    the snapshot they mapped until they see a new file at the path. The
+    generation in the header goes up with each snapshot.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        # Go on from the generation of a previous run, so readers still
+        # holding it see the change
+        self._generation = _read_generation(path)
+
+    def _replace(self, partial_path: str):
+        # Windows refuses to replace a file a reader has open, retry until
+        # it's closed
+        for _ in range(REPLACE_RETRIES - 1):
+            try:
+                os.replace(partial_path, self.path)
+                return
+            except PermissionError:
+                time.sleep(REPLACE_DELAY)
+        os.replace(partial_path, self.path)
+
+    def publish(self, catalogue):
+        """Write the current entries of a catalogue as a new snapshot."""
+        body, material_count, strings_offset = encode_entries(
+            list(catalogue.entries.values())
+        )
+        with self._lock:
+            self._generation += 1
+            header = HEADER.pack(
+                MAGIC,
+                self._generation,
+                time.time(),
+                len(body),
+                len(catalogue.entries),
+                material_count,
+                strings_offset,
+            )
+            partial_path = f"{self.path}.part"
+            with open(partial_path, "wb") as file:
+                file.write(header + body)
+            try:
+                self._replace(partial_path)
+            except OSError as e:
+                print(f"Failed to publish the catalogue snapshot: {e}")
+
+
+class SnapshotReader:
+    """
+    Read a catalogue snapshot published by a running watcher.
+
+    Lookups read the memory-mapped file in place, without HTTP or JSON.
+    Every lookup checks whether the watcher published a newer file, and
+    maps it if it did.
+
+    Example:
+        with SnapshotReader() as snapshot:
+            if snapshot.is_out(31):
+                print("PET 31 is out")
+    """
+
+    def __init__(self, path: str = SNAPSHOT_FILE):
+        self.path = path
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._identity = None
+        self._open()
+
+    def __enter__(self) -> "SnapshotReader":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._file.close()
+            self._map = None
+
+    def _open(self):
+        file = open(self.path, "rb")
+        try:
+            stat = os.fstat(file.fileno())
+            if stat.st_size < HEADER.size:
+                raise ValueError(f"{self.path} is not a catalogue snapshot")
+            new_map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            file.close()
+            raise
+        self.close()
+        self._file, self._map = file, new_map
+        self._identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        header = HEADER.unpack_from(self._map, 0)
+        if header[0] != MAGIC or HEADER.size + header[3] > len(self._map):
+            raise ValueError(f"{self.path} is not a catalogue snapshot")
+        self._header = header
+
+    def _current(self):
+        # Picks up a snapshot published since the last lookup
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return self._header
+        if (stat.st_ino, stat.st_mtime_ns, stat.st_size) != self._identity:
+            self._open()
+        return self._header
+
+    def _read(self, read):
+        header = self._current()
+        try:
+            return read(header)
+        except (struct.error, IndexError, UnicodeDecodeError):
+            raise ValueError(f"{self.path} is corrupt")
+
+    def _find(self, header, number: int) -> Optional[int]:
+        # Binary search of the sorted entries, reading only their numbers
+        low, high = 0, header[4]
+        while low < high:
+            middle = (low + high) // 2
+            offset = HEADER.size + middle * ENTRY.size
+            (found,) = NUMBER.unpack_from(self._map, offset)
+            if found == number:
+                return offset
+            if found < number:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def _string(self, header, offset: int, length: int) -> Optional[str]:
+        if not length:
+            return None
+        start = HEADER.size + header[6] + offset
+        return str(self._map[start : start + length], "utf-8")
+
+    @property
+    def generation(self) -> int:
+        """Number of the current snapshot, it changes with every publish."""
+        return self._read(lambda header: header[1])
+
+    @property
+    def published_at(self) -> datetime:
+        return self._read(
+            lambda header: datetime.fromtimestamp(header[2], timezone.utc)
+        )
+
+    def is_out(self, number: int, paper_type: Optional[str] = None) -> bool:
+        """
+        Check if a paper is out, reading only its flags and unlock time.
+
+        An MCQ is out once its topic is listed, an essay once its exam is
+        listed and unlocked.
+
+        Args:
+            number: The paper number
+            paper_type: The half to check, "MCQ" or "ESSAY", either one if
+                not given
+        """
+
+        def read(header) -> bool:
+            offset = self._find(header, number)
+            if offset is None:
+                return False
+            _, flags, _, _, _, unlocks_at, *_ = ENTRY.unpack_from(
+                self._map, offset
+            )
+            mcq_out = bool(flags & HAS_MCQ)
+            essay_out = bool(flags & HAS_ESSAY) and (
+                unlocks_at == NO_TIME or unlocks_at <= time.time() * 1000
+            )
+            if paper_type == MCQ:
+                return mcq_out
+            if paper_type == ESSAY:
+                return essay_out
+            return mcq_out or essay_out
+
+        return self._read(read)
+
+    def get(self, number: int) -> Optional[SnapshotEntry]:
+        """Get everything the snapshot has on a paper number."""
+
+        def read(header) -> Optional[SnapshotEntry]:
+            offset = self._find(header, number)
+            if offset is None:
+                return None
+            (
+                _,
+                _,
+                topics,
+                material_count,
+                first_material,
+                unlocks_at,
+                expires_at,
+                *names,
+            ) = ENTRY.unpack_from(self._map, offset)
+            materials_start = HEADER.size + header[4] * ENTRY.size
+            materials = []
+            for index in range(first_material, first_material + material_count):
+                (
+                    material_unlocks_at,
+                    material_expires_at,
+                    *strings,
+                ) = MATERIAL.unpack_from(
+                    self._map, materials_start + index * MATERIAL.size
+                )
+                materials.append(
+                    SnapshotMaterial(
+                        name=self._string(header, *strings[:2]),
+                        download_link=self._string(header, *strings[2:]),
+                        unlocks_at=_from_millis(material_unlocks_at),
+                        expires_at=_from_millis(material_expires_at),
+                    )
+                )
+            return SnapshotEntry(
+                number=number,
+                mcq_name=self._string(header, *names[:2]),
+                essay_name=self._string(header, *names[2:]),
+                essay_unlocks_at=_from_millis(unlocks_at),
+                essay_expires_at=_from_millis(expires_at),
+                topics=topics,
+                materials=materials,
+            )
+
+        return self._read(read)
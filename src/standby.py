@@ -0,0 +1,150 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+from .auth import auth_request
+from .data_types import Config, Paper
+from .deadline import CONNECT_TIMEOUT
+from .store import store
+from .timestamps import display_timestamp
+from .transport import download_session
+
+config = Config()
+
+PREWARM_LEAD = timedelta(seconds=15)  # Start warming up before the unlock
+TIGHT_INTERVAL = 1  # Seconds between polls around the unlock
+# How long past its unlock a paper is held for a poll to see it unlocked
+UNLOCK_GRACE = timedelta(minutes=2)
+POOL_CONNECTIONS = 4  # Connections kept open for the poll and downloads
+
+
+def _now_like(value: datetime) -> datetime:
+    # Compare aware timestamps with an aware now, naive ones with local time
+    if value.tzinfo:
+        return datetime.now(timezone.utc)
+    return datetime.now()
+
+
+def _download_origins(paper: Optional[Paper]) -> List[str]:
+    # Hosts the downloads will come from: the paper's own links if it has
+    # any, otherwise the last one a material was downloaded from
+    links = [
+        material.download_link
+        for material in (paper.materials if paper else None) or []
+        if material.download_link
+    ]
+    if not links:
+        links = list(store.index.links)[-1:]
+    origins = []
+    for link in links:
+        parts = urlsplit(link)
+        origin = f"{parts.scheme}://{parts.netloc}/"
+        if parts.netloc and origin not in origins:
+            origins.append(origin)
+    return origins
+
+
+def prewarm(until: Optional[datetime] = None, paper: Optional[Paper] = None):
+    """
+    Get the sessions and the download folder ready for an imminent unlock.
+
+    Args:
+        until: When the unlock happens, the token is kept valid past it
+        paper: The paper about to unlock, its downloads are warmed up too
+    """
+    min_validity = 60 * 10
+    if until:
+        remaining = (until - _now_like(until)).total_seconds()
+        min_validity += max(remaining, 0)
+    auth_request.warm_up(min_validity, connections=POOL_CONNECTIONS)
+
+    # Materials are downloaded with their own session from other hosts
+    for origin in _download_origins(paper):
+        try:
+            download_session.head(origin, timeout=CONNECT_TIMEOUT).close()
+        except Exception as e:
+            print(f"Failed to warm up downloads from {origin}: {e}")
+
+    # Touch the download folder so creating files in it doesn't block later
+    os.makedirs(config.download_folder, exist_ok=True)
+    with os.scandir(config.download_folder) as entries:
+        for _ in entries:
+            pass
+
+
+class Standby:
+    """
+    Papers found before they unlock, held while the watcher keeps polling.
+
+    Holding a paper doesn't block: the poll loop asks `next_interval` how
+    long to sleep, which wakes it up `lead` before the earliest unlock to
+    warm up, and every `interval` seconds once the unlock passed, until a
+    poll sees the paper unlocked. A paper no poll saw unlocked within
+    `grace` of its unlock, e.g. because it was taken down, is let go.
+    """
+
+    def __init__(
+        self,
+        lead: timedelta = PREWARM_LEAD,
+        interval: float = TIGHT_INTERVAL,
+        grace: timedelta = UNLOCK_GRACE,
+    ):
+        self.lead = lead
+        self.interval = interval
+        self.grace = grace
+        self.papers: Dict[str, Paper] = {}
+        self._warmed: Set[str] = set()
+
+    def hold(self, rule: str, paper: Paper) -> bool:
+        """
+        Hold the paper found by a rule if it's still locked.
+
+        Returns:
+            True if the paper is locked, False if it can be notified
+        """
+        unlocks_at = paper.unlocks_at
+        if unlocks_at is None or unlocks_at <= _now_like(unlocks_at):
+            self.papers.pop(rule, None)
+            self._warmed.discard(rule)
+            return False
+
+        if rule not in self.papers:
+            print(
+                f"\n{paper.name} unlocks at {display_timestamp(unlocks_at)},"
+                " standing by..."
+            )
+        self.papers[rule] = paper
+        return True
+
+    def next_interval(self, interval: float) -> float:
+        """
+        Shorten the time until the next poll to catch the held unlocks.
+
+        Papers within `lead` of their unlock are warmed up on the way.
+
+        Args:
+            interval: Seconds until the next poll otherwise
+        """
+        for rule, paper in list(self.papers.items()):
+            unlocks_at = paper.unlocks_at
+            remaining = (unlocks_at - _now_like(unlocks_at)).total_seconds()
+            if remaining < -self.grace.total_seconds():
+                print(
+                    f"\n{paper.name} didn't show up unlocked, stopped waiting"
+                )
+                del self.papers[rule]
+                self._warmed.discard(rule)
+                continue
+            if remaining > self.lead.total_seconds():
+                interval = min(interval, remaining - self.lead.total_seconds())
+                continue
+            if rule not in self._warmed:
+                self._warmed.add(rule)
+                prewarm(unlocks_at, paper)
+                remaining = (unlocks_at - _now_like(unlocks_at)).total_seconds()
+            # Wake up right at the unlock rather than up to a poll late
+            interval = min(
+                interval, remaining if remaining > 0 else self.interval
+            )
+        return max(interval, 0)
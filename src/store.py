@@ -0,0 +1,266 @@
+import hashlib
+import json
+import os
+import shutil
+import stat
+import threading
+import uuid
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+from .data_types import Config
+
+config = Config()
+
+STORE_FOLDER_NAME = ".store"
+INDEX_FILE_NAME = "index.json"
+CHUNK_SIZE = 64 * 1024
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_read_only(path: str) -> bool:
+    return not os.stat(path).st_mode & (
+        stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH
+    )
+
+
+def free_path(path: str) -> str:
+    """Get `path`, or `name (2).pdf` and so on if it's taken."""
+    base, extension = os.path.splitext(path)
+    count = 2
+    while os.path.exists(path):
+        path = f"{base} ({count}){extension}"
+        count += 1
+    return path
+
+
+class LinkValidators(BaseModel):
+    """What a server said about a link's content, to notice it changing."""
+
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_length: Optional[int] = None
+
+    @classmethod
+    def from_headers(cls, headers) -> "LinkValidators":
+        """
+        Read the validators of a 200, 206 or HEAD response.
+
+        The length of a range response is the total from `Content-Range`,
+        and an encoded response has no usable length.
+        """
+        length = None
+        content_range = headers.get("Content-Range", "")
+        if "/" in content_range:
+            total = content_range.rsplit("/", 1)[1]
+            length = int(total) if total.isdigit() else None
+        elif not headers.get("Content-Encoding"):
+            value = headers.get("Content-Length", "")
+            length = int(value) if value.isdigit() else None
+        return cls(
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            content_length=length,
+        )
+
+    def changed_from(self, previous: "LinkValidators") -> bool:
+        """
+        Check if these validators show different content than `previous`.
+
+        The ETag decides when both have one. Otherwise the content counts
+        as changed if its Last-Modified or length differs.
+        """
+        if self.etag and previous.etag:
+            return self.etag != previous.etag
+        return any(
+            new is not None and old is not None and new != old
+            for new, old in (
+                (self.last_modified, previous.last_modified),
+                (self.content_length, previous.content_length),
+            )
+        )
+
+
+class StoreIndex(BaseModel):
+    # Download link -> hash of the content it served
+    links: Dict[str, str] = Field(default_factory=dict)
+    # Downloaded file -> hash of its content
+    files: Dict[str, str] = Field(default_factory=dict)
+    # Download link -> validators of the content it served
+    validators: Dict[str, LinkValidators] = Field(default_factory=dict)
+
+
+class ContentStore:
+    """
+    Downloaded materials stored once per content, keyed by their SHA-256.
+
+    Materials are hashed while they stream in and kept in a hidden folder
+    inside the download folder. Downloaded files are hard links to the
+    stored copy, so a PDF linked from several topics takes up disk space
+    once, and a link that was already downloaded isn't fetched again.
+
+    Stored copies are read-only, so the files linked to them can't be edited
+    in place by accident. A stored copy is hashed again before it's linked,
+    and a downloaded file is only trusted without hashing while it's still
+    linked to a read-only copy.
+    """
+
+    def __init__(self, folder: Optional[str] = None):
+        self._folder = folder
+        self._index: Optional[StoreIndex] = None
+        self._lock = threading.RLock()
+
+    @property
+    def folder(self) -> str:
+        return self._folder or os.path.join(
+            config.download_folder, STORE_FOLDER_NAME
+        )
+
+    @property
+    def index(self) -> StoreIndex:
+        with self._lock:
+            if self._index is None:
+                path = os.path.join(self.folder, INDEX_FILE_NAME)
+                if os.path.exists(path):
+                    with open(path, "r", encoding="utf-8") as file:
+                        self._index = StoreIndex.model_validate(json.load(file))
+                else:
+                    self._index = StoreIndex()
+            return self._index
+
+    def _save_index(self):
+        path = os.path.join(self.folder, INDEX_FILE_NAME)
+        with open(f"{path}.part", "w", encoding="utf-8") as file:
+            json.dump(self.index.model_dump(), file, indent=2)
+        os.replace(f"{path}.part", path)
+
+    def object_path(self, digest: str) -> str:
+        return os.path.join(self.folder, digest[:2], f"{digest}.pdf")
+
+    def lookup(self, link: str) -> Optional[str]:
+        """Get the hash of the stored content a link served, if it's stored."""
+        digest = self.index.links.get(link)
+        if digest and os.path.exists(self.object_path(digest)):
+            return digest
+        return None
+
+    def partial_path(self) -> str:
+        """Get a path to download new content to before adding it."""
+        os.makedirs(self.folder, exist_ok=True)
+        return os.path.join(self.folder, f"{uuid.uuid4().hex}.pdf")
+
+    def add(
+        self,
+        link: str,
+        path: str,
+        digest: str,
+        validators: Optional[LinkValidators] = None,
+    ):
+        """
+        Move a downloaded file into the store.
+
+        Args:
+            link: The link the file was downloaded from
+            path: The downloaded file, from `partial_path`
+            digest: The hash of the file
+            validators: The validators the link was served with
+        """
+        object_path = self.object_path(digest)
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        # Same content from another link is already stored
+        if os.path.exists(object_path):
+            os.remove(path)
+        else:
+            os.replace(path, object_path)
+            os.chmod(object_path, stat.S_IREAD | stat.S_IRGRP | stat.S_IROTH)
+
+        with self._lock:
+            self.index.links[link] = digest
+            if validators:
+                self.index.validators[link] = validators
+            self._save_index()
+
+    def set_validators(self, validators: Dict[str, LinkValidators]):
+        """Record the validators of several links at once."""
+        with self._lock:
+            self.index.validators.update(validators)
+            self._save_index()
+
+    def paths_of(self, digest: str) -> List[str]:
+        """Get the downloaded files that still have stored content."""
+        return [
+            path
+            for path, known in self.index.files.items()
+            if known == digest and os.path.exists(path)
+        ]
+
+    def place(self, digest: str, path: str) -> str:
+        """
+        Link stored content to `path`.
+
+        A different file already at `path` is kept and the content goes next
+        to it, as `name (2).pdf` and so on.
+
+        Returns:
+            The path the content ended up at
+        """
+        with self._lock:
+            if os.path.exists(path):
+                # Files still linked to their read-only stored copy needn't
+                # be hashed
+                known = self.index.files.get(path)
+                stored = known and self.object_path(known)
+                if not stored or not (
+                    os.path.exists(stored)
+                    and os.path.samefile(path, stored)
+                    and is_read_only(stored)
+                ):
+                    known = file_sha256(path)
+                if known == digest:
+                    self.index.files[path] = digest
+                    self._save_index()
+                    return path
+                path = free_path(path)
+
+            object_path = self.object_path(digest)
+            if file_sha256(object_path) != digest:
+                # Drop it, so the link is downloaded again next time
+                os.chmod(object_path, stat.S_IREAD | stat.S_IWRITE)
+                os.remove(object_path)
+                raise ValueError(f"Stored copy {digest} was changed")
+
+            partial_path = f"{path}.part"
+            try:
+                os.link(object_path, partial_path)
+            except OSError:
+                # Filesystems without hard links get a copy
+                shutil.copyfile(object_path, partial_path)
+            os.replace(partial_path, path)
+            self.index.files[path] = digest
+            self._save_index()
+            return path
+
+    def release(self, digest: str):
+        """Remove stored content that no downloaded file uses."""
+        with self._lock:
+            if any(
+                known == digest and os.path.exists(path)
+                for path, known in self.index.files.items()
+            ):
+                return
+            path = self.object_path(digest)
+            if os.path.exists(path):
+                # Windows can't remove a read-only file
+                os.chmod(path, stat.S_IREAD | stat.S_IWRITE)
+                os.remove(path)
+
+
+store = ContentStore()
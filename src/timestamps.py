@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional
+
+import dateutil.parser
+
+# Distinct timestamp strings remembered. Upstream sends the same few unlock
+# and expiry times for every material of a topic and again on every poll.
+CACHE_SIZE = 4096
+# Upstream is in Sri Lanka, which has had no daylight saving time since 2006,
+# so timestamps it sends without an offset are read in its time whatever the
+# timezone of the machine
+UPSTREAM_TIMEZONE = timezone(timedelta(hours=5, minutes=30), "+0530")
+
+
+def to_utc(value: datetime) -> datetime:
+    # Naive times are local times
+    if value.tzinfo is timezone.utc:
+        return value
+    return value.astimezone(timezone.utc)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_string(value: str) -> datetime:
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        # Rarer ISO 8601 forms, like week dates
+        try:
+            parsed = dateutil.parser.isoparse(value)
+        except Exception:
+            raise ValueError(f"Invalid datetime string: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=UPSTREAM_TIMEZONE)
+    return to_utc(parsed)
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """
+    Read an upstream timestamp as a timezone-aware UTC datetime.
+
+    Strings without a UTC offset are in `UPSTREAM_TIMEZONE`, naive
+    datetimes in local time.
+
+    Args:
+        value: An ISO 8601 string, an epoch timestamp in seconds or
+            milliseconds, or a datetime
+
+    Raises:
+        ValueError: If a string isn't a valid ISO 8601 timestamp
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        # Epoch timestamps, in milliseconds when too big to be seconds
+        if value > 1e11:
+            value /= 1000
+        return datetime.fromtimestamp(value, timezone.utc)
+    if isinstance(value, str):
+        return _parse_string(value)
+    if isinstance(value, datetime):
+        return to_utc(value)
+    return value
+
+
+def format_timestamp(value: Optional[datetime]) -> Optional[str]:
+    """Serialize a timestamp as ISO 8601 with its UTC offset."""
+    if isinstance(value, datetime):
+        return to_utc(value).isoformat()
+    return None
+
+
+def display_timestamp(value: Optional[datetime]) -> str:
+    """Format a timestamp in local time for printing."""
+    if not isinstance(value, datetime):
+        return "-"
+    return value.astimezone().strftime("%Y-%m-%d %H:%M:%S %Z")
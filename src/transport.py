@@ -0,0 +1,236 @@
+import os
+import ssl
+import threading
+from http.cookiejar import CookieJar, DefaultCookiePolicy
+from typing import Dict, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+import requests as rq
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from .data_types import Config
+
+try:
+    import h2  # noqa: F401 (needed by httpx for HTTP/2)
+    import httpx
+except ImportError:
+    httpx = None
+
+config = Config()
+
+CHUNK_SIZE = 64 * 1024
+
+
+class _StreamedBody:
+    """File-like wrapper letting requests stream an httpx response body."""
+
+    def __init__(self, response: "httpx.Response"):
+        self._response = response
+
+    def stream(self, chunk_size=CHUNK_SIZE, decode_content=True):
+        yield from self._response.iter_bytes(chunk_size)
+
+    def read(self, amt=None, decode_content=True):
+        return self._response.read()
+
+    def tell(self):
+        # Bytes received before decompression, like urllib3 responses
+        return self._response.num_bytes_downloaded
+
+    def close(self):
+        self._response.close()
+
+    def release_conn(self):
+        self._response.close()
+
+    @property
+    def _original_response(self):
+        # Lets requests put the cookies of the response in the session jar
+        return _CookieSource(self._response)
+
+
+def _ssl_context(verify, cert) -> ssl.SSLContext:
+    """Build the TLS settings requests describes with `verify` and `cert`."""
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif isinstance(verify, str):
+        if os.path.isdir(verify):
+            context = ssl.create_default_context(capath=verify)
+        else:
+            context = ssl.create_default_context(cafile=verify)
+    else:
+        context = ssl.create_default_context(
+            cafile=rq.utils.DEFAULT_CA_BUNDLE_PATH
+        )
+    if isinstance(cert, str):
+        context.load_cert_chain(cert)
+    elif cert:
+        context.load_cert_chain(*cert)
+    return context
+
+
+def _httpx_timeout(timeout) -> "httpx.Timeout":
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return httpx.Timeout(read, connect=connect)
+    return httpx.Timeout(timeout)
+
+
+class Http2Adapter(BaseAdapter):
+    """
+    Requests adapter sending requests through an HTTP/2 capable client.
+
+    Every session the adapter is mounted on shares one multiplexed
+    connection per host and TLS and proxy settings. Cookies stay in the jar
+    of each session, the HTTP/2 client keeps none. Hosts that don't
+    negotiate HTTP/2 are spoken to over HTTP/1.1 keep-alive, and a host the
+    HTTP/2 client fails with at the protocol level is handed to the regular
+    requests adapter from then on.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._clients: Dict[Tuple, "httpx.Client"] = {}
+        self._lock = threading.Lock()
+        self._fallback = HTTPAdapter()
+        self._fallback_hosts: Set[str] = set()
+
+    def _client(self, verify, cert, proxy) -> "httpx.Client":
+        """Get the client for a set of TLS and proxy settings."""
+        if isinstance(cert, list):
+            cert = tuple(cert)
+        key = (verify, cert, proxy)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = httpx.Client(
+                    http2=True,
+                    verify=(
+                        True
+                        if verify is True and not cert
+                        else _ssl_context(verify, cert)
+                    ),
+                    proxy=proxy,
+                    # Requests already merged the proxy settings from the
+                    # environment, and sends the cookies of its session
+                    trust_env=False,
+                    cookies=CookieJar(DefaultCookiePolicy(allowed_domains=[])),
+                )
+                self._clients[key] = client
+            return client
+
+    def send(
+        self,
+        request,
+        stream=False,
+        timeout=None,
+        verify=True,
+        cert=None,
+        proxies=None,
+    ):
+        host = urlparse(request.url).netloc
+        if host in self._fallback_hosts:
+            return self._fallback.send(
+                request, stream, timeout, verify, cert, proxies
+            )
+
+        client = self._client(
+            verify, cert, rq.utils.select_proxy(request.url, proxies or {})
+        )
+        try:
+            httpx_response = client.send(
+                client.build_request(
+                    request.method,
+                    request.url,
+                    headers=dict(request.headers),
+                    content=request.body,
+                    timeout=_httpx_timeout(timeout),
+                ),
+                stream=True,
+            )
+        except (httpx.LocalProtocolError, httpx.RemoteProtocolError) as e:
+            print(f"HTTP/2 failed with {host}, falling back to HTTP/1.1: {e}")
+            self._fallback_hosts.add(host)
+            return self._fallback.send(
+                request, stream, timeout, verify, cert, proxies
+            )
+        except httpx.TimeoutException as e:
+            raise rq.exceptions.Timeout(e, request=request) from e
+        except httpx.TransportError as e:
+            raise rq.exceptions.ConnectionError(e, request=request) from e
+
+        return self._build_response(request, httpx_response, stream)
+
+    def _build_response(self, request, httpx_response, stream):
+        response = rq.Response()
+        response.status_code = httpx_response.status_code
+        response.headers = CaseInsensitiveDict(httpx_response.headers)
+        response.encoding = rq.utils.get_encoding_from_headers(response.headers)
+        response.url = str(httpx_response.url)
+        response.reason = httpx_response.reason_phrase
+        response.request = request
+        response.connection = self
+        response.raw = _StreamedBody(httpx_response)
+        rq.cookies.extract_cookies_to_jar(
+            response.cookies, request, _CookieSource(httpx_response)
+        )
+        if not stream:
+            response._content = httpx_response.read()
+            response._content_consumed = True
+            httpx_response.close()
+        return response
+
+    def close(self):
+        # Clients are made again when needed rather than closed for good,
+        # the adapter is shared and sessions close it when recycling their
+        # connections
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for client in clients.values():
+            client.close()
+        self._fallback.close()
+
+
+class _CookieSource:
+    """Expose httpx response headers the way the cookie jar reads them."""
+
+    def __init__(self, response: "httpx.Response"):
+        self._headers = response.headers
+
+    @property
+    def _original_response(self):
+        return self
+
+    @property
+    def msg(self):
+        return self
+
+    def get_all(self, name, default=None):
+        return self._headers.get_list(name) or default
+
+
+_http2_adapter: Optional[Http2Adapter] = None
+
+
+def mount_transport(session: rq.Session):
+    """
+    Use the shared HTTP/2 adapter for HTTPS requests of a session.
+
+    Does nothing unless `http2` is enabled in the config and the optional
+    `httpx` and `h2` packages are installed, leaving the session on plain
+    HTTP/1.1 keep-alive.
+    """
+    global _http2_adapter
+    if not config.http2 or httpx is None:
+        return
+    if _http2_adapter is None:
+        _http2_adapter = Http2Adapter()
+    session.mount("https://", _http2_adapter)
+
+
+# Unauthenticated session used to download materials
+download_session = rq.Session()
+mount_transport(download_session)
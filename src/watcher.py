@@ -0,0 +1,260 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Set, Union
+
+from pydantic import BaseModel
+
+from . import check_essay, check_mcq
+from .api import is_complete
+from .auth import auth_request
+from .catalogue import PaperCatalogue, catalogue
+from .data_types import Paper, WatchRule
+from .deadline import POLL_DEADLINE, deadline
+from .replay import diff_payloads
+from .rules import compile_rules
+from .scheduler import PollScheduler, ReleaseModel, series_of
+
+CHECK_INTERVAL = 60
+MAX_PENDING = 100  # Events a watcher holds before polling waits for it
+
+# Endpoint, fetcher and finder for each paper type
+ENDPOINTS = {
+    Paper.PaperType.MCQ: (
+        check_mcq.ENDPOINT,
+        check_mcq.fetch_curriculum,
+        check_mcq.find_mcq_papers,
+    ),
+    Paper.PaperType.ESSAY: (
+        check_essay.ENDPOINT,
+        check_essay.fetch_essay_data,
+        check_essay.find_essay_papers,
+    ),
+}
+
+
+class PaperFound(BaseModel):
+    """A watch rule matched a paper."""
+
+    rule: str
+    paper: Paper
+    detected_at: datetime
+
+
+class PayloadDiff(BaseModel):
+    """
+    Items added to or removed from an endpoint since the last poll.
+
+    Only complete payloads are compared, a filtered one doesn't list the
+    older items and would show them as removed.
+    """
+
+    endpoint: str
+    added: list
+    removed: list
+    detected_at: datetime
+
+
+WatchEvent = Union[PaperFound, PayloadDiff]
+
+
+class PollHub:
+    """
+    Polls the API once per cycle for every watcher registered with it.
+
+    Watchers sharing a hub share its login session, its schedule and each
+    poll: every endpoint any of them needs is fetched once and the payload
+    handed to all of them. Polling waits for a watcher whose events aren't
+    being consumed, and stops when the last watcher goes away.
+    """
+
+    def __init__(
+        self,
+        scheduler: Optional[PollScheduler] = None,
+        paper_catalogue: Optional[PaperCatalogue] = None,
+    ):
+        self.scheduler = scheduler or PollScheduler(
+            ReleaseModel(), [], base_interval=CHECK_INTERVAL
+        )
+        self.catalogue = paper_catalogue or catalogue
+        self.session = auth_request
+        self.watchers: Set["Watcher"] = set()
+        self._previous: Dict[str, list] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self, watcher: "Watcher"):
+        self.watchers.add(watcher)
+        self._update_series()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def unregister(self, watcher: "Watcher"):
+        self.watchers.discard(watcher)
+        self._update_series()
+        if not self.watchers and self._task:
+            self._task.cancel()
+            self._task = None
+
+    def _update_series(self):
+        self.scheduler.series = list(
+            {
+                series_of(rule)
+                for watcher in self.watchers
+                for rule in watcher.rules
+            }
+        )
+
+    def fetch(self, paper_type: Paper.PaperType) -> Optional[list]:
+        """Fetch the payload of a paper type, None if the request failed."""
+        return ENDPOINTS[paper_type][1]()
+
+    async def poll(self, seconds: Optional[float] = POLL_DEADLINE):
+        """
+        Fetch every endpoint needed and feed the payloads to watchers.
+
+        Args:
+            seconds: Deadline of the fetches, requests still running when it
+                passes are cancelled
+        """
+        paper_types = {
+            rule.paper_type
+            for watcher in self.watchers
+            for rule in watcher.rules
+        }
+        now = datetime.now(timezone.utc)
+        payloads = {}
+        with deadline(seconds):
+            for paper_type in paper_types:
+                endpoint = ENDPOINTS[paper_type][0]
+                # The session is blocking, keep it off the event loop. The
+                # thread gets a copy of the context, deadline included
+                payload = await asyncio.to_thread(self.fetch, paper_type)
+                if payload is not None:
+                    self.catalogue.update(
+                        endpoint, payload, is_complete(payload)
+                    )
+                    payloads[paper_type] = payload
+
+        for watcher in list(self.watchers):
+            await watcher._feed(payloads, self._previous, now)
+        for paper_type, payload in payloads.items():
+            if is_complete(payload):
+                self._previous[ENDPOINTS[paper_type][0]] = payload
+
+    async def _run(self):
+        while self.watchers:
+            if self.scheduler.should_prearm(datetime.now()):
+                await asyncio.to_thread(self.session.warm_up)
+            try:
+                await self.poll()
+            except Exception as e:
+                print(str(e))
+            await asyncio.sleep(self.scheduler.next_interval(datetime.now()))
+
+
+# Hub used by watchers not given one
+default_hub: Optional[PollHub] = None
+
+
+class Watcher:
+    """
+    Watch for papers from inside another application.
+
+    Iterate a watcher with `async for` to get a `PaperFound` event for each
+    rule as it matches, and a `PayloadDiff` for each change of a polled
+    endpoint if `diffs` is set. Iteration ends once every rule has matched,
+    unless `until_found` is False. Breaking out of the loop or cancelling
+    the task running it stops the watcher.
+
+    Example:
+        async for event in Watcher([WatchRule.for_paper(31, "MCQ")]):
+            print(event)
+    """
+
+    def __init__(
+        self,
+        rules: List[WatchRule],
+        hub: Optional[PollHub] = None,
+        diffs: bool = False,
+        until_found: bool = True,
+        max_pending: int = MAX_PENDING,
+    ):
+        self.rules = list(rules)
+        self.hub = hub
+        self.diffs = diffs
+        self.until_found = until_found
+        self._queue: "asyncio.Queue[Optional[WatchEvent]]" = asyncio.Queue(
+            max_pending
+        )
+        self._found: Set[str] = set()
+        self._closed = False
+
+    async def _put(self, event: Optional[WatchEvent]):
+        # Waits while the queue is full, unless the watcher is closed
+        if not self._closed:
+            await self._queue.put(event)
+
+    def _close(self):
+        self._closed = True
+        # Let a poll waiting to put an event go on
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+    async def _feed(
+        self,
+        payloads: Dict[Paper.PaperType, list],
+        previous: Dict[str, list],
+        now: datetime,
+    ):
+        if self._closed:
+            return
+        pending = [rule for rule in self.rules if rule.name not in self._found]
+        ruleset = compile_rules(tuple(pending)) if pending else None
+        for paper_type, payload in payloads.items():
+            endpoint, _, find = ENDPOINTS[paper_type]
+            if self.diffs and endpoint in previous and is_complete(payload):
+                added, removed = diff_payloads(
+                    endpoint, previous[endpoint], payload
+                )
+                if added or removed:
+                    await self._put(
+                        PayloadDiff(
+                            endpoint=endpoint,
+                            added=added,
+                            removed=removed,
+                            detected_at=now,
+                        )
+                    )
+            if ruleset is None:
+                continue
+            for name, paper in find(payload, ruleset).items():
+                if name in self._found:
+                    continue
+                self._found.add(name)
+                await self._put(
+                    PaperFound(rule=name, paper=paper, detected_at=now)
+                )
+
+        if self.until_found and len(self._found) == len(self.rules):
+            await self._put(None)
+            self._closed = True
+
+    async def events(self) -> AsyncIterator[WatchEvent]:
+        """Poll until every rule has matched, yielding events as they come."""
+        global default_hub
+        if self.hub is None:
+            default_hub = default_hub or PollHub()
+            self.hub = default_hub
+
+        self.hub.register(self)
+        try:
+            while True:
+                event = await self._queue.get()
+                if event is None:
+                    return
+                yield event
+        finally:
+            self._close()
+            self.hub.unregister(self)
+
+    def __aiter__(self) -> AsyncIterator[WatchEvent]:
+        return self.events()
@@ -0,0 +1,25 @@
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Secrets are kept under the home folder, which is picked when `src` is
+# first imported
+_SCRATCH = tempfile.mkdtemp(prefix="apex-lms-watcher-tests-")
+os.environ["HOME"] = os.environ["USERPROFILE"] = _SCRATCH
+
+
+def pytest_sessionstart(session):
+    # The config is loaded from the working directory when the test modules
+    # import `src`, so give it one that doesn't prompt for anything
+    os.chdir(_SCRATCH)
+    with open("config.yaml", "w", encoding="utf-8") as file:
+        file.write(
+            "download_folder: downloads\n"
+            "notification_sound_file: alarm.mp3\n"
+            "audio_backend: 'null'\n"
+            "catalogue_snapshot: null\n"
+            "username: tester\n"
+            "password: secret\n"
+        )
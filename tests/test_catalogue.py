@@ -0,0 +1,44 @@
+from src.catalogue import PaperCatalogue
+
+
+def _topics(*numbers):
+    return [
+        {"id": number, "topic_title": f"PET {number} MCQ", "materials": []}
+        for number in numbers
+    ]
+
+
+def test_complete_payload_removes_missing_items():
+    catalogue = PaperCatalogue()
+    catalogue.update("topics", _topics(*range(1, 101)))
+
+    changed = catalogue.update("topics", _topics(*range(51, 101)))
+
+    assert changed == set(range(1, 51))
+    assert catalogue.get(10) is None
+    assert len(catalogue.entries) == 50
+
+
+def test_partial_payload_keeps_missing_items():
+    catalogue = PaperCatalogue()
+    catalogue.update("topics", _topics(*range(1, 101)))
+
+    changed = catalogue.update(
+        "topics", _topics(*range(51, 101)), complete=False
+    )
+
+    assert changed == set()
+    assert catalogue.get(10) is not None
+    assert len(catalogue.entries) == 100
+
+
+def test_partial_payload_adds_new_items():
+    catalogue = PaperCatalogue()
+    catalogue.update("topics", _topics(1, 2))
+
+    changed = catalogue.update("topics", _topics(3), complete=False)
+
+    assert changed == {3}
+    assert sorted(catalogue.entries) == [1, 2, 3]
+    # A later complete payload still removes what it doesn't list
+    assert catalogue.update("topics", _topics(2, 3)) == {1}
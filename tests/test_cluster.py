@@ -0,0 +1,40 @@
+from src.cluster import Cluster, rule_shard
+from src.data_types import Paper, WatchRule
+
+
+def test_restart_keeps_rules_notified_before(tmp_path):
+    path = str(tmp_path / "cluster.db")
+    paper = Paper(id="1", name="PET 31 MCQ")
+    first = Cluster(path, "account", "first")
+    assert first.claim_notification("PET 31 MCQ", paper)
+
+    second = Cluster(path, "account", "second")
+
+    assert second.notified_rules() == set()
+    # The paper was already notified, a newer one of the rule wasn't
+    assert not second.claim_notification("PET 31 MCQ", paper)
+    assert second.claim_notification("PET 31 MCQ", Paper(id="2"))
+    assert first.notified_rules() == {"PET 31 MCQ"}
+
+
+def test_claims_are_scoped_to_the_account(tmp_path):
+    path = str(tmp_path / "cluster.db")
+    paper = Paper(id="1", name="PET 31 MCQ")
+
+    assert Cluster(path, "first").claim_notification("PET 31 MCQ", paper)
+    assert Cluster(path, "second").claim_notification("PET 31 MCQ", paper)
+
+
+def test_claims_expire(tmp_path):
+    path = str(tmp_path / "cluster.db")
+    paper = Paper(id="1", name="PET 31 MCQ")
+    cluster = Cluster(path, "account", claim_seconds=-1)
+
+    assert cluster.claim_notification("PET 31 MCQ", paper)
+    assert cluster.claim_notification("PET 31 MCQ", paper)
+
+
+def test_rules_are_sharded_by_class():
+    rule = WatchRule.for_paper(31, Paper.PaperType.MCQ)
+
+    assert rule_shard("account", 1, rule) != rule_shard("account", 2, rule)
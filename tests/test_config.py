@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+from pydantic import ValidationError
+
+from src.data_types import Config
+
+CONFIG = (
+    "download_folder: downloads\n"
+    "notification_sound_file: alarm.mp3\n"
+    "username: tester\n"
+    "password: secret\n"
+    "watch_rules:\n"
+    "- name: PET 31 MCQ\n"
+    "  all_of: [pet, '31']\n"
+)
+
+
+@pytest.fixture
+def config(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(Config, "_instance", None)
+    monkeypatch.setattr(Config, "_is_initialized", False)
+    (tmp_path / "config.yaml").write_text(CONFIG, encoding="utf-8")
+    return Config()
+
+
+def _edit(text):
+    with open("config.yaml", "w", encoding="utf-8") as file:
+        file.write(text)
+
+
+def test_only_changed_fields_are_reported(config):
+    _edit(CONFIG + "http2: true\n")
+
+    assert config.reload() == ["http2"]
+    assert config.http2
+
+
+def test_removed_fields_go_back_to_their_defaults(config):
+    _edit(CONFIG + "http2: true\nmax_connections_per_host: 8\n")
+    config.reload()
+
+    _edit(CONFIG)
+
+    assert sorted(config.reload()) == ["http2", "max_connections_per_host"]
+    assert (config.http2, config.max_connections_per_host) == (False, 4)
+
+
+def test_background_reload_fails_instead_of_prompting(config):
+    _edit(CONFIG.replace("username: tester\n", "") + "http2: true\n")
+    errors = []
+
+    def reload():
+        try:
+            config.reload()
+        except ValidationError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=reload)
+    thread.start()
+    thread.join()
+
+    assert len(errors) == 1
+    # Nothing of the broken edit is applied
+    assert (config.username, config.http2) == ("tester", False)
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+from src.credentials import (
+    CredentialStore,
+    CredentialStoreError,
+    decrypt,
+)
+
+
+def test_round_trip(tmp_path):
+    store = CredentialStore(str(tmp_path), use_keyring=False)
+    store.set("password", "secret")
+    store.set("session", {"token": "abc", "cookies": {"id": "1"}})
+
+    reopened = CredentialStore(str(tmp_path), use_keyring=False)
+
+    assert reopened.get("password") == "secret"
+    assert reopened.get("session") == {"token": "abc", "cookies": {"id": "1"}}
+    with open(reopened.path, "rb") as file:
+        assert b"secret" not in file.read()
+
+
+def test_files_are_private(tmp_path):
+    store = CredentialStore(str(tmp_path), use_keyring=False)
+    store.set("password", "secret")
+
+    assert os.stat(store.path).st_mode & 0o077 == 0
+    assert os.stat(store.key_path).st_mode & 0o077 == 0
+
+
+def test_unchanged_value_is_not_written(tmp_path):
+    store = CredentialStore(str(tmp_path), use_keyring=False)
+    store.set("password", "secret")
+    written = os.stat(store.path).st_mtime_ns
+    os.utime(store.path, ns=(0, 0))
+
+    store.set("password", "secret")
+
+    assert os.stat(store.path).st_mtime_ns == 0 != written
+
+
+def test_tampered_store_is_rejected(tmp_path):
+    store = CredentialStore(str(tmp_path), use_keyring=False)
+    store.set("password", "secret")
+    with open(store.path, "rb") as file:
+        data = bytearray(file.read())
+    data[-5] ^= 1
+
+    with pytest.raises(CredentialStoreError):
+        decrypt(store._master_key(), bytes(data))
+    with pytest.raises(CredentialStoreError):
+        decrypt(store._master_key(), bytes(data[:10]))
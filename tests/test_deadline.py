@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from src.deadline import (
+    Cancellation,
+    DeadlineExceeded,
+    LatencyTracker,
+    deadline,
+    hedged,
+)
+
+
+class SlowResponse:
+    """A response whose read blocks until it is closed."""
+
+    raw = None
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def close(self):
+        self.closed.set()
+
+    def read(self):
+        if self.closed.wait(5):
+            raise ConnectionError("closed")
+        return b"late"
+
+
+def test_deadline_cancels_a_slow_request():
+    response = SlowResponse()
+    started_at = time.monotonic()
+
+    with pytest.raises(DeadlineExceeded):
+        with deadline(0.2):
+            with Cancellation().watch(response):
+                response.read()
+
+    assert response.closed.is_set()
+    assert time.monotonic() - started_at < 2
+
+
+def test_hedge_wins_and_the_late_request_is_closed():
+    tracker = LatencyTracker()
+    for _ in range(20):
+        tracker.add(0.05)
+    slow = SlowResponse()
+    calls = []
+
+    def call(cancellation):
+        calls.append(cancellation)
+        if len(calls) == 1:
+            with cancellation.watch(slow):
+                return slow.read()
+        return b"fast"
+
+    assert hedged(call, tracker) == b"fast"
+    assert len(calls) == 2
+    assert slow.closed.wait(1)
+    assert calls[0].cancelled
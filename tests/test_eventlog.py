@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from src.data_types import Paper
+from src.eventlog import DetectionEvent, Dispatcher, EventLog, EventLogError
+
+
+def _event(number: int) -> DetectionEvent:
+    return DetectionEvent(
+        rule=f"PET {number} MCQ", paper=Paper(id=str(number), name="PET")
+    )
+
+
+def _paths(tmp_path):
+    return str(tmp_path / "events.log"), str(tmp_path / "checkpoints.json")
+
+
+def test_torn_line_is_dropped_on_open(tmp_path):
+    log_path, _ = _paths(tmp_path)
+    log = EventLog(log_path)
+    log.append(_event(1))
+    log.append(_event(2))
+    with open(log_path, "ab") as file:
+        file.write(b"3\t0000")
+
+    reopened = EventLog(log_path)
+
+    assert reopened.last_seq == 2
+    assert [seq for seq, _, _ in reopened.read()] == [1, 2]
+    assert reopened.append(_event(3)) == 3
+
+
+def test_events_are_redelivered_after_a_crash(tmp_path):
+    log_path, checkpoint_path = _paths(tmp_path)
+    log = EventLog(log_path)
+    log.append(_event(1))
+    log.append(_event(2))
+
+    def crash(seq, event):
+        if seq == 2:
+            raise KeyboardInterrupt
+
+    handled = []
+    with pytest.raises(KeyboardInterrupt):
+        Dispatcher(
+            log,
+            [("notify", lambda seq, event: handled.append(seq)), ("x", crash)],
+            checkpoint_path,
+        ).dispatch()
+
+    # Restart: `notify` handled 2 but only `x` is behind on it
+    resumed = []
+    delivered = Dispatcher(
+        EventLog(log_path),
+        [
+            ("notify", lambda seq, event: resumed.append(("notify", seq))),
+            ("x", lambda seq, event: resumed.append(("x", seq))),
+        ],
+        checkpoint_path,
+    ).dispatch()
+
+    assert handled == [1, 2]
+    assert resumed == [("x", 2)]
+    assert [event.rule for event in delivered] == ["PET 2 MCQ"]
+
+
+def test_write_errors_reach_the_append(tmp_path):
+    log_path, _ = _paths(tmp_path)
+    log = EventLog(log_path)
+    log.append(_event(1))
+    log._file.close()
+
+    with pytest.raises(EventLogError):
+        log.append(_event(2), timeout=5)
+
+    # The writer thread survived and goes on with a working file
+    log._file = open(log_path, "ab")
+    assert log.append(_event(3), timeout=5) == 3
+    assert [seq for seq, _, _ in EventLog(log_path).read()] == [1, 3]
+
+
+def test_handled_events_are_compacted(tmp_path):
+    log_path, checkpoint_path = _paths(tmp_path)
+    log = EventLog(log_path)
+    dispatcher = Dispatcher(
+        log, [("notify", lambda seq, event: None)], checkpoint_path, 1
+    )
+    for number in range(1, 6):
+        log.append(_event(number))
+    size = os.path.getsize(log_path)
+
+    assert len(dispatcher.dispatch()) == 5
+    # Only the newest event is kept, to go on from its sequence number
+    assert os.path.getsize(log_path) < size
+    assert [seq for seq, _, _ in log.read()] == [5]
+
+    log.append(_event(6))
+    assert [event.rule for event in dispatcher.dispatch()] == ["PET 6 MCQ"]
+    assert EventLog(log_path).append(_event(7)) == 7
+
+
+def test_checkpoints_past_a_deleted_log_are_reset(tmp_path):
+    log_path, checkpoint_path = _paths(tmp_path)
+    log = EventLog(log_path)
+    log.append(_event(1))
+    log.append(_event(2))
+    Dispatcher(
+        log, [("notify", lambda seq, event: None)], checkpoint_path
+    ).dispatch()
+    log._file.close()
+    os.remove(log_path)
+
+    reopened = EventLog(log_path)
+    reopened.append(_event(3))
+    handled = []
+    Dispatcher(
+        reopened,
+        [("notify", lambda seq, event: handled.append(event.rule))],
+        checkpoint_path,
+    ).dispatch()
+
+    assert handled == ["PET 3 MCQ"]
@@ -0,0 +1,58 @@
+from src import check_mcq, check_rules
+from src.api import FilterProbe, PartialPayload, is_complete
+from src.catalogue import PaperCatalogue
+from src.data_types import Paper, WatchRule
+from src.rules import compile_rules
+
+
+def _topics(*numbers):
+    return [
+        {
+            "id": number,
+            "topic_title": f"PET {number} MCQ",
+            "materials": [{"material_type": "DOCUMENT"}],
+        }
+        for number in numbers
+    ]
+
+
+def _fetch(params):
+    # Returns the 50 newest topics when asked for a limit
+    if params.get("limit"):
+        return _topics(*range(51, 101))
+    return _topics(*range(1, 101))
+
+
+def test_filtered_fetch_is_partial(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    probe = FilterProbe("topics", check_mcq.item_key, verify_every=30)
+
+    full = probe.fetch(_fetch)
+    filtered = probe.fetch(_fetch)
+
+    assert probe.params == {"limit": 50}
+    assert is_complete(full)
+    assert isinstance(filtered, PartialPayload)
+    assert not is_complete(filtered)
+
+
+def test_filtered_poll_keeps_catalogue_entries(monkeypatch):
+    catalogue = PaperCatalogue()
+    monkeypatch.setattr(check_rules, "catalogue", catalogue)
+    monkeypatch.setattr(check_rules, "fetch_essay_data", lambda: None)
+    rules = compile_rules((WatchRule.for_paper(100, Paper.PaperType.MCQ),))
+
+    monkeypatch.setattr(check_rules, "fetch_curriculum", lambda: _fetch({}))
+    check_rules.check_catalogue([])
+    monkeypatch.setattr(
+        check_rules,
+        "fetch_curriculum",
+        lambda: PartialPayload(_fetch({"limit": 50})),
+    )
+    papers = check_rules.check_for_rules(rules)
+    check_rules.check_catalogue([])
+
+    assert [paper.name for paper in papers.values()] == ["PET 100 MCQ"]
+
+    assert len(catalogue.entries) == 100
+    assert catalogue.get(10) is not None
@@ -0,0 +1,34 @@
+import json
+
+from src.loadtest import FaultProfile, LoadTestSettings, run_load_test
+from src.scheduler import DAYS, HOURS, RELEASE_HISTORY_FILE
+
+SETTINGS = LoadTestSettings(
+    accounts=2,
+    classes=2,
+    interval=0.5,
+    duration=4,
+    faults=FaultProfile(
+        latency=0,
+        jitter=0,
+        error_burst_every=0,
+        growth=0,
+        release_every=1,
+    ),
+)
+
+
+def test_short_run_detects_releases(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    # A history that would make the watcher poll every 10 seconds at most
+    history = [[100.0] * HOURS for _ in range(DAYS)]
+    with open(RELEASE_HISTORY_FILE, "w", encoding="utf-8") as file:
+        json.dump({"PET MCQ": history, "PET ESSAY": history}, file)
+
+    report = run_load_test(SETTINGS, report_every=60)
+
+    # Two accounts polling two classes and the exams every half second
+    assert report.polls >= 2 * 3 * (SETTINGS.duration / 0.5) / 2
+    assert report.errors == 0
+    assert report.detections > 0
+    assert report.missed == 0
@@ -0,0 +1,95 @@
+import pytest
+import requests
+
+from src import material_handling
+from src.data_types import Material
+
+MATERIAL = Material(name="PET 31 paper", download_link="http://files/31.pdf")
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def iter_content(self, chunk_size):
+        for chunk in self.chunks:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+
+class FakeSession:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def get(self, url, **kwargs):
+        return FakeResponse(self.chunks)
+
+
+def _download(monkeypatch, tmp_path, chunks, cancelled=None):
+    monkeypatch.setattr(
+        material_handling, "download_session", FakeSession(chunks)
+    )
+    path = tmp_path / "31.pdf"
+    download = material_handling.download_material(
+        MATERIAL, str(path), cancelled
+    )
+    return download, path
+
+
+def test_completed_download_replaces_the_file(monkeypatch, tmp_path):
+    download, path = _download(monkeypatch, tmp_path, [b"%PDF", b"-1.4"])
+
+    assert download is not None
+    assert path.read_bytes() == b"%PDF-1.4"
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_failed_download_leaves_no_partial_file(monkeypatch, tmp_path):
+    error = requests.ConnectionError("reset")
+    with pytest.raises(requests.ConnectionError):
+        _download(monkeypatch, tmp_path, [b"%PDF", error])
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_cancelled_download_leaves_no_partial_file(monkeypatch, tmp_path):
+    download, _ = _download(
+        monkeypatch, tmp_path, [b"%PDF", b"-1.4"], cancelled=lambda: True
+    )
+
+    assert download is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_one_failed_material_does_not_stop_the_others(monkeypatch):
+    second = Material(name="PET 31 answers", download_link="http://files/a")
+
+    def fetch_material(material):
+        if material is MATERIAL:
+            raise requests.ConnectionError("reset")
+        return "digest"
+
+    placed = []
+    monkeypatch.setattr(material_handling, "fetch_material", fetch_material)
+    monkeypatch.setattr(
+        material_handling.store,
+        "place",
+        lambda digest, path: placed.append(path) or path,
+    )
+    monkeypatch.setattr(
+        material_handling.indexer, "add", lambda path, name: None
+    )
+
+    material_handling.download_materials([MATERIAL, second])
+
+    assert placed == [material_handling.material_path(second)]
@@ -0,0 +1,126 @@
+import hashlib
+
+import pytest
+import requests
+
+from src import mirror
+from src.mirror import Mirror, plan_mirror
+
+LINK = "http://files/31.pdf"
+CONTENT = b"%PDF-1.4"
+TOPICS = [
+    {
+        "topic_title": "PET 31 MCQ",
+        "materials": [
+            {
+                "material_type": "DOCUMENT",
+                "material_title": "Paper",
+                "user_link": LINK,
+            }
+        ],
+    }
+]
+
+
+class FakeResponse:
+    status_code = 200
+    ok = True
+
+    def __init__(self, headers, content=b""):
+        self.headers = headers
+        self.content = content
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        if isinstance(self.content, Exception):
+            yield b"%PDF"
+            raise self.content
+        yield self.content
+
+
+class FakeSession:
+    """Serves one file without an ETag or Last-Modified."""
+
+    def __init__(self, content):
+        self.content = content
+        self.gets = 0
+
+    def head(self, url, **kwargs):
+        return FakeResponse({"Content-Length": str(len(self.content))})
+
+    def get(self, url, **kwargs):
+        self.gets += 1
+        return FakeResponse({}, self.content)
+
+
+def _mirror(tmp_path, session):
+    target = Mirror(class_id=1)
+    target.folder = str(tmp_path)
+    target.manifest = {}
+    target._session = lambda: session
+    return target
+
+
+def test_files_without_validators_are_not_downloaded_again(tmp_path):
+    session = FakeSession(CONTENT)
+    target = _mirror(tmp_path, session)
+
+    assert target.run(TOPICS).downloaded == 1
+    result = target.run(TOPICS)
+
+    assert (result.downloaded, result.unchanged) == (0, 1)
+    assert session.gets == 1
+
+
+def test_same_content_downloaded_again_counts_as_unchanged(tmp_path):
+    session = FakeSession(CONTENT)
+    target = _mirror(tmp_path, session)
+    target.run(TOPICS)
+    # A server that reports no size can't be checked up front
+    session.head = lambda url, **kwargs: FakeResponse({})
+
+    result = target.run(TOPICS)
+
+    assert (result.downloaded, result.unchanged) == (0, 1)
+    (entry,) = target.manifest.values()
+    assert entry.sha256 == hashlib.sha256(CONTENT).hexdigest()
+
+
+def test_failed_topics_fetch_raises(monkeypatch, tmp_path):
+    monkeypatch.setattr(mirror, "fetch_curriculum", lambda *args, **kw: None)
+
+    with pytest.raises(ValueError):
+        _mirror(tmp_path, FakeSession(CONTENT)).run()
+
+
+def test_failed_download_leaves_no_partial_file(tmp_path):
+    target = _mirror(tmp_path, FakeSession(requests.ConnectionError("reset")))
+
+    assert target.run(TOPICS).failed == 1
+    assert list((tmp_path / "PET 31 MCQ").iterdir()) == []
+
+
+def test_same_named_materials_keep_their_paths_in_any_order():
+    materials = [
+        {
+            "material_type": "DOCUMENT",
+            "material_title": "Paper",
+            "user_link": f"http://files/{number}.pdf",
+        }
+        for number in (31, 32)
+    ]
+    topics = [{"topic_title": "PET", "materials": materials}]
+    reordered = [{"topic_title": "PET", "materials": materials[::-1]}]
+
+    paths = dict(plan_mirror(topics))
+
+    assert dict(plan_mirror(reordered)) == paths
+    assert len(set(paths.values())) == 2
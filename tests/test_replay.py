@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta, timezone
+
+from src import replay as replay_module
+from src.data_types import Paper
+from src.replay import RecordedPayload, ReplayTarget, replay
+
+START = datetime(2025, 5, 1, 9, 0, tzinfo=timezone.utc)
+TARGET = ReplayTarget(paper_number=31, type=Paper.PaperType.MCQ)
+
+
+def _topics(*numbers):
+    return [
+        {
+            "id": number,
+            "topic_title": f"PET {number} MCQ",
+            "materials": [{"material_type": "DOCUMENT"}],
+        }
+        for number in numbers
+    ]
+
+
+def _recording(*payloads):
+    return [
+        RecordedPayload(
+            timestamp=START + timedelta(seconds=seconds),
+            endpoint="topics",
+            payload=payload,
+        )
+        for seconds, payload in payloads
+    ]
+
+
+def test_target_is_detected_on_the_next_poll():
+    recording = _recording((0, []), (90, _topics(31)), (300, _topics(31)))
+
+    (detection,) = replay(recording, [TARGET], interval=60)
+
+    assert detection.available_at == START + timedelta(seconds=90)
+    assert detection.detected_at == START + timedelta(seconds=120)
+    assert detection.polls == 3
+
+
+def test_target_up_only_between_polls_is_missed():
+    recording = _recording((0, []), (10, _topics(31)), (20, []))
+    misses = []
+
+    detections = replay(recording, [TARGET], interval=60, on_miss=misses.append)
+
+    assert detections == []
+    (miss,) = misses
+    assert miss.windows == [
+        (START + timedelta(seconds=10), START + timedelta(seconds=20))
+    ]
+
+
+def test_target_in_the_last_payload_is_detected_after_it():
+    recording = _recording((0, []), (70, _topics(31)))
+
+    (detection,) = replay(recording, [TARGET], interval=60)
+
+    assert detection.detected_at == START + timedelta(seconds=120)
+
+
+def test_accelerated_replay_sleeps_scaled_intervals(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(replay_module.time, "sleep", sleeps.append)
+    recording = _recording((0, []), (90, _topics(31)))
+
+    replay(recording, [TARGET], interval=60, speed=10)
+
+    assert sleeps == [6, 6]
@@ -0,0 +1,63 @@
+from src.data_types import Paper, WatchRule
+from src.rules import RuleSet
+
+
+def _rule(name, **conditions):
+    return WatchRule(name=name, paper_type=Paper.PaperType.MCQ, **conditions)
+
+
+def _names(rules, title):
+    return [rule.name for rule in RuleSet(tuple(rules)).match(title)]
+
+
+def test_regex_with_named_group():
+    rules = [_rule("numbered", regex=(r"pet\s*(?P<num>\d+)",))]
+
+    assert _names(rules, "PET 31 MCQ") == ["numbered"]
+    assert _names(rules, "Revision MCQ") == []
+
+
+def test_regex_with_backreference():
+    rules = [_rule("repeated", regex=(r"(\d)\1",))]
+
+    assert _names(rules, "PET 33") == ["repeated"]
+    assert _names(rules, "PET 31") == []
+
+
+def test_regexes_of_rules_are_independent():
+    rules = [
+        _rule("first", regex=(r"(?P<num>\d+) MCQ",)),
+        _rule("second", regex=(r"(?P<num>\d+) ESSAY", r"(a)\1")),
+        _rule("tokens", all_of=("pet",), regex=(r"\d",)),
+    ]
+
+    assert _names(rules, "PET 31 MCQ") == ["first", "tokens"]
+    assert _names(rules, "PET 31 ESSAY") == ["second", "tokens"]
+    assert _names(rules, "aa") == ["second"]
+    assert _names(rules, "31 MCQ") == ["first"]
+
+
+def test_regex_is_only_tried_once_the_tokens_match():
+    rules = [_rule("gated", all_of=("pet",), regex=(r"\d+",))]
+
+    assert _names(rules, "PET 31") == ["gated"]
+    assert _names(rules, "Revision 31") == []
+
+
+def test_token_conditions_among_many_rules():
+    rules = [
+        WatchRule.for_paper(number, Paper.PaperType.MCQ)
+        for number in range(100, 400)
+    ] + [
+        _rule("any", any_of=("structured", "essay")),
+        _rule("excluded", all_of=("pet",), exclude=("marking",)),
+        _rule("everything"),
+    ]
+
+    assert _names(rules, "PET 250 MCQ") == [
+        "PET 250 MCQ",
+        "excluded",
+        "everything",
+    ]
+    assert _names(rules, "PET 250 marking scheme") == ["everything"]
+    assert _names(rules, "Structured questions") == ["any", "everything"]
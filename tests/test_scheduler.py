@@ -0,0 +1,24 @@
+from src.data_types import Paper, WatchRule
+from src.replay import ReplayTarget
+from src.scheduler import series_of
+
+MCQ = Paper.PaperType.MCQ
+ESSAY = Paper.PaperType.ESSAY
+
+
+def test_papers_of_a_series_share_it():
+    assert series_of(WatchRule.for_paper(30, MCQ)) == "PET MCQ"
+    assert series_of(WatchRule.for_paper(31, MCQ)) == "PET MCQ"
+    assert series_of(WatchRule.for_paper(31, ESSAY)) == "PET ESSAY"
+
+
+def test_series_ignores_numbers_in_rule_names():
+    rule = WatchRule(name="2025 PET 31", paper_type=ESSAY, all_of=("pet",))
+
+    assert series_of(rule) == "PET ESSAY"
+
+
+def test_replay_targets_use_the_series_of_their_rule():
+    target = ReplayTarget(paper_number=31, type=MCQ)
+
+    assert series_of(target.rule) == series_of(WatchRule.for_paper(31, MCQ))
@@ -0,0 +1,27 @@
+import zlib
+
+from src.search import Indexer, SearchIndex
+
+
+def write_pdf(path, text: str):
+    content = zlib.compress(f"BT /F1 12 Tf ({text}) Tj ET".encode())
+    with open(path, "wb") as file:
+        file.write(b"%PDF-1.4\n1 0 obj\n<< /Filter /FlateDecode >>\nstream\n")
+        file.write(content)
+        file.write(b"\nendstream\nendobj\n%%EOF\n")
+
+
+def test_indexer_extracts_in_spawned_workers(tmp_path):
+    pdf = tmp_path / "PET 31 Biology.pdf"
+    write_pdf(pdf, "light reaction of photosynthesis")
+    indexer = Indexer(SearchIndex(str(tmp_path / "index.sqlite")), 1)
+    try:
+        extractions = indexer.add_folder(str(tmp_path))
+        assert len(extractions) == 1
+        extractions[0].result(timeout=60)
+    finally:
+        indexer.shutdown()
+
+    hits = indexer.index.search('"light reaction"')
+    assert [hit.number for hit in hits] == [31]
+    assert indexer.index.is_current(str(pdf))
@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+
+from src.slo import DetectionRecord
+
+SEEN_AT = datetime(2025, 5, 1, 9, 0, tzinfo=timezone.utc)
+
+
+def test_prompt_time_is_left_out_of_end_to_end_delay():
+    record = DetectionRecord(
+        upstream_at=SEEN_AT - timedelta(seconds=30),
+        first_seen_at=SEEN_AT,
+        notified_at=SEEN_AT + timedelta(seconds=1),
+        downloaded_at=SEEN_AT + timedelta(seconds=100),
+        prompt_seconds=60,
+    )
+
+    assert record.delays() == {
+        "detection": 30,
+        "notification": 1,
+        "prompt": 60,
+        "end to end": 70,
+    }
+
+
+def test_records_without_prompt_time_still_load():
+    record = DetectionRecord.model_validate_json(
+        '{"first_seen_at": "2025-05-01T09:00:00Z",'
+        ' "downloaded_at": "2025-05-01T09:00:10Z"}'
+    )
+
+    assert record.delays() == {"end to end": 10}
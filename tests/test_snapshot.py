@@ -0,0 +1,104 @@
+import sys
+from datetime import datetime, timedelta, timezone
+
+from src.catalogue import PaperCatalogue
+from src.snapshot import SnapshotReader, SnapshotWriter
+
+UNLOCKS_AT = datetime(2030, 1, 1, 9, 0, tzinfo=timezone.utc)
+
+
+def _catalogue() -> PaperCatalogue:
+    catalogue = PaperCatalogue()
+    catalogue.update(
+        "topics",
+        [
+            {
+                "id": 1,
+                "topic_title": "PET 31 MCQ",
+                "materials": [
+                    {
+                        "material_title": "Paper",
+                        "material_type": "DOCUMENT",
+                        "user_link": "https://example.com/31.pdf",
+                    }
+                ],
+            },
+            {"id": 2, "topic_title": "PET 32 MCQ", "materials": []},
+        ],
+    )
+    catalogue.update(
+        "exams",
+        [
+            {
+                "exam_id": {
+                    "id": 3,
+                    "exam_name": "PET 31 ESSAY",
+                    "exam_unlocks_at": UNLOCKS_AT.isoformat(),
+                    "exam_expires_at": (
+                        UNLOCKS_AT + timedelta(days=1)
+                    ).isoformat(),
+                }
+            }
+        ],
+    )
+    return catalogue
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / "catalogue.snapshot")
+    catalogue = _catalogue()
+    SnapshotWriter(path).publish(catalogue)
+
+    with SnapshotReader(path) as snapshot:
+        assert snapshot.generation == 1
+        assert snapshot.is_out(31)
+        assert snapshot.is_out(31, "MCQ")
+        # The essay is listed but still locked
+        assert not snapshot.is_out(31, "ESSAY")
+        assert not snapshot.is_out(33)
+
+        entry = snapshot.get(31)
+        assert entry.mcq_name == "PET 31 MCQ"
+        assert entry.essay_name == "PET 31 ESSAY"
+        assert entry.essay_unlocks_at == UNLOCKS_AT
+        assert entry.topics == 1
+        (material,) = entry.materials
+        assert material.name == "Paper"
+        assert material.download_link == "https://example.com/31.pdf"
+        assert snapshot.get(32).essay_name is None
+        assert snapshot.get(33) is None
+
+
+def test_reader_follows_new_snapshots(tmp_path):
+    path = str(tmp_path / "catalogue.snapshot")
+    catalogue = _catalogue()
+    writer = SnapshotWriter(path)
+    writer.publish(catalogue)
+
+    with SnapshotReader(path) as snapshot:
+        assert not snapshot.is_out(40)
+        catalogue.update(
+            "topics",
+            [{"id": 4, "topic_title": "PET 40 MCQ", "materials": []}],
+            complete=False,
+        )
+        writer.publish(catalogue)
+
+        assert snapshot.is_out(40)
+        assert snapshot.generation == 2
+    # A new writer goes on from the published generation
+    SnapshotWriter(path).publish(catalogue)
+    with SnapshotReader(path) as snapshot:
+        assert snapshot.generation == 3
+
+
+def test_reader_imports_only_the_standard_library():
+    import src.snapshot
+
+    with open(src.snapshot.__file__, encoding="utf-8") as file:
+        imports = [
+            line.split()[1]
+            for line in file
+            if line.startswith(("import ", "from "))
+        ]
+    assert all(name in sys.stdlib_module_names for name in imports)
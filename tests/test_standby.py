@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta, timezone
+
+from src import standby
+from src.data_types import Paper
+from src.standby import Standby
+
+
+def _paper(unlocks_in: float) -> Paper:
+    return Paper(
+        id="1",
+        name="PET 31 ESSAY",
+        unlocks_at=datetime.now(timezone.utc) + timedelta(seconds=unlocks_in),
+    )
+
+
+def test_unlocked_paper_is_not_held():
+    held = Standby()
+
+    assert not held.hold("rule", _paper(-1))
+    assert held.next_interval(60) == 60
+
+
+def test_poll_wakes_up_for_the_prewarm(monkeypatch):
+    warmed = []
+    monkeypatch.setattr(standby, "prewarm", lambda *args: warmed.append(args))
+    held = Standby(lead=timedelta(seconds=15), interval=1)
+
+    assert held.hold("rule", _paper(45))
+    assert 29 < held.next_interval(60) <= 30
+    assert warmed == []
+
+
+def test_poll_wakes_up_at_the_unlock(monkeypatch):
+    warmed = []
+    monkeypatch.setattr(standby, "prewarm", lambda *args: warmed.append(args))
+    held = Standby(lead=timedelta(seconds=15), interval=1)
+    held.hold("rule", _paper(10))
+
+    assert 9 < held.next_interval(60) <= 10
+    assert len(warmed) == 1
+    held.next_interval(60)
+    assert len(warmed) == 1
+
+    held.papers["rule"] = _paper(-5)
+    assert held.next_interval(60) == 1
+    assert not held.hold("rule", _paper(-5))
+    assert held.papers == {}
+
+
+def test_paper_gone_after_its_unlock_is_let_go(monkeypatch):
+    monkeypatch.setattr(standby, "prewarm", lambda *args: None)
+    held = Standby(lead=timedelta(seconds=15), interval=1)
+    held.hold("rule", _paper(10))
+
+    # No poll saw it again, e.g. it was taken down
+    held.papers["rule"] = _paper(-30)
+    assert held.next_interval(60) == 1
+    held.papers["rule"] = _paper(-600)
+    assert held.next_interval(60) == 60
+    assert held.papers == {}
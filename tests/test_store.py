@@ -0,0 +1,43 @@
+import hashlib
+import os
+import stat
+
+import pytest
+
+from src.store import ContentStore
+
+CONTENT = b"%PDF-1.4"
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+
+
+def _store(tmp_path):
+    store = ContentStore(str(tmp_path / ".store"))
+    path = store.partial_path()
+    with open(path, "wb") as file:
+        file.write(CONTENT)
+    store.add("http://files/31.pdf", path, DIGEST)
+    return store
+
+
+def test_placed_files_are_read_only(tmp_path):
+    store = _store(tmp_path)
+
+    path = store.place(DIGEST, str(tmp_path / "31.pdf"))
+
+    assert not os.stat(path).st_mode & stat.S_IWUSR
+    assert open(path, "rb").read() == CONTENT
+
+
+def test_edited_stored_copy_is_not_linked_again(tmp_path):
+    store = _store(tmp_path)
+    path = store.place(DIGEST, str(tmp_path / "31.pdf"))
+    # An in-place edit of a linked file changes the stored copy too
+    os.chmod(path, stat.S_IREAD | stat.S_IWRITE)
+    with open(path, "wb") as file:
+        file.write(b"%PDF-1.4 edited")
+
+    with pytest.raises(ValueError):
+        store.place(DIGEST, str(tmp_path / "copy.pdf"))
+
+    assert store.lookup("http://files/31.pdf") is None
+    assert not os.path.exists(tmp_path / "copy.pdf")
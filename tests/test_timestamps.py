@@ -0,0 +1,37 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from src.timestamps import _parse_string, parse_timestamp
+
+UNLOCK = datetime(2025, 5, 1, 3, 30, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def host_timezone(monkeypatch):
+    def set_timezone(name):
+        monkeypatch.setenv("TZ", name)
+        time.tzset()
+
+    yield set_timezone
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.mark.skipif(not hasattr(time, "tzset"), reason="needs time.tzset")
+def test_naive_strings_are_upstream_time_on_any_host(host_timezone):
+    _parse_string.cache_clear()
+
+    host_timezone("America/New_York")
+    assert parse_timestamp("2025-05-01T09:00:00") == UNLOCK
+    # Served from the cache on another host timezone
+    host_timezone("Europe/London")
+    assert parse_timestamp("2025-05-01T09:00:00") == UNLOCK
+    assert _parse_string.cache_info().hits == 1
+
+
+def test_strings_with_an_offset_keep_it():
+    assert parse_timestamp("2025-05-01T03:30:00Z") == UNLOCK
+    assert parse_timestamp("2025-05-01T05:30:00+02:00") == UNLOCK
+    assert parse_timestamp("2025-W18-4T09:00:00") == UNLOCK
@@ -0,0 +1,75 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+import requests
+
+from src.transport import Http2Adapter
+
+
+class CookieHandler(BaseHTTPRequestHandler):
+    """Sets a cookie on /login and echoes the cookies it's sent."""
+
+    def do_GET(self):
+        body = (self.headers.get("Cookie") or "").encode()
+        self.send_response(200)
+        if self.path == "/login":
+            self.send_header("Set-Cookie", "session=first; Path=/")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CookieHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+    server.server_close()
+
+
+def _session(adapter):
+    session = requests.Session()
+    session.mount("http://", adapter)
+    return session
+
+
+def test_sessions_sharing_the_adapter_keep_their_own_cookies(server):
+    adapter = Http2Adapter()
+    first, second = _session(adapter), _session(adapter)
+
+    first.get(f"{server}/login")
+
+    assert first.get(f"{server}/echo").text == "session=first"
+    assert second.get(f"{server}/echo").text == ""
+
+
+def test_protocol_errors_only_send_that_host_to_http1(monkeypatch, server):
+    adapter = Http2Adapter()
+    sent = []
+    monkeypatch.setattr(
+        adapter._fallback,
+        "send",
+        lambda request, *args: sent.append(request.url) or "http/1.1",
+    )
+    client = adapter._client(True, None, None)
+    send = client.send
+
+    def broken(request, **kwargs):
+        if request.url.host == "broken.test":
+            raise httpx.RemoteProtocolError("bad frame")
+        return send(request, **kwargs)
+
+    monkeypatch.setattr(client, "send", broken)
+    request = requests.Request("GET", "http://broken.test/").prepare()
+
+    assert adapter.send(request) == "http/1.1"
+    assert adapter.send(request) == "http/1.1"
+    assert _session(adapter).get(f"{server}/echo").status_code == 200
+    assert sent == ["http://broken.test/", "http://broken.test/"]
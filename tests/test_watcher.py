@@ -0,0 +1,58 @@
+import asyncio
+from datetime import datetime, timezone
+
+from src.api import PartialPayload
+from src.catalogue import PaperCatalogue
+from src.data_types import Paper, WatchRule
+from src.deadline import remaining
+from src.scheduler import PollScheduler, ReleaseModel
+from src.watcher import PayloadDiff, PollHub, Watcher
+
+MCQ = Paper.PaperType.MCQ
+
+
+def _topics(*numbers):
+    return [
+        {"id": number, "topic_title": f"PET {number} MCQ", "materials": []}
+        for number in numbers
+    ]
+
+
+def _diffs(payload):
+    watcher = Watcher([], diffs=True, until_found=False)
+    previous = {"topics": _topics(*range(1, 101))}
+    asyncio.run(
+        watcher._feed({MCQ: payload}, previous, datetime.now(timezone.utc))
+    )
+    events = []
+    while not watcher._queue.empty():
+        events.append(watcher._queue.get_nowait())
+    return [event for event in events if isinstance(event, PayloadDiff)]
+
+
+def test_complete_payload_is_diffed():
+    (diff,) = _diffs(_topics(*range(2, 102)))
+
+    assert diff.added == [101]
+    assert diff.removed == [1]
+
+
+def test_partial_payload_is_not_diffed():
+    assert _diffs(PartialPayload(_topics(*range(51, 102)))) == []
+
+
+def test_poll_fetches_under_the_deadline():
+    hub = PollHub(PollScheduler(ReleaseModel(path=None), []), PaperCatalogue())
+    hub.watchers.add(Watcher([WatchRule.for_paper(31, MCQ)]))
+    left = []
+
+    def fetch(paper_type):
+        left.append(remaining())
+        return _topics(31)
+
+    hub.fetch = fetch
+    asyncio.run(hub.poll(seconds=10))
+
+    (seconds,) = left
+    assert 0 < seconds <= 10
+    assert remaining() is None